@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Differentiell kontroll av momsmotorerna: kör den radvisa motorn (scalar,
+referensen) och den kolumnvisa (vectorized) på samma indata och jämför
+varje fält i resultatet, inklusive varnings- och fellistorna.
+
+Indata är genererade Monta-exporter med avsiktliga kantfall (halva ören,
+saknade och udda momssatser, nollbelopp, momskategorier runt datum för
+satsändringar) och inspelade exporter som anges på kommandoraden.
+Scenarier med flera filer läses bit för bit med process_chunks, så att
+kontrollen också täcker det som delas mellan bitar och filer.
+Vid avvikelse krymps indata till en minimal reproducerare som sparas
+tillsammans med skillnaderna.
+
+    python benchmarks/engine_equivalence.py --seeds 50
+    python benchmarks/engine_equivalence.py export_jan.xlsx export_feb.csv
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Callable
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCHMARKS_DIR.parent / "scripts"
+sys.path[:0] = [str(SCRIPTS_DIR), str(BENCHMARKS_DIR)]
+
+import numpy as np
+import pandas as pd
+
+from monta_export import generate_monta_export
+from vat_processor import REPORT_VERSIONS, VAT_RATE_TIMELINE, VATProcessor
+
+REFERENCE_ENGINE = "scalar"
+CANDIDATE_ENGINE = "vectorized"
+
+# Fasta argument så att resultatet inte beror på dagens datum
+PROCESS_KWARGS = {"company_name": "Test AB", "org_number": "556183-9191", "period": "2026-03"}
+
+# Kolumner som motorerna alltid läser; övriga får krympas bort
+REQUIRED_COLUMNS = ("amount", "subAmount", "vat")
+
+# Filnummer per rad i scenarier med flera filer; varje fil läses i bitar
+# om CHUNK_ROWS rader. Utan kolumnen körs indata som en enda DataFrame.
+FILE_COLUMN = "_file"
+CHUNK_ROWS = 64
+
+DEFAULT_ROWS = 400
+DEFAULT_SEEDS = 20
+
+
+def _same(a, b) -> bool:
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def diff_results(reference, candidate, path: str = "") -> list:
+    """
+    Alla skillnader mellan två resultat som (sökväg, referens, kandidat).
+    Typ, nyckelordning och listlängd räknas också som skillnader, så att
+    JSON-utdata blir byte-identisk när listan är tom.
+    """
+    if isinstance(reference, dict) and isinstance(candidate, dict):
+        diffs = []
+        if list(reference) != list(candidate):
+            if set(reference) == set(candidate):
+                diffs.append((f"{path}<ordning>", list(reference), list(candidate)))
+            for key in reference.keys() - candidate.keys():
+                diffs.append((f"{path}.{key}", reference[key], "<saknas>"))
+            for key in candidate.keys() - reference.keys():
+                diffs.append((f"{path}.{key}", "<saknas>", candidate[key]))
+        for key in reference:
+            if key in candidate:
+                diffs += diff_results(reference[key], candidate[key], f"{path}.{key}")
+        return diffs
+
+    if isinstance(reference, list) and isinstance(candidate, list):
+        diffs = []
+        if len(reference) != len(candidate):
+            diffs.append((f"{path}<längd>", len(reference), len(candidate)))
+        for index, (a, b) in enumerate(zip(reference, candidate)):
+            diffs += diff_results(a, b, f"{path}[{index}]")
+        return diffs
+
+    return [] if _same(reference, candidate) else [(path or "<rot>", reference, candidate)]
+
+
+def file_chunks(df: pd.DataFrame) -> list:
+    """
+    Bitarna för ett scenario med flera filer, i filordning: varje fil delas
+    i bitar om CHUNK_ROWS rader och märks med filnamnet som i CLI:t.
+    """
+    chunks = []
+    for number, rows in df.groupby(FILE_COLUMN, sort=True):
+        rows = rows.drop(columns=[FILE_COLUMN])
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows.iloc[start:start + CHUNK_ROWS].copy()
+            chunk.attrs["source"] = f"fil{number}.csv"
+            chunks.append(chunk)
+    return chunks
+
+
+def run_engine(df: pd.DataFrame, engine: str, report_version: int = 1) -> dict:
+    """Resultatet från en motor, eller undantaget som {"error": "Typ: meddelande"}"""
+    processor = VATProcessor(report_version=report_version)
+    try:
+        if FILE_COLUMN in df.columns:
+            return processor.process_chunks(file_chunks(df), engine=engine, **PROCESS_KWARGS)
+        return processor.process_transactions(df, engine=engine, **PROCESS_KWARGS)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def compare_engines(df: pd.DataFrame) -> list:
+    """Skillnader mellan referensmotorn och kandidaten på df, i alla rapportformat"""
+    diffs = []
+    for version in REPORT_VERSIONS:
+        diffs += diff_results(run_engine(df, REFERENCE_ENGINE, version),
+                              run_engine(df, CANDIDATE_ENGINE, version), f"<v{version}>")
+    return diffs
+
+
+def add_edge_cases(df: pd.DataFrame, seed: int, fraction: float = 0.05) -> pd.DataFrame:
+    """
+    Lägger in kantfall på en slumpad andel av raderna: halva ören, udda
+    momssatser, nollbelopp, fel tecken på momsen, momskategori och datum
+    nära satsändringen 2026-04-01 (svensk midnatt i UTC), samt motpartsland
+    och motparternas VAT- och organisationsnummer (giltiga och ogiltiga).
+    """
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    rows = len(df)
+
+    def pick():
+        return rng.random(rows) < fraction
+
+    vat_rate = df["vatRate"].to_numpy(dtype=float, copy=True)
+    odd = pick()
+    vat_rate[odd] = rng.choice([7.0, 24.5, 100.0], int(odd.sum()))
+    df["vatRate"] = vat_rate
+
+    vat = df["vat"].to_numpy(copy=True)
+    half = pick()
+    vat[half] = vat[half] + 0.005
+    flipped = pick()
+    vat[flipped] = -vat[flipped]
+    df["vat"] = vat
+
+    amount = df["amount"].to_numpy(copy=True)
+    amount[pick()] = 0.0
+    df["amount"] = amount
+
+    boundary = pd.Timestamp("2026-03-31 22:00", tz="UTC")
+    df["date"] = boundary + pd.to_timedelta(rng.integers(-3 * 3600, 3 * 3600, rows), unit="s")
+    categories = np.array(VAT_RATE_TIMELINE.categories + (" Livsmedel ",), dtype=object)
+    category = np.where(pick(), categories[rng.integers(0, len(categories), rows)], None)
+    df["vatCategory"] = pd.Series(category, index=df.index, dtype="category")
+
+    # Motpartens land: inrikes, EU (omvänd skattskyldighet) och utanför EU
+    countries = np.array(["SE", "DE", " fi ", "US", "NO"], dtype=object)
+    country = np.where(pick(), countries[rng.integers(0, len(countries), rows)], None)
+    df["counterpartCountry"] = pd.Series(country, index=df.index, dtype="category")
+
+    # Motparternas nummer: giltiga, fel kontrollsiffra, fel längd, utan prefix
+    # och utanför EU, fördelade på ett fåtal motparter
+    counterparts = np.array(["Plugsurfing", "Shell Recharge", "Elbilsladdning AB", ""], dtype=object)
+    vat_numbers = np.array(["SE556183919101", "SE556183919201", "SE5561839191", "DE123456789",
+                            "DE12", "556183919101", "NO923609016MVA", "GB123456789"], dtype=object)
+    org_numbers = np.array(["556183-9191", "5561839192", "55618391", "202100-5489", " "],
+                           dtype=object)
+    df["counterpart"] = pd.Series(np.where(pick(), counterparts[rng.integers(0, 4, rows)], None),
+                                  index=df.index, dtype="category")
+    df["counterpartVatNumber"] = np.where(
+        pick(), vat_numbers[rng.integers(0, len(vat_numbers), rows)], None)
+    df["counterpartOrgNumber"] = np.where(
+        pick(), org_numbers[rng.integers(0, len(org_numbers), rows)], None)
+    return df
+
+
+def split_files(df: pd.DataFrame, files: int) -> pd.DataFrame:
+    """df fördelad i följd på files filer (FILE_COLUMN), utan överlapp"""
+    df = df.copy()
+    df[FILE_COLUMN] = np.arange(len(df)) * files // max(len(df), 1) + 1
+    return df
+
+
+def overlapping_files(df: pd.DataFrame, seed: int) -> pd.DataFrame:
+    """
+    Två exporter som delar en del av raderna (som två månadsexporter med
+    gemensamma dagar), plus upprepade rader inom den andra filen som hamnar
+    i andra bitar. Raderna utan id i kantfallen matchas på innehåll.
+    """
+    rng = np.random.default_rng(seed)
+    rows = len(df)
+    first = df.iloc[:rows * 2 // 3].assign(**{FILE_COLUMN: 1})
+    second = df.iloc[rows // 3:].assign(**{FILE_COLUMN: 2})
+    repeated = second.iloc[rng.integers(0, len(second), max(rows // 20, 1))]
+    without_id = df.iloc[rng.integers(0, rows, max(rows // 40, 1))].assign(**{FILE_COLUMN: 2})
+    if "id" in without_id.columns:
+        without_id["id"] = None
+    return pd.concat([first, second, repeated, without_id, without_id], ignore_index=True)
+
+
+def generated_inputs(seeds: int, rows: int):
+    """(namn, DataFrame) för genererade exporter, med och utan kantfall"""
+    for seed in range(seeds):
+        export = generate_monta_export(rows, seed, error_rate=0.05)
+        yield f"genererad seed={seed}", export
+        edge_cases = add_edge_cases(export, seed)
+        yield f"kantfall seed={seed}", edge_cases
+
+        # En enda rad utan momssats ska ge samma fel i båda motorerna
+        missing_rate = edge_cases.copy()
+        missing_rate.loc[missing_rate.index[seed % rows], "vatRate"] = np.nan
+        yield f"saknad momssats seed={seed}", missing_rate
+
+        yield f"flera filer seed={seed}", split_files(edge_cases, 3)
+        yield f"överlappande filer seed={seed}", overlapping_files(edge_cases, seed)
+
+        # Dubbletter inom en DataFrame, en del utan id
+        repeated = edge_cases.iloc[np.arange(0, rows, 9)].copy()
+        repeated.loc[repeated.index[::2], "id"] = None
+        yield f"dubbletter seed={seed}", pd.concat([edge_cases, repeated, repeated],
+                                                     ignore_index=True)
+
+
+def recorded_inputs(paths: list):
+    """(namn, DataFrame) för inspelade exporter"""
+    from readers import read_transactions
+
+    for path in paths:
+        yield path, read_transactions(path)
+
+
+def shrink(df: pd.DataFrame, fails: Callable[[pd.DataFrame], bool]) -> pd.DataFrame:
+    """
+    Krymper df så länge fails(df) fortfarande är sant: först raderna med
+    delta debugging (ddmin), sedan valfria kolumner en i taget.
+    """
+    positions = list(range(len(df)))
+    granularity = 2
+    while len(positions) >= 2:
+        size = math.ceil(len(positions) / granularity)
+        parts = [positions[i:i + size] for i in range(0, len(positions), size)]
+        for index, part in enumerate(parts):
+            if fails(df.iloc[part]):
+                positions, granularity = part, 2
+                break
+            complement = [p for other, rest in enumerate(parts) if other != index for p in rest]
+            if fails(df.iloc[complement]):
+                positions, granularity = complement, max(granularity - 1, 2)
+                break
+        else:
+            if granularity >= len(positions):
+                break
+            granularity = min(granularity * 2, len(positions))
+
+    reduced = df.iloc[positions]
+    for column in list(reduced.columns):
+        if column not in REQUIRED_COLUMNS and fails(reduced.drop(columns=[column])):
+            reduced = reduced.drop(columns=[column])
+    return reduced
+
+
+def _json_value(value):
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+def save_reproducer(name: str, df: pd.DataFrame, diffs: list, output_dir: Path, index: int) -> Path:
+    """Sparar reproduceraren som pickle (behåller dtypes), CSV och en diff-fil"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = output_dir / f"repro-{index:03d}"
+    df.to_pickle(f"{stem}.pkl")
+    df.to_csv(f"{stem}.csv", index=False)
+    report = {
+        "input": name,
+        "rows": len(df),
+        "dtypes": {column: str(dtype) for column, dtype in df.dtypes.items()},
+        "diffs": [{"path": path, REFERENCE_ENGINE: _json_value(a), CANDIDATE_ENGINE: _json_value(b)}
+                  for path, a, b in diffs],
+    }
+    Path(f"{stem}.json").write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n",
+                                    encoding="utf-8")
+    return stem
+
+
+def check(inputs, output_dir: Path, max_diffs: int = 10, log=print) -> int:
+    """Jämför motorerna för alla indata och returnerar antalet avvikelser"""
+    failures = 0
+    for name, df in inputs:
+        diffs = compare_engines(df)
+        if not diffs:
+            log(f"OK    {name} ({len(df)} rader)")
+            continue
+
+        failures += 1
+        reduced = shrink(df, lambda candidate: bool(compare_engines(candidate)))
+        reduced_diffs = compare_engines(reduced)
+        stem = save_reproducer(name, reduced, reduced_diffs, output_dir, failures)
+        log(f"AVVIKER {name}: {len(diffs)} skillnader, minimerad till {len(reduced)} rader "
+            f"och {len(reduced.columns)} kolumner ({stem}.*)")
+        for path, a, b in reduced_diffs[:max_diffs]:
+            log(f"    {path}: {REFERENCE_ENGINE}={a!r} {CANDIDATE_ENGINE}={b!r}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Differentiell kontroll av momsmotorerna")
+    parser.add_argument("inputs", nargs="*", help="Inspelade exporter (.xlsx, .csv, .parquet, .arrow)")
+    parser.add_argument("--seeds", type=int, default=DEFAULT_SEEDS,
+                        help="Antal genererade exporter (0 = bara inspelade)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rader per genererad export")
+    parser.add_argument("--output-dir", default="engine-diffs", help="Katalog för reproducerare")
+    args = parser.parse_args()
+
+    inputs = list(recorded_inputs(args.inputs))
+    failures = check(inputs + list(generated_inputs(args.seeds, args.rows)), Path(args.output_dir))
+    if failures:
+        print(f"{failures} indata gav olika resultat", file=sys.stderr)
+    sys.exit(1 if failures else 0)
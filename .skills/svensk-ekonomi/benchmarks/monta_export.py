@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Seedad generator av syntetiska Monta-exporter för benchmarks och tester.
+Samma kolumner som test_transactions.xlsx: laddning (25%), inkommande
+roaming (0%), försäljning med 12% och 6%, återbetalningar, avgifter,
+abonnemang och utbetalningar, med kWh och tidsstämplar.
+
+Samma seed och radantal ger alltid exakt samma export.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# (transactionName, andel, tecken, momssats, reference, note, laddning, roaming)
+KINDS = (
+    ("Laddning", 0.62, 1, 25, "CHARGE", "", True, False),
+    ("Roaming laddning", 0.12, 1, 0, "ROAMING", "", True, True),
+    ("Försäljning livsmedel", 0.02, 1, 12, "SHOP", "", False, False),
+    ("Persontransport", 0.01, 1, 6, "SHUTTLE", "", False, False),
+    ("Återbetalning laddning", 0.03, -1, 25, "REFUND", "Refund of charge", True, False),
+    ("Laddningsavgift (%)", 0.10, -1, 25, "", "Percentage operator fee", False, False),
+    ("Transaktionsavgifter", 0.07, -1, 0, "", "Platform fee", False, False),
+    ("Roaming transaktionsavgifter", 0.02, -1, 0, "", "Roaming fee", False, True),
+    ("Abonnemang", 0.005, -1, 25, "SUBSCRIPTION", "Monta Operator subscription", False, False),
+    ("Utbetalning", 0.005, -1, 0, "PAYOUT", "Payout to bank account", False, False),
+)
+
+ROAMING_OPERATORS = ("Plugsurfing", "Easypark", "Ionity", "Shell Recharge", "Chargemap")
+
+OPERATOR = "Laddoperatör AB"
+PLATFORM = "Monta ApS"
+
+COLUMNS = (
+    "id", "created", "startTime", "kwh", "amount", "subAmount", "vat", "vatRate",
+    "reference", "note", "roamingOperator", "userName", "from", "to", "transactionName",
+)
+
+# Andel intäktsrader där momsen avviker (ger valideringsvarningar)
+DEFAULT_ERROR_RATE = 0.002
+
+
+def _categorical(codes: np.ndarray, values) -> pd.Categorical:
+    """Kategorikolumn från index i values (som får innehålla dubbletter)"""
+    unique_codes, categories = pd.factorize(pd.Index(list(values)))
+    mapping = np.append(unique_codes, -1)
+    return pd.Categorical.from_codes(mapping[codes], categories=categories)
+
+
+def generate_monta_export(rows: int, seed: int = 0,
+                          start: str = "2025-11-01", days: int = 30,
+                          users: int = 500,
+                          error_rate: float = DEFAULT_ERROR_RATE) -> pd.DataFrame:
+    """
+    Skapar en syntetisk Monta-export.
+
+    Args:
+        rows: Antal transaktioner
+        seed: Slumpfrö
+        start: Första dag (UTC)
+        days: Antal dagar som transaktionerna sprids över
+        users: Antal olika användare
+        error_rate: Andel intäktsrader med felaktig moms
+    """
+    rng = np.random.default_rng(seed)
+
+    shares = np.array([kind[1] for kind in KINDS])
+    kind = rng.choice(len(KINDS), size=rows, p=shares / shares.sum())
+
+    sign = np.array([k[2] for k in KINDS], dtype=np.int64)[kind]
+    rate = np.array([k[3] for k in KINDS], dtype=np.int64)[kind]
+    charging = np.array([k[6] for k in KINDS])[kind]
+    roaming = np.array([k[7] for k in KINDS])[kind]
+
+    # kWh och nettobelopp i öre per typ av transaktion
+    kwh = np.where(charging, np.round(rng.uniform(2.0, 60.0, rows), 3), 0.0)
+    price_per_kwh = rng.uniform(2.5, 6.0, rows)
+    names = [k[0] for k in KINDS]
+    fixed = {
+        "Försäljning livsmedel": rng.uniform(20, 300, rows),
+        "Persontransport": rng.uniform(30, 150, rows),
+        "Laddningsavgift (%)": rng.uniform(1, 40, rows),
+        "Transaktionsavgifter": rng.uniform(0.5, 10, rows),
+        "Roaming transaktionsavgifter": rng.uniform(0.5, 8, rows),
+        "Abonnemang": rng.choice([199.0, 499.0], rows),
+        "Utbetalning": rng.uniform(500, 20000, rows),
+    }
+    net_sek = kwh * price_per_kwh
+    for name, values in fixed.items():
+        selected = kind == names.index(name)
+        net_sek[selected] = values[selected]
+    net = np.rint(net_sek * 100).astype(np.int64)
+    vat = (net * rate + 50) // 100
+
+    # Några intäktsrader med fel moms, som i verkliga exporter
+    broken = (sign > 0) & (rate > 0) & (rng.random(rows) < error_rate)
+    vat[broken] += rng.choice([-1, 1], int(broken.sum())) * rng.integers(3, 200, int(broken.sum()))
+
+    gross = net + vat
+    created = (pd.Timestamp(start, tz="UTC")
+               + pd.to_timedelta(np.sort(rng.integers(0, days * 86400, rows)), unit="s"))
+    duration = np.where(charging, rng.integers(600, 5 * 3600, rows), 0)
+    start_time = created - pd.to_timedelta(duration, unit="s")
+
+    user = rng.integers(0, users, rows)
+    operator = np.where(roaming, rng.integers(0, len(ROAMING_OPERATORS), rows), -1)
+    income = sign > 0
+    parties = (OPERATOR, PLATFORM)
+
+    return pd.DataFrame({
+        "id": np.arange(1_000_000, 1_000_000 + rows, dtype=np.int64),
+        "created": created,
+        "startTime": start_time,
+        "kwh": kwh,
+        "amount": sign * gross / 100,
+        "subAmount": sign * net / 100,
+        "vat": sign * vat / 100,
+        "vatRate": rate.astype(np.float64),
+        "reference": _categorical(kind, [k[4] for k in KINDS]),
+        "note": _categorical(kind, [k[5] for k in KINDS]),
+        "roamingOperator": _categorical(operator, ROAMING_OPERATORS),
+        "userName": _categorical(user, [f"Användare {i:04d}" for i in range(users)]),
+        "from": np.where(income, "Kund", OPERATOR),
+        "to": _categorical(np.where(income, 0, 1), parties),
+        "transactionName": _categorical(kind, names),
+    }, columns=list(COLUMNS)).astype({"from": "category"})
+
+
+def write_export(df: pd.DataFrame, path: str):
+    """Skriver exporten som .xlsx, .csv, .parquet eller .arrow/.feather"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        df.to_csv(path, index=False)
+    elif suffix in (".parquet", ".pq"):
+        df.to_parquet(path, index=False)
+    elif suffix in (".arrow", ".feather"):
+        df.to_feather(path)
+    elif suffix in (".xlsx", ".xlsm"):
+        if len(df) > 1_048_575:
+            raise ValueError("Excel rymmer högst 1 048 575 rader; använd CSV eller Parquet")
+        # Excel saknar tidszoner
+        local = df.copy()
+        for name in ("created", "startTime"):
+            local[name] = local[name].dt.tz_localize(None)
+        local.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Okänt filformat: {suffix}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Syntetisk Monta-export")
+    parser.add_argument("--rows", type=int, default=1000, help="Antal transaktioner")
+    parser.add_argument("--seed", type=int, default=0, help="Slumpfrö")
+    parser.add_argument("--start", default="2025-11-01", help="Första dag (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=30, help="Antal dagar")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_ERROR_RATE,
+                        help="Andel intäktsrader med felaktig moms")
+    parser.add_argument("--output", "-o", required=True,
+                        help="Utfil (.xlsx, .csv, .parquet eller .arrow)")
+    args = parser.parse_args()
+
+    export = generate_monta_export(args.rows, args.seed, args.start, args.days,
+                                   error_rate=args.error_rate)
+    write_export(export, args.output)
+    print(f"{len(export)} transaktioner sparade till {args.output}")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark för rapportens serialisering vid många varningar: finalize
+(totaler, uppdelning av valideringar och _to_dict) samt JSON-utdata med
+json.dumps (tidigare väg), write_json och write_ndjson, med och utan
+orjson. Varningarna är till hälften ValidationError-objekt och till
+hälften rader i valideringstabellen (--table-share).
+
+    python benchmarks/serialization.py --warnings 100k
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCHMARKS_DIR.parent / "scripts"
+sys.path[:0] = [str(SCRIPTS_DIR), str(BENCHMARKS_DIR)]
+
+import numpy as np
+
+from json_writer import FAST_AVAILABLE, write_json, write_ndjson
+from vat_benchmark import parse_size, percentile
+from validators import ValidationCode
+from vat_processor import ValidationError, ValidationTable, VATProcessor, VATReport
+
+DEFAULT_WARNINGS = "100k"
+DEFAULT_OUTPUT = "perf-artifacts/serialization-benchmark.json"
+
+CASES = ("finalize", "json_dumps", "write_json", "write_json_fast", "write_json_compact_fast",
+         "write_ndjson", "write_ndjson_fast")
+
+# Fall som kräver orjson
+FAST_CASES = ("write_json_fast", "write_json_compact_fast", "write_ndjson_fast")
+
+
+def build_report(warnings: int, table_share: float = 0.5, seed: int = 0) -> VATReport:
+    """Rapport med belopp och `warnings` varningar"""
+    rng = np.random.default_rng(seed)
+    report = VATReport("2025-11", "Benchmark AB", "556677-8899",
+                       sales_25=123_456_78, outgoing_vat_25=30_864_20,
+                       purchases_25=12_345_00, incoming_vat=3_086_25)
+
+    table_rows = int(warnings * table_share)
+    net = rng.integers(1_00, 10_000_00, table_rows)
+    # Varannan rad har fel moms, varannan fel bruttobelopp
+    gross = np.arange(table_rows) % 2 == 1
+    expected = net // 4 + np.where(gross, net, 0)
+    report.row_validations = ValidationTable(
+        row_id=np.array([f"tx-{i}" for i in range(table_rows)], dtype=object),
+        check=np.where(gross, ValidationCode.TRANSACTION_GROSS,
+                       ValidationCode.TRANSACTION_VAT).astype(np.uint8),
+        expected=expected,
+        actual=expected + rng.integers(1, 100, table_rows),
+        net=net,
+        percent=np.full(table_rows, 25, dtype=np.uint8),
+    )
+    report.validations = [
+        ValidationError(f"row_{i}", ValidationCode.TEXT,
+                        (f"Belopp saknas eller är ogiltigt på rad {i}",), "warning")
+        for i in range(warnings - table_rows)
+    ]
+    return report
+
+
+def _prepare(case: str, processor: VATProcessor, report: VATReport):
+    """Bygger en funktion som kör fallet en gång"""
+    if case == "finalize":
+        return lambda: processor.finalize(report)
+
+    result = processor.finalize(report)
+    if case == "json_dumps":
+        def dumps(out):
+            out.write(json.dumps(result, indent=2, ensure_ascii=False))
+        return dumps
+    if case.startswith("write_ndjson"):
+        warnings = result["validation"]["warnings"]
+        return lambda out: write_ndjson(warnings, out, fast=case.endswith("_fast"))
+    indent = None if "compact" in case else 2
+    return lambda out: write_json(result, out, indent, fast=case.endswith("_fast"))
+
+
+def run_case(case: str, report: VATReport, runs: int, warmup: int) -> dict:
+    run = _prepare(case, VATProcessor(), report)
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        call = run if case == "finalize" else (lambda: run(devnull))
+        for _ in range(warmup):
+            call()
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "case": case,
+        "status": "ok",
+        "runs": runs,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "min_ms": round(min(samples), 3),
+    }
+
+
+def run_suite(warnings: int, cases: list, table_share: float = 0.5, seed: int = 0,
+              runs: int = 5, warmup: int = 1) -> dict:
+    """Kör alla fall och returnerar artefakten"""
+    report = build_report(warnings, table_share, seed)
+    results = []
+    for case in cases:
+        if case in FAST_CASES and not FAST_AVAILABLE:
+            result = {"case": case, "status": "skipped", "reason": "orjson är inte installerat"}
+        else:
+            result = run_case(case, report, runs, warmup)
+        print(_summary_line(result), file=sys.stderr)
+        results.append(result)
+
+    return {
+        "benchmark": "serialization",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "warnings": warnings,
+        "table_share": table_share,
+        "results": results,
+    }
+
+
+def _summary_line(result: dict) -> str:
+    label = f"{result['case']:<24}"
+    if result["status"] != "ok":
+        return f"{label}  {result['status']}: {result['reason']}"
+    return f"{label}  p50 {result['p50_ms']:10.1f} ms  p95 {result['p95_ms']:10.1f} ms"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark för serialisering av momsrapporter")
+    parser.add_argument("--warnings", default=DEFAULT_WARNINGS,
+                        help=f"Antal varningar (standard: {DEFAULT_WARNINGS})")
+    parser.add_argument("--table-share", type=float, default=0.5,
+                        help="Andel varningar från valideringstabellen (standard: 0.5)")
+    parser.add_argument("--cases", default=",".join(CASES),
+                        help="Fall att köra, kommaseparerat")
+    parser.add_argument("--runs", type=int, default=5, help="Mätningar per fall")
+    parser.add_argument("--warmup", type=int, default=1, help="Uppvärmningskörningar per fall")
+    parser.add_argument("--seed", type=int, default=0, help="Slumpfrö")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT, help="JSON-artefakt")
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = sorted(set(cases) - set(CASES))
+    if unknown:
+        parser.error(f"okända fall: {', '.join(unknown)}")
+
+    artifact = run_suite(parse_size(args.warnings), cases, args.table_share,
+                         args.seed, args.runs, args.warmup)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(artifact, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"Resultat sparat till {output}", file=sys.stderr)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Startbenchmark för svensk-ekonomi-skripten.
+Mäter importtiden för vat_processor, validators och sie_export i nya
+processer och misslyckas om någon överskrider sin budget eller laddar
+tunga beroenden (pandas, numpy, openpyxl, pyarrow) redan vid import.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+# Importtid i millisekunder (utan själva tolkens uppstart)
+IMPORT_BUDGET_MS = {
+    "vat_processor": 150,
+    "validators": 100,
+    "sie_export": 100,
+}
+
+# Total tid för `vat_processor.py --help`, inklusive tolkens uppstart
+HELP_BUDGET_MS = 250
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow")
+
+_MEASURE = """
+import json, sys, time
+sys.path.insert(0, {scripts!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000,
+                  "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module: str, runs: int) -> dict:
+    """Median av importtiden över runs nya processer"""
+    code = _MEASURE.format(scripts=str(SCRIPTS_DIR), module=module, heavy=HEAVY_MODULES)
+    samples = []
+    heavy = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output)
+        samples.append(result["ms"])
+        heavy.update(result["heavy"])
+    return {"ms": statistics.median(samples), "heavy": sorted(heavy)}
+
+
+def measure_help(runs: int) -> float:
+    """Median av total tid för vat_processor.py --help"""
+    code = (
+        "import subprocess, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"subprocess.run([sys.executable, {str(SCRIPTS_DIR / 'vat_processor.py')!r}, '--help'],"
+        " check=True, capture_output=True)\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    samples = [
+        float(subprocess.run([sys.executable, "-c", code], check=True,
+                             capture_output=True, text=True).stdout)
+        for _ in range(runs)
+    ]
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startbenchmark för svensk-ekonomi")
+    parser.add_argument("--runs", type=int, default=5, help="Antal mätningar per modul")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiplicera alla budgetar (t.ex. 2 på en långsam maskin)")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in IMPORT_BUDGET_MS.items():
+        result = measure_import(module, args.runs)
+        limit = budget * args.budget_scale
+        print(f"{module:<14} {result['ms']:7.1f} ms (budget {limit:.0f} ms)")
+        if result["ms"] > limit:
+            failures.append(f"{module}: {result['ms']:.1f} ms > {limit:.0f} ms")
+        if result["heavy"]:
+            failures.append(f"{module}: laddar {', '.join(result['heavy'])} vid import")
+
+    help_ms = measure_help(args.runs)
+    limit = HELP_BUDGET_MS * args.budget_scale
+    print(f"{'--help':<14} {help_ms:7.1f} ms (budget {limit:.0f} ms)")
+    if help_ms > limit:
+        failures.append(f"vat_processor.py --help: {help_ms:.1f} ms > {limit:.0f} ms")
+
+    for failure in failures:
+        print(f"FEL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
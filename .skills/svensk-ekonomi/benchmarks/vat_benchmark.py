@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmarksvit för momsflödet på syntetiska Monta-exporter.
+Mäter process_transactions (båda motorerna), TransactionValidator och
+SIE-export vid flera storlekar och skriver en JSON-artefakt med p50/p95
+och minnestopp (peak RSS) per fall.
+
+Varje fall körs i en egen process så att minnestoppen inte påverkas av
+tidigare fall. Radvisa fall (scalar och TransactionValidator) hoppas över
+över --row-loop-max-rows, eftersom de tar minuter vid miljontals rader.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCHMARKS_DIR.parent / "scripts"
+
+DEFAULT_SIZES = "1k,100k,5M"
+DEFAULT_OUTPUT = "perf-artifacts/vat-benchmark.json"
+
+CASES = ("process_vectorized", "process_scalar", "validators", "sie_export")
+
+# Fall som går rad för rad i Python
+ROW_LOOP_CASES = ("process_scalar", "validators")
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    """'1k' -> 1000, '5M' -> 5000000, '250' -> 250"""
+    text = text.strip().lower().replace("_", "")
+    if text[-1:] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def percentile(values: list, p: float) -> float:
+    """Närmaste rang, som benchmark-gemini-chat.mjs"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * p // 100) - 1))
+    return ordered[int(index)]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss är i byte på macOS och i KiB på Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _prepare(case: str, df):
+    """Bygger en funktion som kör fallet en gång på df"""
+    from vat_processor import VATProcessor
+
+    processor = VATProcessor()
+    if case in ("process_vectorized", "process_scalar"):
+        engine = case.split("_", 1)[1]
+        return lambda: processor.process_transactions(df, engine=engine, max_warnings=100)
+
+    if case == "validators":
+        from validators import TransactionValidator
+
+        validator = TransactionValidator()
+        columns = ["amount", "subAmount", "vat", "vatRate", "kwh", "transactionName"]
+        records = df[columns].to_dict("records")
+        return lambda: [validator.validate_ev_charging_transaction(record) for record in records]
+
+    if case == "sie_export":
+        from sie_export import SIEExporter
+
+        def export():
+            journal = processor.create_journal(df)
+            exporter = SIEExporter("Benchmark AB", "556677-8899")
+            exporter.add_journal(journal)
+            return exporter.export(2025)
+        return export
+
+    raise ValueError(f"Okänt fall: {case}")
+
+
+def _run_case(case: str, rows: int, seed: int, runs: int, warmup: int) -> dict:
+    """Körs i en egen process; genererar data och mäter fallet"""
+    sys.path[:0] = [str(SCRIPTS_DIR), str(BENCHMARKS_DIR)]
+    from monta_export import generate_monta_export
+
+    df = generate_monta_export(rows, seed)
+    baseline_rss = _peak_rss_mb()
+    run = _prepare(case, df)
+
+    for _ in range(warmup):
+        run()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    p50 = percentile(samples, 50)
+    return {
+        "case": case,
+        "rows": rows,
+        "status": "ok",
+        "runs": runs,
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "avg_ms": round(sum(samples) / len(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "rows_per_s": round(rows / (p50 / 1000)) if p50 else None,
+        "input_rss_mb": round(baseline_rss, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _case_worker(queue, *args):
+    try:
+        queue.put(_run_case(*args))
+    except Exception as e:
+        queue.put({"case": args[0], "rows": args[1], "status": "error",
+                   "error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(case: str, rows: int, seed: int, runs: int, warmup: int) -> dict:
+    """Kör ett fall i en ny process (spawn) och returnerar resultatet"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_case_worker, args=(queue, case, rows, seed, runs, warmup))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run_suite(sizes: list, cases: list, seed: int = 0, runs: int = 5, warmup: int = 1,
+              row_loop_max_rows: int = 100_000) -> dict:
+    """Kör alla fall för alla storlekar och returnerar artefakten"""
+    results = []
+    for rows in sizes:
+        # Färre upprepningar för stora storlekar så att sviten blir klar
+        size_runs = runs if rows <= 100_000 else max(1, min(runs, 3))
+        for case in cases:
+            if case in ROW_LOOP_CASES and rows > row_loop_max_rows:
+                result = {"case": case, "rows": rows, "status": "skipped",
+                          "reason": f"radvis loop över {row_loop_max_rows} rader"}
+            else:
+                result = run_isolated(case, rows, seed, size_runs, warmup if rows <= 100_000 else 0)
+            print(_summary_line(result), file=sys.stderr)
+            results.append(result)
+
+    return {
+        "benchmark": "vat_processor",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def _summary_line(result: dict) -> str:
+    label = f"{result['case']:<20} {result['rows']:>9}"
+    if result["status"] != "ok":
+        return f"{label}  {result['status']}: {result.get('reason') or result.get('error')}"
+    return (f"{label}  p50 {result['p50_ms']:10.1f} ms  p95 {result['p95_ms']:10.1f} ms  "
+            f"topp {result['peak_rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark för momsflödet")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Antal rader, kommaseparerat (standard: {DEFAULT_SIZES})")
+    parser.add_argument("--cases", default=",".join(CASES),
+                        help="Fall att köra, kommaseparerat")
+    parser.add_argument("--runs", type=int, default=5, help="Mätningar per fall")
+    parser.add_argument("--warmup", type=int, default=1, help="Uppvärmningskörningar per fall")
+    parser.add_argument("--seed", type=int, default=0, help="Slumpfrö för genereringen")
+    parser.add_argument("--row-loop-max-rows", type=int, default=100_000,
+                        help="Hoppa över radvisa fall över så många rader")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT, help="JSON-artefakt")
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(",") if case.strip()]
+    unknown = sorted(set(cases) - set(CASES))
+    if unknown:
+        parser.error(f"okända fall: {', '.join(unknown)}")
+
+    artifact = run_suite([parse_size(size) for size in args.sizes.split(",")], cases,
+                         args.seed, args.runs, args.warmup, args.row_loop_max_rows)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(artifact, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"Resultat sparat till {output}", file=sys.stderr)
+    sys.exit(1 if any(r["status"] == "error" for r in artifact["results"]) else 0)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Klassning av transaktioner efter motpart (references/vat_rules.md):
+inrikes, inkommande och utgående roaming, omvänd skattskyldighet inom EU,
+export samt inköp av tjänster utanför EU.
+
+Klassningen görs kolumnvis över hela tabellen. Motparter slås upp i en
+indexerad motpartstabell en gång per unikt namn och resultatet sprids
+tillbaka till raderna, så kostnaden styrs av antalet motparter och inte
+av antalet rader.
+"""
+
+import csv
+import json
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from constants import COUNTERPART_COLUMN, COUNTRY_COLUMN, ROAMING_COLUMN
+
+# Klasskoder (uint8), index i CLASSES
+DOMESTIC = 0           # inrikes, svensk moms
+ROAMING_IN = 1         # intäkt från svensk eMSP (du är CPO)
+ROAMING_OUT = 2        # kostnad till svensk CPO (du är eMSP)
+EU_REVERSE_CHARGE = 3  # motpart i annat EU-land: omvänd skattskyldighet
+EXPORT = 4             # intäkt från motpart utanför EU: momsfri export
+IMPORT = 5             # kostnad till motpart utanför EU: omvänd skattskyldighet
+CLASSES = ("domestic", "roaming_in", "roaming_out", "eu_reverse_charge", "export", "import")
+
+HOME_COUNTRY = "SE"
+
+# EU:s medlemsländer (ISO 3166); Grekland även som EL (prefix i VAT-nummer)
+EU_COUNTRIES = frozenset((
+    "AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "ES", "FI", "FR", "GR", "EL",
+    "HR", "HU", "IE", "IT", "LT", "LU", "LV", "MT", "NL", "PL", "PT", "RO", "SE",
+    "SI", "SK",
+))
+
+INPUT_COLUMNS = (COUNTERPART_COLUMN, COUNTRY_COLUMN, ROAMING_COLUMN)
+
+# Motpartens hemvist
+_HOME, _EU, _OTHER = 0, 1, 2
+
+_TRUE = frozenset(("1", "true", "yes", "ja", "x"))
+
+
+def _factorize(values) -> tuple:
+    """
+    (koder, unika värden) för en kolumn; kategorikolumner används som de
+    är. Kod -1 betyder saknat värde.
+    """
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), np.asarray(values.cat.categories, dtype=object)
+    codes, uniques = pd.factorize(values)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _broadcast(per_value: np.ndarray, codes: np.ndarray, missing) -> np.ndarray:
+    """Värde per rad från värde per unikt värde; saknade rader får missing"""
+    return np.append(per_value, np.array(missing, dtype=per_value.dtype))[codes]
+
+
+def _text(uniques: np.ndarray) -> pd.Series:
+    return pd.Series(uniques, dtype=object).astype("string").str.strip()
+
+
+def _normalize_names(values) -> pd.Series:
+    """Namn för uppslag: trimmade och utan skillnad på versaler"""
+    return _text(np.asarray(values, dtype=object)).str.casefold()
+
+
+def _country_scopes(countries: np.ndarray) -> np.ndarray:
+    """Hemvist per land; okänt eller tomt land räknas som Sverige"""
+    return np.array([_HOME if pd.isna(country) or not country or country == HOME_COUNTRY
+                     else _EU if country in EU_COUNTRIES else _OTHER
+                     for country in _text(countries).str.upper()], dtype=np.uint8)
+
+
+def _filled(uniques: np.ndarray) -> np.ndarray:
+    """Ifyllda värden (inte tom text) bland unika värden"""
+    return (_text(uniques) != "").fillna(False).to_numpy(dtype=bool)
+
+
+class CounterpartTable:
+    """
+    Motparter med land och om de är roamingpartner, indexerade på
+    normaliserat namn. Läses med from_file från CSV (kolumnerna
+    counterpart, country, roaming) eller JSON (lista med samma nycklar).
+    """
+
+    def __init__(self, counterparts: dict):
+        """
+        Args:
+            counterparts: namn -> (land, roaming), t.ex. {"Plugsurfing": ("DE", True)}
+        """
+        names = _normalize_names(list(counterparts))
+        entries = list(counterparts.values())
+        self.names = list(counterparts)
+        self._index = pd.Index(names)
+        if not self._index.is_unique:
+            duplicated = sorted(set(names[self._index.duplicated()]))
+            raise ValueError(f"Motparter förekommer flera gånger: {', '.join(duplicated)}")
+        self._scope = _country_scopes(np.array([country for country, _ in entries], dtype=object))
+        self._roaming = np.array([bool(roaming) for _, roaming in entries], dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @classmethod
+    def from_records(cls, records: list) -> "CounterpartTable":
+        counterparts = {}
+        for record in records:
+            name = str(record.get("counterpart") or record.get("name") or "").strip()
+            if not name:
+                raise ValueError(f"Motpartsrad saknar namn: {record}")
+            roaming = record.get("roaming")
+            if not isinstance(roaming, bool):
+                roaming = str(roaming or "").strip().lower() in _TRUE
+            counterparts[name] = (str(record.get("country") or "").strip(), roaming)
+        return cls(counterparts)
+
+    @classmethod
+    def from_file(cls, path: str) -> "CounterpartTable":
+        with open(path, encoding="utf-8", newline="") as f:
+            if path.lower().endswith(".json"):
+                records = json.load(f)
+            else:
+                records = list(csv.DictReader(f))
+        return cls.from_records(records)
+
+    def lookup(self, names) -> tuple:
+        """
+        (hemvist, roaming, känd) per namn i names. Namnen bör vara unika,
+        t.ex. kategorierna i en kolumn; resultatet sprids sedan till raderna.
+        """
+        positions = self._index.get_indexer(_normalize_names(names))
+        known = positions >= 0
+        scope = np.where(known, self._scope[positions], _HOME).astype(np.uint8)
+        roaming = known & self._roaming[positions]
+        return scope, roaming, known
+
+
+def classify(df: pd.DataFrame, counterparts: Optional[CounterpartTable] = None) -> np.ndarray:
+    """
+    Klass per rad (uint8, index i CLASSES).
+
+    Roaming: ROAMING_COLUMN är ifylld, eller motparten är roamingpartner i
+    tabellen. Land: COUNTRY_COLUMN om den är ifylld, annars motpartens land
+    i tabellen; okänt land räknas som Sverige. Motparten slås upp i tabellen
+    på både COUNTERPART_COLUMN och ROAMING_COLUMN, där en känd motpart i
+    COUNTERPART_COLUMN går före. Intäkter är rader med amount > 0.
+    """
+    rows = len(df)
+    classes = np.zeros(rows, dtype=np.uint8)
+    if not rows or not (counterparts or any(name in df.columns for name in INPUT_COLUMNS)):
+        return classes
+
+    # Alla textkontroller och uppslag görs per unikt värde och sprids till raderna
+    roaming = np.zeros(rows, dtype=bool)
+    if ROAMING_COLUMN in df.columns:
+        operator_codes, operators = _factorize(df[ROAMING_COLUMN])
+        operator_filled = _filled(operators)
+        roaming = _broadcast(operator_filled, operator_codes, False)
+
+    scope = np.full(rows, _HOME, dtype=np.uint8)
+    if counterparts:
+        lookups = []
+        if COUNTERPART_COLUMN in df.columns:
+            codes, names = _factorize(df[COUNTERPART_COLUMN])
+            lookups.append((codes, names, _filled(names)))
+        if ROAMING_COLUMN in df.columns:
+            lookups.append((operator_codes, operators, operator_filled))
+        # Motpartskolumnen går före roamingoperatören
+        for codes, names, filled in reversed(lookups):
+            table_scope, table_roaming, known = counterparts.lookup(names)
+            row_known = _broadcast(known & filled, codes, False)
+            scope = np.where(row_known, _broadcast(table_scope, codes, _HOME), scope)
+            roaming |= _broadcast(table_roaming, codes, False)
+
+    if COUNTRY_COLUMN in df.columns:
+        codes, countries = _factorize(df[COUNTRY_COLUMN])
+        row_stated = _broadcast(_filled(countries), codes, False)
+        scope = np.where(row_stated, _broadcast(_country_scopes(countries), codes, _HOME), scope)
+
+    amount = df["amount"]
+    if amount.dtype.kind not in "iuf":
+        amount = pd.to_numeric(amount, errors="coerce")
+    income = (amount > 0).to_numpy(dtype=bool)
+    return np.select(
+        [scope == _EU, (scope == _OTHER) & income, scope == _OTHER, roaming & income, roaming],
+        [EU_REVERSE_CHARGE, EXPORT, IMPORT, ROAMING_IN, ROAMING_OUT],
+        DOMESTIC,
+    ).astype(np.uint8)
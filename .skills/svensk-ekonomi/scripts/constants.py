@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Namn som delas av processorn och modulerna den laddar vid behov (läsare,
+klassning, motpartsregister, dubblettkontroll). Modulen importerar inget,
+så vat_processor kan läsa den vid start utan att ladda pandas.
+"""
+
+# Indatakolumner
+ID_COLUMN = "id"
+DATE_COLUMN = "date"
+# Styr datumberoende momssats
+CATEGORY_COLUMN = "vatCategory"
+COUNTERPART_COLUMN = "counterpart"
+# Motpartens land per rad (ISO-kod); går före motpartstabellen
+COUNTRY_COLUMN = "counterpartCountry"
+# Montas roamingkolumn: ifylld för roamingtransaktioner, med operatörens namn
+ROAMING_COLUMN = "roamingOperator"
+# Motparternas nummer, som valideras en gång per unikt nummer
+VAT_NUMBER_COLUMN = "counterpartVatNumber"
+ORG_NUMBER_COLUMN = "counterpartOrgNumber"
+
+# Hantering av upprepade transaktioner: report summerar men varnar, drop tar
+# bort dubbletterna (första förekomsten behålls) och varnar, off kontrollerar inte
+DUPLICATE_POLICIES = ("report", "drop", "off")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Motpartsregister: validerar motparternas VAT- och organisationsnummer.
+
+Monta-exporter upprepar några hundra motparter (eMSP:er, plattformar) på
+hundratusentals rader. Registret validerar varje unikt nummer en gång och
+sprider resultatet till raderna. Resultaten sparas i en begränsad cache
+(LRU) som delas av alla processorer i samma process, så samma motpart
+valideras inte om för varje fil eller bit. Cachen delas inte mellan
+processer: i process_many med flera workers (ProcessPoolExecutor) har
+varje arbetsprocess sin egen, som bara delas av de jobb den kör.
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from classification import EU_COUNTRIES
+from constants import COUNTERPART_COLUMN, COUNTRY_COLUMN, ORG_NUMBER_COLUMN, VAT_NUMBER_COLUMN
+from validators import ValidationCode
+
+# Identifierarkolumn -> slag av nummer
+IDENTIFIER_COLUMNS = {VAT_NUMBER_COLUMN: "vat_number", ORG_NUMBER_COLUMN: "org_number"}
+
+# Antal unika nummer som cachen minns
+DEFAULT_CACHE_SIZE = 65_536
+
+# Landsprefix i VAT-nummer inom EU (Grekland använder EL)
+_EU_VAT_PREFIXES = frozenset((
+    "AT", "BE", "BG", "CY", "CZ", "DE", "DK", "EE", "EL", "ES", "FI", "FR", "HR",
+    "HU", "IE", "IT", "LT", "LU", "LV", "MT", "NL", "PL", "PT", "RO", "SI", "SK",
+))
+_EU_VAT_PATTERN = re.compile(r"^[A-Z]{2}[0-9A-Z+*]{2,12}$")
+# Landsprefix utanför EU (t.ex. NO…MVA, GB, CH) kontrolleras inte här
+_COUNTRY_PREFIX = re.compile(r"^[A-Z]{2}")
+_SEPARATORS = re.compile(r"[\s.\-]")
+
+
+def _identifier_text(value) -> str:
+    """Nummer som text; heltal lästa som flyttal (Excel) blir heltal"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+@dataclass
+class CounterpartIssues:
+    """Ogiltiga nummer i en bit indata"""
+    issues: list          # (slag, nummer, motpart, ValidationCode, nyttolast) per problem
+    rows: np.ndarray      # radpositioner med ogiltigt nummer
+    issue: np.ndarray     # index i issues per rad i rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class CounterpartRegistry:
+    """
+    Validerar VAT- och organisationsnummer med en begränsad LRU-cache.
+    validators är SwedishValidators (vat_number_issue, org_number_issue). Fel
+    är (ValidationCode, nyttolast); utländska VAT-nummer får koderna
+    VAT_NUMBER_NO_COUNTRY, VAT_NUMBER_EU_COUNTRY och VAT_NUMBER_EU_FORMAT.
+    """
+
+    def __init__(self, validators, max_size: int = DEFAULT_CACHE_SIZE):
+        self.validators = validators
+        self.max_size = max_size
+        # (slag, normaliserat nummer) -> (kod, nyttolast), None om giltigt
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _check(self, kind: str, identifier: str) -> Optional[tuple]:
+        if kind == "org_number":
+            return self.validators.org_number_issue(identifier)
+
+        prefix = identifier[:2]
+        if prefix == "SE":
+            return self.validators.vat_number_issue(identifier)
+        if prefix not in _EU_VAT_PREFIXES:
+            return (None if _COUNTRY_PREFIX.match(identifier)
+                    else (ValidationCode.VAT_NUMBER_NO_COUNTRY, ()))
+        if not _EU_VAT_PATTERN.match(identifier):
+            return ValidationCode.VAT_NUMBER_EU_FORMAT, (prefix,)
+        return None
+
+    def validate(self, kind: str, identifier: str) -> Optional[tuple]:
+        """Felet i numret som (kod, nyttolast), None om det är giltigt"""
+        key = (kind, _SEPARATORS.sub("", identifier).upper())
+        try:
+            issue = self._cache[key]
+        except KeyError:
+            self.misses += 1
+            issue = self._check(kind, key[1])
+            self._cache[key] = issue
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+            return issue
+        self.hits += 1
+        self._cache.move_to_end(key)
+        return issue
+
+    def check(self, df: pd.DataFrame) -> CounterpartIssues:
+        """
+        Ogiltiga nummer i df, ett problem per (nummer, motpart). Varje unikt
+        nummer valideras en gång och resultatet sprids till raderna. Ett
+        VAT-nummer med landsprefix utanför EU är bara fel på rader där
+        COUNTRY_COLUMN anger ett EU-land.
+        """
+        issues = []
+        rows = []
+        issue = []
+        for column, kind in IDENTIFIER_COLUMNS.items():
+            if column not in df.columns:
+                continue
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes = values.cat.codes.to_numpy()
+                uniques = values.cat.categories.to_numpy(dtype=object)
+            else:
+                codes, uniques = pd.factorize(values)
+                uniques = np.asarray(uniques, dtype=object)
+
+            texts = [_identifier_text(value) for value in uniques.tolist()]
+            found = [self.validate(kind, text) if text else None for text in texts]
+            invalid_unique = np.array([issue is not None for issue in found] + [False])
+            invalid = invalid_unique[codes]
+            if kind == "vat_number" and COUNTRY_COLUMN in df.columns:
+                invalid |= self._outside_eu_prefix(df, codes, texts, found)
+            positions = np.flatnonzero(invalid)
+            if not len(positions):
+                continue
+
+            # Ett problem per (nummer, motpart) bland de ogiltiga raderna
+            if COUNTERPART_COLUMN in df.columns:
+                names = df[COUNTERPART_COLUMN].to_numpy()[positions]
+                names = pd.Series(names, dtype=object).fillna("").astype(str).str.strip().to_numpy()
+            else:
+                names = np.full(len(positions), "", dtype=object)
+            name_codes, name_values = pd.factorize(names)
+            pairs, inverse = np.unique(codes[positions].astype(np.int64) * len(name_values) + name_codes,
+                                       return_inverse=True)
+            for pair in pairs.tolist():
+                code, name = divmod(pair, len(name_values))
+                issues.append((kind, texts[code], str(name_values[name]), *found[code]))
+            rows.append(positions)
+            issue.append(inverse.reshape(-1) + len(issues) - len(pairs))
+
+        if not rows:
+            return CounterpartIssues([], np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp))
+        return CounterpartIssues(issues, np.concatenate(rows), np.concatenate(issue))
+
+    @staticmethod
+    def _outside_eu_prefix(df: pd.DataFrame, codes: np.ndarray, texts: list,
+                           found: list) -> np.ndarray:
+        """
+        Rader vars VAT-nummer har landsprefix utanför EU fast motpartens land
+        är ett EU-land. Numrens fel i found fylls i för dem.
+        """
+        prefixes = [_SEPARATORS.sub("", text).upper()[:2] for text in texts]
+        outside = np.array([issue is None and bool(_COUNTRY_PREFIX.match(prefix))
+                            and prefix != "SE" and prefix not in _EU_VAT_PREFIXES
+                            for prefix, issue in zip(prefixes, found)] + [False])
+        countries = df[COUNTRY_COLUMN]
+        if isinstance(countries.dtype, pd.CategoricalDtype):
+            country_codes = countries.cat.codes.to_numpy()
+            country_values = countries.cat.categories.to_numpy(dtype=object)
+        else:
+            country_codes, country_values = pd.factorize(countries)
+        in_eu = pd.Series(country_values, dtype=object).astype("string").str.strip().str.upper()
+        in_eu = np.append(in_eu.isin(EU_COUNTRIES).to_numpy(dtype=bool), False)
+        rows = outside[codes] & in_eu[country_codes]
+        for code in np.unique(codes[rows]).tolist():
+            found[code] = (ValidationCode.VAT_NUMBER_EU_COUNTRY, ())
+        return rows
+
+
+_shared = None
+
+
+def shared_registry(validators) -> CounterpartRegistry:
+    """
+    Registret som delas av alla processorer i den här processen. Varje
+    arbetsprocess i process_many får sitt eget (cachen är per process).
+    """
+    global _shared
+    if _shared is None or _shared.validators is not validators:
+        _shared = CounterpartRegistry(validators)
+    return _shared
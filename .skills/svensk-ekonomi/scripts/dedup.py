@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Dubblettkontroll för transaktioner som läses från flera, delvis
+överlappande exporter (t.ex. två Monta-exporter som delar några dagar).
+
+Varje rad får en 64-bitars nyckel: hash av id, eller av innehållet
+(belopp, momssats, datum m.m.) när id saknas. Nycklarna hålls i ett
+hashindex över hela körningen, så kontrollen är linjär i antalet rader
+oavsett hur många filer och bitar som läses.
+
+Mellan körningar (månader) minns SeenStore nycklarna på disk: ett
+Bloomfilter avgör snabbt vilka nycklar som kan ha setts, och en sorterad
+nyckelfil bekräftar dem exakt. Båda läses via memmap.
+"""
+
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from validators import ValidationCode
+
+# Olika hashnycklar (16 tecken) så att id- och innehållsnycklar aldrig blandas ihop
+_ID_HASH_KEY = "veridat-dedup-id"
+_CONTENT_HASH_KEY = "veridat-dedup-co"
+
+# Kolumner som jämförs för rader utan id (de som finns i indata)
+CONTENT_COLUMNS = ("amount", "subAmount", "vat", "vatRate", "kwh", "date", "created",
+                   "vatCategory", "counterpart", "transactionName", "userName")
+_AMOUNT_COLUMNS = ("amount", "subAmount", "vat", "vatRate", "kwh")
+
+# Antal id som visas per varning
+MAX_LISTED_IDS = 5
+
+def _id_text(value) -> str:
+    """Id som text; heltal lästa som flyttal (Excel, CSV med tomma id) blir heltal"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _has_id(ids: pd.Series) -> np.ndarray:
+    present = ids.notna().to_numpy(dtype=bool)
+    if ids.dtype.kind not in "iufb":
+        # Tomma textceller räknas som saknat id
+        text = ids.astype(pd.StringDtype()).str.strip()
+        present = present & (text != "").fillna(False).to_numpy(dtype=bool)
+    return present
+
+
+def _id_hashes(ids: pd.Series) -> np.ndarray:
+    # Id hashas som text (som readers läser dem), så att samma id ger samma
+    # nyckel oavsett om det kommer som tal eller text
+    if isinstance(ids.dtype, pd.StringDtype):
+        text = ids.str.strip().to_numpy(dtype=object)
+    else:
+        text = np.array(list(map(_id_text, ids.tolist())), dtype=object)
+    return pd.util.hash_array(text, hash_key=_ID_HASH_KEY, categorize=False)
+
+
+def _content_hashes(df: pd.DataFrame) -> np.ndarray:
+    columns = {}
+    for name in CONTENT_COLUMNS:
+        if name not in df.columns:
+            continue
+        if name in _AMOUNT_COLUMNS:
+            # Samma belopp ska ge samma nyckel oavsett om det lästs som text eller tal
+            columns[name] = pd.to_numeric(df[name], errors="coerce").round(3)
+        else:
+            columns[name] = df[name].astype(str)
+    content = pd.DataFrame(columns, index=df.index)
+    if not len(content.columns):
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(content, index=False, hash_key=_CONTENT_HASH_KEY).to_numpy()
+
+
+def transaction_keys(df: pd.DataFrame) -> tuple:
+    """
+    Nyckel per rad (uint64) och om nyckeln bygger på id (annars på innehåll).
+    Nycklarna är stabila mellan processer och körningar.
+    """
+    if "id" in df.columns:
+        by_id = _has_id(df["id"])
+    else:
+        by_id = np.zeros(len(df), dtype=bool)
+
+    keys = np.zeros(len(df), dtype=np.uint64)
+    if by_id.any():
+        keys[by_id] = _id_hashes(df["id"][by_id])
+    if not by_id.all():
+        keys[~by_id] = _content_hashes(df[~by_id])
+    return keys, by_id
+
+
+@dataclass
+class Duplicates:
+    """Dubbletter i en bit indata"""
+    source: str
+    mask: np.ndarray          # True för rader som redan setts (första förekomsten är False)
+    first_source: np.ndarray  # källa där varje dubblett sågs först (för raderna i mask)
+    by_id: np.ndarray         # om dubbletten matchades på id (annars på innehåll)
+    # om dubbletten redovisades i en tidigare körning; first_source är då etiketten
+    replayed: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.mask.sum())
+
+    def issues(self, row_ids: np.ndarray, rows: Optional[np.ndarray] = None) -> list:
+        """
+        En varning per källa där dubbletterna sågs först, som (kod, nyttolast)
+        med ValidationCode.DUPLICATES_* och nyttolasten utan borttagna:
+        (antal, källa, först, id, fler). row_ids är id för dubblettraderna;
+        rows begränsar till en delmängd av dem (index i row_ids), t.ex. en
+        period. Rader utan id listas som None.
+        """
+        if rows is None:
+            rows = np.arange(len(row_ids))
+        replayed = (self.replayed if self.replayed is not None
+                    else np.zeros(len(self.first_source), dtype=bool))
+        issues = []
+        groups = zip(self.first_source[rows].tolist(), replayed[rows].tolist())
+        for first, earlier_run in dict.fromkeys(groups):
+            selected = rows[(self.first_source[rows] == first) & (replayed[rows] == earlier_run)]
+            listed = tuple(str(row_ids[i]) if self.by_id[i] else None
+                           for i in selected[:MAX_LISTED_IDS])
+            code = (ValidationCode.DUPLICATES_REPLAYED if earlier_run
+                    else ValidationCode.DUPLICATES_WITHIN if first == self.source
+                    else ValidationCode.DUPLICATES_ACROSS)
+            issues.append((code, (len(selected), self.source, first, listed,
+                                  len(selected) > MAX_LISTED_IDS)))
+        return issues
+
+
+class DuplicateIndex:
+    """
+    Hashindex över alla transaktioner som lästs i en körning. check() på en
+    bit i taget hittar upprepade rader både inom biten och mot tidigare bitar
+    och filer, i linjär tid.
+
+    Nya nycklar läggs in i hashtabellen först när nästa bit kontrolleras,
+    så en körning med en enda bit bygger aldrig tabellen.
+
+    Med en SeenStore kontrolleras också tidigare körningar: en rad vars
+    nyckel finns i storen under en annan etikett (period) än radens räknas
+    som redan redovisad. Samma period kan alltså köras om utan varningar.
+    commit() sparar körningens nya nycklar i storen.
+    """
+
+    def __init__(self, store: Optional["SeenStore"] = None):
+        # nyckel -> index i self.sources där nyckeln sågs först
+        self._first = {}
+        # (nycklar, källindex) som ännu inte lagts in i _first
+        self._pending = []
+        # (nycklar, etiketter) som ska sparas i storen vid commit()
+        self._new = []
+        self.sources = []
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self._first) + sum(len(keys) for keys, _ in self._pending)
+
+    def _flush(self):
+        for keys, source_index in self._pending:
+            self._first.update(dict.fromkeys(keys.tolist(), source_index))
+        self._pending = []
+
+    def _replayed(self, keys: np.ndarray, labels) -> np.ndarray:
+        """Etikettindex i storen för nycklar redovisade under en annan etikett, annars -1"""
+        found = self.store.lookup(keys)
+        known = np.flatnonzero(found >= 0)
+        if len(known):
+            stored = np.array(self.store.labels, dtype=object)[found[known]]
+            current = labels if np.ndim(labels) == 0 else labels[known]
+            found[known[stored == current]] = -1
+        return found
+
+    def check(self, df: pd.DataFrame, source: str = "", labels=None) -> Duplicates:
+        """
+        Markerar rader i df som redan setts och lägger till de nya i indexet.
+        labels är etiketten (perioden) för hela biten eller en array per rad,
+        och används bara med en SeenStore.
+        """
+        self._flush()
+        keys, by_id = transaction_keys(df)
+
+        if self._first:
+            seen = np.fromiter(map(self._first.__contains__, keys.tolist()),
+                               dtype=bool, count=len(keys))
+        else:
+            seen = np.zeros(len(keys), dtype=bool)
+        mask = seen | pd.Series(keys).duplicated().to_numpy()
+
+        replayed = np.zeros(len(keys), dtype=bool)
+        if self.store is not None and labels is not None:
+            labels = labels if np.ndim(labels) == 0 else np.asarray(labels, dtype=object)
+            fresh = np.flatnonzero(~mask)
+            row_labels = labels if np.ndim(labels) == 0 else labels[fresh]
+            stored = self._replayed(keys[fresh], row_labels)
+            replayed[fresh[stored >= 0]] = True
+            kept = ~mask & ~replayed
+            self._new.append((keys[kept], labels if np.ndim(labels) == 0 else labels[kept]))
+
+        if source not in self.sources:
+            self.sources.append(source)
+        source_index = self.sources.index(source)
+        self._pending.append((keys[~mask], source_index))
+
+        # Upprepningar inom biten sågs först i denna källa, övriga i en tidigare
+        first = np.full(int(mask.sum()), source_index, dtype=np.intp)
+        earlier = seen[mask]
+        first[earlier] = list(map(self._first.__getitem__, keys[mask][earlier].tolist()))
+        first_source = np.array(self.sources, dtype=object)[first]
+        if replayed.any():
+            # Redovisade i tidigare körning: etiketten står i stället för källan
+            stored_labels = np.array(self.store.labels, dtype=object)
+            first_source = np.empty(len(keys), dtype=object)
+            first_source[mask] = np.array(self.sources, dtype=object)[first]
+            first_source[replayed] = stored_labels[stored[stored >= 0]]
+            mask = mask | replayed
+            first_source = first_source[mask]
+        return Duplicates(source, mask, first_source, by_id[mask], replayed[mask])
+
+    def commit(self) -> int:
+        """Sparar nycklar från check() i storen; returnerar antalet nya nycklar"""
+        if self.store is None:
+            return 0
+        added = 0
+        for keys, labels in self._new:
+            if np.ndim(labels) == 0:
+                added += self.store.add(keys, labels)
+                continue
+            for label in dict.fromkeys(labels.tolist()):
+                added += self.store.add(keys[labels == label], label)
+        self._new = []
+        return added
+
+
+# Version av filformatet för SeenStore. Version 2 har generationsnummer på
+# datafilerna; en store i version 1 läses som generation 0.
+STORE_VERSION = 2
+
+# Standardkapacitet och andel falska positiva i Bloomfiltret; filtret byggs
+# om med dubbel kapacitet när det blir fullt
+DEFAULT_STORE_CAPACITY = 10_000_000
+DEFAULT_STORE_ERROR_RATE = 0.01
+
+# Antal nycklar per block när nyckelfilen slås ihop eller läses om
+_MERGE_BLOCK = 1 << 20
+
+# Nycklar per sida (4 KiB) i nyckelfilen; var _PAGE:e nyckel hålls i minnet
+# som stängsel, så ett uppslag läser en enda sida av nyckelfilen
+_PAGE = 512
+
+# Antal kandidater som bekräftas mot nyckelfilen åt gången
+_LOOKUP_BATCH = 2048
+
+_KEY_DTYPE = np.dtype("<u8")
+_LABEL_DTYPE = np.dtype("<u2")
+
+
+def _read_pages(file, pages: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """
+    Läser hela sidor (_PAGE värden) ur en fil med vanliga läsningar; en
+    memmap skulle läsa in grannsidor också. Sista sidan fylls ut med 0xff.
+    """
+    size = _PAGE * dtype.itemsize
+    chunks = []
+    for page in pages.tolist():
+        file.seek(page * size)
+        chunks.append(file.read(size).ljust(size, b"\xff"))
+    return np.frombuffer(b"".join(chunks), dtype=dtype).reshape(len(chunks), _PAGE)
+
+
+def _bloom_size(capacity: int, error_rate: float) -> tuple:
+    """Antal bitar (jämnt antal byte) och hashfunktioner för kapacitet och felrisk"""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    bits = max(64, (bits + 7) // 8 * 8)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class SeenStore:
+    """
+    Nycklar (från transaction_keys) som redan redovisats i tidigare körningar,
+    med etikett (t.ex. period) per nyckel. Ligger i en katalog:
+
+    - bloom.N.bin: Bloomfilter, memmappat (ca 1,2 byte per nyckel vid 1% felrisk)
+    - keys.N.bin: alla nycklar sorterade (uint64), för exakt bekräftelse
+    - fence.N.bin: första nyckeln på varje sida i keys.N.bin
+    - labels.N.bin: etikettindex per nyckel (uint16), parallellt med keys.N.bin
+    - meta.json: antal, filterstorlek, etiketter och aktuella generationer N
+      (generation 0 heter bloom.bin, keys.bin osv.)
+
+    Uppslag läser bara Bloomfiltret, stängslet och en sida i nyckelfilen per
+    kandidat, så minnet styrs av filtret (tiotals MB för tiotals miljoner nycklar).
+    Nya nycklar sorteras in blockvis i filer för nästa generation, och
+    meta.json skrivs sist och atomärt. Avbryts en skrivning pekar meta.json
+    fortfarande på en hel tidigare generation. Storen förutsätter en
+    skrivare åt gången.
+    """
+
+    def __init__(self, directory: str, capacity: int = DEFAULT_STORE_CAPACITY,
+                 error_rate: float = DEFAULT_STORE_ERROR_RATE):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") not in (1, STORE_VERSION):
+                raise ValueError(f"Okänd version av SeenStore: {meta.get('version')!r}")
+            meta.setdefault("generation", 0)
+            meta.setdefault("bloom_generation", 0)
+        else:
+            bits, hashes = _bloom_size(capacity, error_rate)
+            meta = {"version": STORE_VERSION, "count": 0, "capacity": capacity,
+                    "error_rate": error_rate, "bloom_bits": bits, "bloom_hashes": hashes,
+                    "labels": [], "generation": 0, "bloom_generation": 0}
+            np.zeros(bits // 8, dtype=np.uint8).tofile(self._file("bloom", 0))
+            self._write_meta(meta)
+        self.meta = meta
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    @property
+    def labels(self) -> list:
+        return self.meta["labels"]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _file(self, name: str, generation: int) -> str:
+        """Sökväg till en datafil i given generation (0: namnen från version 1)"""
+        return self._path(f"{name}.bin" if generation == 0 else f"{name}.{generation}.bin")
+
+    def _write_meta(self, meta: dict):
+        temp = self._path("meta.json.tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp, self._path("meta.json"))
+
+    def _array(self, path: str, dtype: np.dtype, mode: str = "r") -> np.ndarray:
+        """Memmap av en fil (tom array om filen saknas eller är tom)"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode=mode)
+
+    def _bloom_positions(self, keys: np.ndarray, bits: int, hashes: int):
+        """Bitpositioner per hashfunktion (dubbel hashning av 64-bitarsnyckeln)"""
+        first = keys
+        step = (keys >> np.uint64(32)) | np.uint64(1)
+        for i in range(hashes):
+            yield (first + np.uint64(i) * step) % np.uint64(bits)
+
+    def _bloom_contains(self, keys: np.ndarray) -> np.ndarray:
+        bloom = self._array(self._file("bloom", self.meta["bloom_generation"]), np.uint8)
+        possible = np.ones(len(keys), dtype=bool)
+        for positions in self._bloom_positions(keys, self.meta["bloom_bits"],
+                                               self.meta["bloom_hashes"]):
+            candidates = np.flatnonzero(possible)
+            if not len(candidates):
+                break
+            position = positions[candidates]
+            bit = bloom[position >> np.uint64(3)] >> (position & np.uint64(7)).astype(np.uint8)
+            possible[candidates] = (bit & 1).astype(bool)
+        return possible
+
+    def _bloom_add(self, bloom: np.ndarray, keys: np.ndarray, bits: int, hashes: int):
+        for positions in self._bloom_positions(keys, bits, hashes):
+            np.bitwise_or.at(bloom, positions >> np.uint64(3),
+                             np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Etikettindex per nyckel, -1 för nycklar som inte finns i storen"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        found = np.full(len(keys), -1, dtype=np.int32)
+        if not len(self) or not len(keys):
+            return found
+
+        candidates = np.flatnonzero(self._bloom_contains(keys))
+        if not len(candidates):
+            return found
+        # Sorterade uppslag går igenom nyckelfilen i ordning
+        candidates = candidates[np.argsort(keys[candidates], kind="stable")]
+        query = keys[candidates]
+        generation = self.meta["generation"]
+        fence = np.fromfile(self._file("fence", generation), dtype=_KEY_DTYPE)
+        pages = np.searchsorted(fence, query, side="right") - 1
+        inside = pages >= 0
+        candidates, query, pages = candidates[inside], query[inside], pages[inside]
+
+        positions = np.full(len(query), -1, dtype=np.int64)
+        with open(self._file("keys", generation), "rb") as f:
+            for start in range(0, len(query), _LOOKUP_BATCH):
+                batch = slice(start, start + _LOOKUP_BATCH)
+                needed, local = np.unique(pages[batch], return_inverse=True)
+                page_keys = _read_pages(f, needed, _KEY_DTYPE)[local]
+                offset = (page_keys < query[batch, None]).sum(axis=1)
+                exact = page_keys[np.arange(len(offset)), np.minimum(offset, _PAGE - 1)]
+                hit = (offset < _PAGE) & (exact == query[batch])
+                positions[batch] = np.where(hit, pages[batch] * _PAGE + offset, -1)
+
+        hit = positions >= 0
+        positions = positions[hit]
+        with open(self._file("labels", generation), "rb") as f:
+            needed, local = np.unique(positions // _PAGE, return_inverse=True)
+            labels = _read_pages(f, needed, _LABEL_DTYPE)[local, positions % _PAGE]
+        found[candidates[hit]] = labels
+        return found
+
+    def label_of(self, index: int) -> str:
+        return self.labels[index]
+
+    def add(self, keys: np.ndarray, label: str) -> int:
+        """
+        Lägger till nycklar med etikett. Nycklar som redan finns behåller sin
+        etikett. Returnerar antalet nya nycklar.
+        """
+        keys = np.unique(np.asarray(keys, dtype=np.uint64))
+        keys = keys[self.lookup(keys) < 0]
+        if not len(keys):
+            return 0
+
+        previous = self.meta
+        meta = dict(previous, version=STORE_VERSION, labels=list(self.labels))
+        if label not in meta["labels"]:
+            if len(meta["labels"]) > np.iinfo(_LABEL_DTYPE).max:
+                raise ValueError("SeenStore rymmer högst 65 536 etiketter")
+            meta["labels"].append(label)
+        label_index = meta["labels"].index(label)
+
+        # Nästa generation skrivs bredvid den aktuella; filer kvar från en
+        # avbruten skrivning med samma nummer skrivs över
+        meta["generation"] = previous["generation"] + 1
+        self._remove(self._file("bloom", meta["generation"]))
+        self._merge(keys, label_index, meta["generation"])
+        meta["count"] += len(keys)
+        if meta["count"] > meta["capacity"]:
+            self._rebuild_bloom(meta, max(meta["capacity"] * 2, meta["count"]))
+        else:
+            # Bitarna läggs till på plats: avbryts skrivningen ger de bara
+            # falska positiva, som nyckelfilen sedan avvisar
+            bloom = np.memmap(self._file("bloom", meta["bloom_generation"]),
+                              dtype=np.uint8, mode="r+")
+            self._bloom_add(bloom, keys, meta["bloom_bits"], meta["bloom_hashes"])
+            bloom.flush()
+            del bloom
+        self._write_meta(meta)
+        self.meta = meta
+
+        # Den föregående generationen används inte längre
+        for name in ("keys", "labels", "fence"):
+            self._remove(self._file(name, previous["generation"]))
+        if meta["bloom_generation"] != previous["bloom_generation"]:
+            self._remove(self._file("bloom", previous["bloom_generation"]))
+        return len(keys)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _merge(self, keys: np.ndarray, label_index: int, generation: int):
+        """
+        Sorterar in nya (sorterade, unika) nycklar, ett block i taget, i
+        nyckel-, etikett- och stängselfilerna för generation
+        """
+        stored = self._array(self._file("keys", self.meta["generation"]), _KEY_DTYPE)
+        stored_labels = self._array(self._file("labels", self.meta["generation"]), _LABEL_DTYPE)
+        new_labels = np.full(len(keys), label_index, dtype=_LABEL_DTYPE)
+
+        paths = [self._file(name, generation) for name in ("keys", "labels", "fence")]
+        fence = []
+        written = 0
+
+        def write(block_keys, block_labels):
+            nonlocal written
+            block_keys.astype(_KEY_DTYPE).tofile(key_file)
+            block_labels.tofile(label_file)
+            fence.append(block_keys[-written % _PAGE::_PAGE])
+            written += len(block_keys)
+
+        with open(paths[0], "wb") as key_file, open(paths[1], "wb") as label_file:
+            taken = 0
+            for start in range(0, len(stored), _MERGE_BLOCK):
+                block = np.asarray(stored[start:start + _MERGE_BLOCK])
+                block_labels = np.asarray(stored_labels[start:start + _MERGE_BLOCK])
+                # Nya nycklar som hör hemma före blockets sista nyckel
+                end = (len(keys) if start + _MERGE_BLOCK >= len(stored)
+                       else int(np.searchsorted(keys, block[-1])))
+                merged = np.concatenate([block, keys[taken:end]])
+                order = np.argsort(merged, kind="stable")
+                write(merged[order], np.concatenate([block_labels, new_labels[taken:end]])[order])
+                taken = end
+            if taken < len(keys):
+                write(keys[taken:], new_labels[taken:])
+        np.concatenate(fence).astype(_KEY_DTYPE).tofile(paths[2])
+        del stored, stored_labels
+
+    def _rebuild_bloom(self, meta: dict, capacity: int):
+        """
+        Bygger ett större Bloomfilter från nyckelfilen i meta:s generation,
+        ett block i taget, som en ny fil i samma generation
+        """
+        bits, hashes = _bloom_size(capacity, meta["error_rate"])
+        path = self._file("bloom", meta["generation"])
+        np.zeros(bits // 8, dtype=np.uint8).tofile(path)
+        bloom = np.memmap(path, dtype=np.uint8, mode="r+")
+        stored = self._array(self._file("keys", meta["generation"]), _KEY_DTYPE)
+        for start in range(0, len(stored), _MERGE_BLOCK):
+            self._bloom_add(bloom, np.asarray(stored[start:start + _MERGE_BLOCK]), bits, hashes)
+        bloom.flush()
+        del bloom, stored
+        meta.update(capacity=capacity, bloom_bits=bits, bloom_hashes=hashes,
+                    bloom_generation=meta["generation"])
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Strömmande JSON-utdata för momsrapporter.
+
+write_json skriver ett resultat bit för bit till en fil eller stdout i
+stället för att först bygga hela texten med json.dumps. Listor (t.ex.
+varningar) skrivs ett element i taget och får även vara generatorer, så
+minnestoppen inte fördubblas och de första byten skrivs direkt. Med
+indent ger utdata samma text som json.dumps(value, indent=indent,
+ensure_ascii=False); indent=None ger kompakt JSON utan mellanslag.
+
+write_ndjson skriver element som NDJSON (ett JSON-objekt per rad).
+
+Om orjson är installerat kodas element med det (indent 2 eller kompakt);
+texten är densamma som med json utom för flyttal med exponent (1e16 i
+stället för 1e+16) och NaN/Infinity, som orjson skriver som null. Element
+som orjson inte kan koda (t.ex. nycklar som inte är text) kodas med json.
+"""
+
+import json
+from typing import Iterable, Optional, TextIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Separatorer för kompakt utdata
+COMPACT_SEPARATORS = (",", ":")
+
+# Finns ett snabbare kodare (orjson) installerad
+FAST_AVAILABLE = orjson is not None
+
+# Antal platta listelement som orjson kodar i ett anrop
+FAST_BATCH = 1024
+
+
+def _is_container(value) -> bool:
+    return isinstance(value, (dict, list, tuple)) or (
+        hasattr(value, "__iter__") and not isinstance(value, (str, bytes, bytearray)))
+
+
+def _is_flat(value) -> bool:
+    """Skalär eller dict utan behållare som värden"""
+    if isinstance(value, dict):
+        return not any(map(_is_container, value.values()))
+    return not _is_container(value)
+
+
+def _key(key) -> str:
+    # Samma omvandling av nycklar som json.dumps
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+def _fast_option(indent: Optional[int], fast: bool) -> Optional[int]:
+    """orjson-flaggor för indent, None om orjson inte ska användas"""
+    if not fast or orjson is None or indent not in (None, 2):
+        return None
+    return orjson.OPT_INDENT_2 if indent == 2 else 0
+
+
+class _Writer:
+    def __init__(self, out: TextIO, indent: Optional[int], fast: bool = True):
+        self.out = out
+        self.indent = indent
+        self.fast_option = _fast_option(indent, fast)
+        if indent is None:
+            self.encoder = json.JSONEncoder(ensure_ascii=False, separators=COMPACT_SEPARATORS)
+            self.item_separator, self.key_separator = COMPACT_SEPARATORS
+        else:
+            self.encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+            self.item_separator, self.key_separator = ",", ": "
+        self._flat_encoders = {}
+
+    def newline(self, level: int) -> str:
+        return "" if self.indent is None else "\n" + " " * (self.indent * level)
+
+    def flat_encoder(self, level: int) -> json.JSONEncoder:
+        """
+        Kompakt (C-snabbad) kodare vars separator innehåller indenteringen
+        för nivån, för platta dictar; json med indent går i ren Python.
+        """
+        encoder = self._flat_encoders.get(level)
+        if encoder is None:
+            encoder = json.JSONEncoder(ensure_ascii=False,
+                                       separators=("," + self.newline(level + 1), ": "))
+            self._flat_encoders[level] = encoder
+        return encoder
+
+    def leaf(self, value, level: int):
+        """Skalär eller platt dict: kodas i ett anrop och indenteras om"""
+        if self.fast_option is not None:
+            try:
+                text = orjson.dumps(value, option=self.fast_option).decode()
+            except TypeError:
+                pass
+            else:
+                if level and "\n" in text:
+                    text = text.replace("\n", self.newline(level))
+                self.out.write(text)
+                return
+        if self.indent is not None and isinstance(value, dict) and value:
+            text = self.flat_encoder(level).encode(value)
+            self.out.write("{" + self.newline(level + 1) + text[1:-1] + self.newline(level) + "}")
+            return
+        text = self.encoder.encode(value)
+        if self.indent is not None and level and "\n" in text:
+            # Strängar i JSON innehåller aldrig radbrytningar, så alla är indentering
+            text = text.replace("\n", self.newline(level))
+        self.out.write(text)
+
+    def flush(self, pending: list, level: int, first: bool) -> bool:
+        """
+        Skriver väntande platta listelement med ett orjson-anrop och
+        tömmer pending. Returnerar nytt värde för first (False).
+        """
+        if not first:
+            self.out.write(self.item_separator)
+        try:
+            text = orjson.dumps(pending, option=self.fast_option).decode()
+        except TypeError:
+            for i, item in enumerate(pending):
+                self.out.write(("" if i == 0 else self.item_separator) + self.newline(level + 1))
+                self.leaf(item, level + 1)
+        else:
+            if self.indent is None:
+                self.out.write(text[1:-1])
+            else:
+                # "[\n  a,\n  b\n]" -> "\n  a,\n  b", flyttat till listans nivå
+                text = text[1:-2]
+                self.out.write(text.replace("\n", self.newline(level)) if level else text)
+        pending.clear()
+        return False
+
+    def value(self, value, level: int):
+        if isinstance(value, dict):
+            if not any(map(_is_container, value.values())):
+                self.leaf(value, level)
+                return
+            self.out.write("{")
+            first = True
+            for key, item in value.items():
+                self.out.write(("" if first else self.item_separator) + self.newline(level + 1))
+                self.out.write(self.encoder.encode(_key(key)) + self.key_separator)
+                self.value(item, level + 1)
+                first = False
+            self.out.write("}" if first else self.newline(level) + "}")
+        elif _is_container(value):
+            self.out.write("[")
+            first = True
+            pending = []
+            for item in value:
+                if self.fast_option is not None and _is_flat(item):
+                    pending.append(item)
+                    if len(pending) >= FAST_BATCH:
+                        first = self.flush(pending, level, first)
+                    continue
+                if pending:
+                    first = self.flush(pending, level, first)
+                self.out.write(("" if first else self.item_separator) + self.newline(level + 1))
+                self.value(item, level + 1)
+                first = False
+            if pending:
+                first = self.flush(pending, level, first)
+            self.out.write("]" if first else self.newline(level) + "]")
+        else:
+            self.leaf(value, level)
+
+
+def write_json(value, out: TextIO, indent: Optional[int] = 2, fast: bool = True):
+    """
+    Skriver value som JSON till out, ett listelement i taget.
+
+    Args:
+        value: dict, lista, generator eller skalär
+        out: Textfil eller sys.stdout
+        indent: Indentering (None = kompakt)
+        fast: Använd orjson om det är installerat
+    """
+    _Writer(out, indent, fast).value(value, 0)
+
+
+def write_ndjson(items: Iterable, out: TextIO, fast: bool = True) -> int:
+    """Skriver ett kompakt JSON-objekt per rad; returnerar antalet rader"""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=COMPACT_SEPARATORS)
+    fast = fast and orjson is not None
+    count = 0
+    for item in items:
+        if fast:
+            try:
+                out.write(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE).decode())
+                count += 1
+                continue
+            except TypeError:
+                pass
+        out.write(encoder.encode(item))
+        out.write("\n")
+        count += 1
+    return count
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Profilering för CLI:na (--profile). Skriver för en hel körning:
+- PREFIX.pstats: cProfile-statistik (python -m pstats, snakeviz m.fl.)
+- PREFIX.collapsed.txt: samplade stackar i collapsed-format för flamegraphs
+  (flamegraph.pl, speedscope, inferno)
+- PREFIX.memory.txt: tracemalloc-topp och de allokeringsställen som tar mest minne
+"""
+
+import atexit
+import cProfile
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+# Sekunder mellan stacksampel
+DEFAULT_INTERVAL = 0.005
+
+# Antal allokeringsställen i minnesrapporten
+DEFAULT_TOP = 25
+
+# Ny ögonblicksbild av minnet när det allokerade växt så mycket sedan förra
+PEAK_SNAPSHOT_GROWTH = 1.1
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samplar huvudtrådens stack med jämna mellanrum och räknar unika stackar.
+    Tar även en tracemalloc-bild varje gång minnet når en ny topp, så att
+    rapporten kan visa vad som var allokerat när det var som mest.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.peak_snapshot = None
+        self.peak_snapshot_size = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self.peak_snapshot_size * PEAK_SNAPSHOT_GROWTH:
+                self.peak_snapshot = tracemalloc.take_snapshot()
+                self.peak_snapshot_size = current
+
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class Profiler:
+    """
+    cProfile, stacksampling och tracemalloc för en hel körning.
+    stop() skriver filerna och anropas automatiskt vid programslut.
+    """
+
+    def __init__(self, prefix: str, interval: float = DEFAULT_INTERVAL, top: int = DEFAULT_TOP):
+        self.prefix = prefix
+        self.top = top
+        self._profile = cProfile.Profile()
+        self._sampler = _StackSampler(threading.get_ident(), interval)
+        self._running = False
+
+    def start(self) -> "Profiler":
+        tracemalloc.start()
+        self._sampler.start()
+        self._profile.enable()
+        self._running = True
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._profile.disable()
+        self._sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        paths = (f"{self.prefix}.pstats", f"{self.prefix}.collapsed.txt", f"{self.prefix}.memory.txt")
+        self._profile.dump_stats(paths[0])
+        with open(paths[1], "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        with open(paths[2], "w", encoding="utf-8") as f:
+            f.write(self._memory_report(snapshot, current, peak))
+
+        print(f"Profil sparad: {', '.join(paths)} (minnestopp {peak / 2**20:.1f} MB)",
+              file=sys.stderr)
+
+    def _memory_report(self, snapshot, current: int, peak: int) -> str:
+        lines = [
+            f"Minnestopp: {peak / 2**20:.1f} MB",
+            f"Allokerat vid slut: {current / 2**20:.1f} MB",
+        ]
+        sections = [("vid slut", snapshot)]
+        if self._sampler.peak_snapshot is not None:
+            size = self._sampler.peak_snapshot_size / 2**20
+            sections.insert(0, (f"nära toppen ({size:.1f} MB)", self._sampler.peak_snapshot))
+
+        for title, section in sections:
+            # Profileringens egna allokeringar hör inte till körningen
+            section = section.filter_traces((
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ))
+            lines += ["", f"Största allokeringsställen {title} (topp {self.top}):"]
+            for stat in section.statistics("lineno")[:self.top]:
+                frame = stat.traceback[0]
+                lines.append(f"{stat.size / 2**10:12.1f} KiB {stat.count:9d} block  "
+                             f"{frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+
+def enable_profiling(prefix: str, interval: Optional[float] = None) -> Profiler:
+    """Startar profilering av resten av körningen (för CLI-flaggan --profile)"""
+    return Profiler(prefix, interval or DEFAULT_INTERVAL).start()
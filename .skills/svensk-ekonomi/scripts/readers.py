@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Inläsning av transaktionsfiler för momsprocessorn (CSV, Parquet, Arrow, Excel).
+Alla läsare normaliserar till samma kolumnkontrakt. Stora exporter läses i
+bitar så att minnet begränsas av bitstorleken, och upprepade analyser av
+samma fil kan läsas från en lokal cache.
+"""
+
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from constants import (CATEGORY_COLUMN, COUNTERPART_COLUMN, COUNTRY_COLUMN, DATE_COLUMN,
+                       ID_COLUMN, ORG_NUMBER_COLUMN, ROAMING_COLUMN, VAT_NUMBER_COLUMN)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Kolumnkontrakt: alla läsare levererar dessa kolumner (om de finns i filen)
+# med samma namn och typer, så att processorn aldrig ser skillnad på format.
+AMOUNT_COLUMNS = ("amount", "subAmount", "vat", "vatRate")
+# Upprepade textvärden (få unika) lagras som kategorier
+CATEGORY_COLUMNS = (CATEGORY_COLUMN, COUNTERPART_COLUMN, COUNTRY_COLUMN, ROAMING_COLUMN,
+                    VAT_NUMBER_COLUMN, ORG_NUMBER_COLUMN)
+COLUMN_CONTRACT = AMOUNT_COLUMNS + (ID_COLUMN, DATE_COLUMN) + CATEGORY_COLUMNS
+
+# Text med pd.NA för saknade värden, oavsett vad läsaren själv ger
+ID_DTYPE = pd.StringDtype()
+
+# Kolumnnamn i Montas råexport som motsvarar kontraktets namn
+COLUMN_ALIASES = {
+    "transactionId": ID_COLUMN,
+    "startTime": DATE_COLUMN,
+}
+
+# Höjs när normaliseringen ändras, så att gamla cacheposter inte används
+CONTRACT_VERSION = 4
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliserar en inläst tabell till kolumnkontraktet:
+    belopp och momssats som float64, id som text, datum som datetime och
+    upprepade textkolumner som kategorier.
+    """
+    df = df.copy(deep=False)
+    renames = {
+        alias: name for alias, name in COLUMN_ALIASES.items()
+        if alias in df.columns and name not in df.columns
+    }
+    if renames:
+        df = df.rename(columns=renames)
+
+    for name in AMOUNT_COLUMNS:
+        if name in df.columns and df[name].dtype != "float64":
+            df[name] = _to_float(df[name], name)
+
+    if ID_COLUMN in df.columns and df[ID_COLUMN].dtype != ID_DTYPE:
+        ids = df[ID_COLUMN]
+        # Heltals-id som blivit flyttal (p.g.a. tomma celler) skrivs utan ".0"
+        if ids.dtype.kind == "f" and (ids.dropna() % 1 == 0).all():
+            ids = ids.astype("Int64")
+        df[ID_COLUMN] = ids.astype(ID_DTYPE)
+
+    if DATE_COLUMN in df.columns and df[DATE_COLUMN].dtype.kind != "M":
+        df[DATE_COLUMN] = _to_datetime(df[DATE_COLUMN])
+
+    for name in CATEGORY_COLUMNS:
+        if name in df.columns and not isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype("category")
+
+    return df
+
+
+def _to_float(column: pd.Series, name: str) -> pd.Series:
+    """Belopp som float64; text med decimalkomma ("1 234,50") accepteras"""
+    if column.dtype.kind in "iuf":
+        return column.astype("float64")
+
+    text = column.astype("string").str.replace("\u00a0", "", regex=False)
+    text = text.str.replace(" ", "", regex=False).str.replace(",", ".", regex=False)
+    try:
+        return pd.to_numeric(text, errors="raise").astype("float64")
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Kolumnen '{name}' innehåller värden som inte är belopp: {exc}") from None
+
+
+def _to_datetime(column: pd.Series) -> pd.Series:
+    try:
+        return pd.to_datetime(column, errors="coerce")
+    except (TypeError, ValueError):
+        # Blandade tidszoner (eller blandat med/utan tidszon) läses som UTC
+        return pd.to_datetime(column, errors="coerce", utc=True)
+
+
+# === KOLUMNURVAL ===
+
+class _Projection:
+    """
+    Urval av kolumner vid inläsning: de begärda kolumnerna och deras alias.
+    Används som usecols-filter och kommer ihåg vilka kolumner som hoppades över.
+    """
+
+    def __init__(self, columns: Optional[Iterable[str]]):
+        self.wanted = None
+        if columns is not None:
+            wanted = set(columns)
+            wanted.update(alias for alias, name in COLUMN_ALIASES.items() if name in wanted)
+            self.wanted = wanted
+        # Ordnad mängd; pandas kan fråga om samma kolumn flera gånger
+        self.dropped = {}
+
+    def __call__(self, name) -> bool:
+        keep = self.wanted is None or str(name) in self.wanted
+        if not keep:
+            self.dropped[str(name)] = None
+        return keep
+
+    def select(self, names: Iterable[str]) -> Optional[list]:
+        """Kolumnerna i names som ska läsas (None = alla)"""
+        if self.wanted is None:
+            return None
+        return [name for name in names if self(name)]
+
+    def report(self, path: str):
+        if self.dropped:
+            logger.debug("%s: läser inte %d kolumner: %s",
+                         path, len(self.dropped), ", ".join(self.dropped))
+
+
+# === LÄSARE ===
+
+def read_excel(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    projection = _Projection(columns)
+    df = pd.read_excel(path, usecols=projection)
+    projection.report(path)
+    return df
+
+
+def iter_excel_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      columns: Optional[Iterable[str]] = None,
+                      sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Läser ett Excel-ark rad för rad (openpyxl read-only) och returnerar
+    DataFrames med högst chunk_size rader. Första raden är rubrikrad.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        names = [
+            str(name) if name is not None else f"Unnamed: {i}"
+            for i, name in enumerate(header)
+        ]
+        projection = _Projection(columns)
+        positions = [i for i, name in enumerate(names) if projection(name)]
+        projection.report(path)
+        selected = [names[i] for i in positions]
+        width = len(names)
+
+        batch = []
+        for row in rows:
+            # Tomma rader (t.ex. formaterade men tomma celler i slutet) hoppas över
+            if all(value is None for value in row):
+                continue
+            # Rader i read-only-läge kan vara kortare eller längre än rubriken
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            batch.append(tuple(row[i] for i in positions))
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame.from_records(batch, columns=selected)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=selected)
+    finally:
+        workbook.close()
+
+
+def read_xls(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Äldre Excel-fil (.xls); openpyxl kan inte läsa formatet, så xlrd krävs"""
+    projection = _Projection(columns)
+    df = pd.read_excel(path, usecols=projection, engine="xlrd")
+    projection.report(path)
+    return df
+
+
+def iter_xls_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Delar en .xls-fil i bitar om högst chunk_size rader. Det strömmar inte:
+    xlrd läser hela arbetsboken på en gång, så minnet styrs av filens storlek
+    (därför har formatet streaming=False och CLI:t avvisar --stream).
+    """
+    df = read_xls(path, columns)
+    for offset in range(0, len(df), chunk_size):
+        yield df.iloc[offset:offset + chunk_size]
+
+
+def _csv_dtypes() -> dict:
+    """Explicita typer för kontraktets kolumner, så att pandas slipper gissa"""
+    dtypes = {name: "float64" for name in AMOUNT_COLUMNS}
+    dtypes[ID_COLUMN] = ID_DTYPE
+    dtypes.update({alias: ID_DTYPE for alias, name in COLUMN_ALIASES.items() if name == ID_COLUMN})
+    dtypes.update({name: "category" for name in CATEGORY_COLUMNS})
+    return dtypes
+
+
+def read_csv(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    projection = _Projection(columns)
+    df = pd.read_csv(path, dtype=_csv_dtypes(), usecols=projection)
+    projection.report(path)
+    return df
+
+
+def iter_csv_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """Läser en CSV-fil i bitar om högst chunk_size rader"""
+    projection = _Projection(columns)
+    with pd.read_csv(path, dtype=_csv_dtypes(), usecols=projection, chunksize=chunk_size) as reader:
+        projection.report(path)
+        yield from reader
+
+
+def read_parquet(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+
+    projection = _Projection(columns)
+    selected = projection.select(pq.read_schema(path).names)
+    projection.report(path)
+    return pd.read_parquet(path, columns=selected)
+
+
+def iter_parquet_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """Läser en Parquet-fil i bitar om högst chunk_size rader"""
+    import pyarrow.parquet as pq
+
+    with pq.ParquetFile(path) as parquet:
+        projection = _Projection(columns)
+        selected = projection.select(parquet.schema_arrow.names)
+        projection.report(path)
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=selected):
+            yield batch.to_pandas()
+
+
+def read_arrow(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    import pyarrow as pa
+
+    projection = _Projection(columns)
+    with pa.memory_map(path) as source:
+        selected = projection.select(pa.ipc.open_file(source).schema.names)
+    projection.report(path)
+    return pd.read_feather(path, columns=selected)
+
+
+def iter_arrow_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Läser en Arrow IPC-/Feather-fil i bitar om högst chunk_size rader. Filen
+    minnesmappas och läses en record batch i taget, så bara den aktuella
+    biten konverteras till pandas.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        projection = _Projection(columns)
+        selected = projection.select(reader.schema.names)
+        projection.report(path)
+        # Små batchar slås ihop och stora delas, så att bitarna blir upp till chunk_size
+        pending, rows = [], 0
+        for index in range(reader.num_record_batches):
+            batch = reader.get_batch(index)
+            if selected is not None:
+                batch = batch.select(selected)
+            for offset in range(0, batch.num_rows, chunk_size):
+                piece = batch.slice(offset, chunk_size)
+                if rows + piece.num_rows > chunk_size:
+                    yield pa.Table.from_batches(pending).to_pandas()
+                    pending, rows = [], 0
+                pending.append(piece)
+                rows += piece.num_rows
+        if pending:
+            yield pa.Table.from_batches(pending).to_pandas()
+
+
+@dataclass(frozen=True)
+class Reader:
+    """
+    Ett filformat: läsare för hela filen och för bitar, samt filändelser.
+    Läsarna tar emot en valfri lista med kolumner som ska läsas (None = alla).
+    """
+    read: Callable[[str, Optional[Iterable[str]]], pd.DataFrame]
+    iter_chunks: Callable[[str, int, Optional[Iterable[str]]], Iterator[pd.DataFrame]]
+    suffixes: tuple
+    # Om tolkad indata är värd att cacha (inte för format som redan är kolumnära)
+    cacheable: bool = True
+    # Om iter_chunks håller minnet till bitstorleken (annars läses hela filen först)
+    streaming: bool = True
+
+
+READERS = {
+    "csv": Reader(read_csv, iter_csv_chunks, (".csv", ".txt")),
+    "parquet": Reader(read_parquet, iter_parquet_chunks, (".parquet", ".pq"), cacheable=False),
+    "arrow": Reader(read_arrow, iter_arrow_chunks, (".arrow", ".feather", ".ipc"), cacheable=False),
+    "excel": Reader(read_excel, iter_excel_chunks, (".xlsx", ".xlsm")),
+    "xls": Reader(read_xls, iter_xls_chunks, (".xls",), streaming=False),
+}
+
+# Okända filändelser läses som Excel, precis som tidigare
+FALLBACK_FORMAT = "excel"
+
+
+def register_reader(name: str, reader: Reader):
+    """Lägger till (eller ersätter) ett filformat"""
+    READERS[name] = reader
+
+
+def detect_format(path: str, file_format: Optional[str] = None) -> str:
+    """Filformat från --format, annars från filändelsen"""
+    if file_format:
+        if file_format not in READERS:
+            raise ValueError(f"Okänt format: {file_format} (tillåtna: {', '.join(READERS)})")
+        return file_format
+
+    suffix = Path(path).suffix.lower()
+    for name, reader in READERS.items():
+        if suffix in reader.suffixes:
+            return name
+    return FALLBACK_FORMAT
+
+
+def iter_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                file_format: Optional[str] = None,
+                columns: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Läser filen i normaliserade bitar om högst chunk_size rader.
+    Med columns läses bara de kolumnerna (t.ex. VATProcessor.input_columns()).
+    """
+    reader = READERS[detect_format(path, file_format)]
+    for chunk in reader.iter_chunks(path, chunk_size, columns):
+        yield normalize_columns(chunk)
+
+
+def read_transactions(path: str, cache: Optional["ParsedInputCache"] = None,
+                      file_format: Optional[str] = None,
+                      columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Läser och normaliserar hela filen. Med cache läses en tidigare
+    tolkad version av exakt samma fil direkt från disk. Med columns läses
+    bara de kolumnerna (t.ex. VATProcessor.input_columns()).
+    """
+    file_format = detect_format(path, file_format)
+    reader = READERS[file_format]
+    options = {"format": file_format, "contract": CONTRACT_VERSION,
+               "columns": sorted(columns) if columns is not None else None}
+
+    key = cache.key(path, options) if cache and reader.cacheable else None
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    df = normalize_columns(reader.read(path, columns))
+
+    if key:
+        cache.put(key, df)
+    return df
+
+
+class ParsedInputCache:
+    """
+    Innehållsadresserad cache för inlästa transaktionsfiler.
+
+    Nyckeln är SHA-256 av filens innehåll plus läsarens inställningar, så
+    samma fil under ett annat namn träffar cachen medan en ändrad fil inte
+    gör det. Kolumnerna lagras typade som Parquet, och de minst nyligen
+    använda filerna tas bort när cachen överskrider max_bytes.
+
+    Kräver pyarrow; utan det är cachen avstängd och allt läses som vanligt.
+    """
+
+    SUFFIX = ".parquet"
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.available = importlib.util.find_spec("pyarrow") is not None
+        if not self.available:
+            print("Varning: pyarrow saknas, cachen för indata är avstängd", file=sys.stderr)
+
+    def key(self, path: str, options: dict) -> Optional[str]:
+        """Cachenyckel för filen, eller None om cachen är avstängd"""
+        if not self.available:
+            return None
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Cachad DataFrame, eller None vid miss"""
+        entry = self.directory / f"{key}{self.SUFFIX}"
+        try:
+            df = pd.read_parquet(entry)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+        # Senaste användning styr LRU-ordningen (posten kan ha rensats av
+        # en annan process under tiden)
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Sparar df under nyckeln och rensar cachen till max_bytes"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entry = self.directory / f"{key}{self.SUFFIX}"
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, entry)
+        except (TypeError, ValueError, ImportError) as exc:
+            # T.ex. kolumner med blandade typer som Parquet inte kan lagra
+            print(f"Varning: kunde inte cacha indata ({exc})", file=sys.stderr)
+            return
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self.evict()
+
+    def evict(self):
+        """Tar bort minst nyligen använda poster tills cachen ryms i max_bytes"""
+        entries = []
+        for entry in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -25,6 +25,7 @@ class SIEExporter:
         self.fiscal_year_end = fiscal_year_end
         self.accounts = {}
         self.verifications = []
+        self.journals = []
         self.account_balances = {}
     
     def _clean_org_number(self, org_nr: str) -> str:
@@ -53,6 +54,45 @@ class SIEExporter:
             "transactions": transactions
         })
     
+    def add_journal(self, journal, start_number: Optional[int] = None,
+                    default_date: Optional[datetime] = None):
+        """
+        Lägger till en kolumnvis grundbok (vat_processor.Journal) utan att
+        bygga en dict per kontering. Verifikationerna numreras i följd.
+        
+        Args:
+            journal: Journal från VATProcessor.create_journal()
+            start_number: Första verifikationsnummer (standard: efter befintliga)
+            default_date: Datum för verifikationer utan datum (standard: idag)
+        """
+        if start_number is None:
+            start_number = self._next_number()
+        for account, name in journal.account_names.items():
+            self.accounts.setdefault(account, name)
+        self.journals.append((journal, start_number, default_date or datetime.now()))
+    
+    def add_transactions(self, transactions, group_by: str = "transaction",
+                         processor=None, start_number: Optional[int] = None,
+                         default_date: Optional[datetime] = None):
+        """
+        Lägger till balanserade verifikationer för transaktioner (DataFrame
+        eller vat_processor.TransactionBatch) via VATProcessor.create_journal.
+        
+        Args:
+            group_by: "transaction", "day" eller "counterpart"
+            processor: VATProcessor att kontera med (standard: en ny)
+        """
+        if processor is None:
+            from vat_processor import VATProcessor
+            processor = VATProcessor()
+        self.add_journal(processor.create_journal(transactions, group_by),
+                         start_number, default_date)
+    
+    def _next_number(self) -> int:
+        numbers = [ver["number"] for ver in self.verifications]
+        numbers += [start + journal.verification_count - 1 for journal, start, _ in self.journals]
+        return max(numbers, default=0) + 1
+    
     def set_opening_balance(self, account: str, balance: Decimal):
         """Sätter ingående balans för ett konto"""
         self.account_balances[account] = balance
@@ -112,6 +152,11 @@ class SIEExporter:
                 lines.append('}')
             lines.append('')
         
+        for journal, start_number, default_date in self.journals:
+            lines.append('# Verifikationer')
+            lines.extend(self._journal_lines(journal, start_number, default_date))
+            lines.append('')
+        
         content = '\n'.join(lines)
         
         if output_path:
@@ -120,6 +165,35 @@ class SIEExporter:
         
         return content
     
+    def _journal_lines(self, journal, start_number: int, default_date: datetime) -> list:
+        """#VER-block för en kolumnvis grundbok, med belopp i öre"""
+        lines = []
+        fallback = default_date.strftime("%Y%m%d")
+        dates = [fallback if d == "NaT" else d.replace("-", "")
+                 for d in journal.dates.astype(str)]
+        amounts = [self._format_ore(int(a)) for a in journal.amount]
+        
+        # Radindex där varje verifikation börjar (raderna är sorterade)
+        verification = journal.verification
+        starts = [0, *(verification[1:] != verification[:-1]).nonzero()[0] + 1, len(verification)]
+        for begin, end in zip(starts, starts[1:]):
+            if begin == end:
+                continue
+            index = int(verification[begin])
+            desc = str(journal.descriptions[index]).replace('"', "'")
+            lines.append(f'#VER "" {start_number + index} {dates[index]} "{desc}"')
+            lines.append('{')
+            for row in range(begin, end):
+                lines.append(f'    #TRANS {journal.account[row]} {{}} {amounts[row]}')
+            lines.append('}')
+        return lines
+    
+    @staticmethod
+    def _format_ore(ore: int) -> str:
+        """Formaterar öre som kronor med två decimaler"""
+        sign = "-" if ore < 0 else ""
+        return f"{sign}{abs(ore) // 100}.{abs(ore) % 100:02d}"
+    
     def _format_amount(self, amount) -> str:
         """Formaterar belopp för SIE (punkt som decimaltecken)"""
         if isinstance(amount, Decimal):
@@ -145,29 +219,19 @@ def create_sie_from_vat_report(vat_report: dict, year: int,
         org_number=vat_report["company"]["org_number"]
     )
     
-    # Lägg till konton från bokföringsförslag
-    standard_accounts = {
-        "1510": "Kundfordringar",
-        "2440": "Leverantörsskulder",
-        "2611": "Utgående moms 25%",
-        "2621": "Utgående moms 12%",
-        "2631": "Utgående moms 6%",
-        "2641": "Ingående moms",
-        "2650": "Momsredovisning",
-        "3010": "Försäljning tjänster 25%",
-        "3011": "Försäljning tjänster momsfri",
-        "3012": "Roaming-intäkter",
-        "6590": "Övriga externa tjänster",
-        "6591": "Plattformsavgifter",
-        "6592": "Abonnemangskostnader"
-    }
-    
-    for account, name in standard_accounts.items():
+    from vat_processor import BASAccounts
+    
+    # Kontoplanen: processorns BAS-konton plus alla konton i bokföringsförslaget,
+    # så att varje #TRANS har ett #KONTO
+    entries = vat_report.get("journal_entries", [])
+    for account, name in BASAccounts.NAMES.items():
         exporter.add_account(account, name)
+    for entry in entries:
+        exporter.accounts.setdefault(entry["account"], entry.get("account_name") or entry["account"])
     
     # Skapa verifikation från bokföringsförslag
     transactions = []
-    for entry in vat_report.get("journal_entries", []):
+    for entry in entries:
         transactions.append({
             "account": entry["account"],
             "debit": entry.get("debit", 0),
@@ -195,8 +259,18 @@ if __name__ == "__main__":
     parser.add_argument("--output", "-o", help="Output SIE-fil", required=True)
     parser.add_argument("--year", "-y", type=int, default=datetime.now().year,
                        help="Räkenskapsår")
+    parser.add_argument("--profile", action="store_true",
+                       help="Profilera körningen: PREFIX.pstats, PREFIX.collapsed.txt "
+                            "(flamegraph) och PREFIX.memory.txt")
+    parser.add_argument("--profile-prefix", metavar="PREFIX",
+                       help="Filprefix för --profile (innebär --profile; "
+                            "standard: sie_export-profile)")
     
     args = parser.parse_args()
+    # Profileringen startar innan vat_processor och pandas importeras
+    if args.profile or args.profile_prefix:
+        from profiling import enable_profiling
+        enable_profiling(args.profile_prefix or "sie_export-profile")
     
     with open(args.input, 'r', encoding='utf-8') as f:
         vat_report = json.load(f)
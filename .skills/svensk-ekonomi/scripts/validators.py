@@ -1,25 +1,516 @@
 #!/usr/bin/env python3
 """
 Svenska validerare för redovisning och identifierare.
+
+Utfallet av en validering lagras som kod (ValidationCode) och numerisk
+nyttolast; meddelandet renderas på svenska eller engelska först när det
+efterfrågas (ValidationResult.message/render). validate_many validerar
+stora mängder värden till en array med en kod per värde.
+
+ValidationCode och MESSAGES är gemensamma för alla skript: momsrapporten
+(vat_processor), dubblettkontrollen (dedup) och motpartsregistret
+(counterparts) lagrar sina valideringar med samma koder.
 """
 
 import re
+from array import array
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Optional, Callable
+from enum import IntEnum
+from functools import lru_cache
+from typing import Iterable, Optional, Callable
+
+# Språk som meddelanden kan renderas på, i samma ordning som i MESSAGES
+LANGUAGES = ("sv", "en")
+
+_NON_DIGITS = re.compile(r'[^0-9]')
+_BAS_ACCOUNT = re.compile(r'^[1-8]\d{3}$')
+
+
+class ValidationCode(IntEnum):
+    """Utfall av en validering (ryms i en byte, se validate_many)"""
+    TEXT = 0                         # färdig text, (text,), se ValidationResult
+    
+    ORG_NUMBER_OK = 1
+    ORG_NUMBER_LENGTH = 2
+    ORG_NUMBER_LEADING_ZERO = 3
+    ORG_NUMBER_CHECKSUM = 4          # (förväntad, faktisk kontrollsiffra)
+    
+    VAT_NUMBER_OK = 10
+    VAT_NUMBER_MISSING = 11
+    VAT_NUMBER_PREFIX = 12
+    VAT_NUMBER_LENGTH = 13           # (antal siffror,)
+    VAT_NUMBER_ORG = 14              # (kod för org.nr, *nyttolast för org.nr)
+    VAT_NUMBER_SUFFIX = 15           # (sista två siffrorna,)
+    VAT_NUMBER_NO_COUNTRY = 16       # utländskt nummer utan landsprefix
+    VAT_NUMBER_EU_COUNTRY = 17       # prefix utanför EU fast motparten är i ett EU-land
+    VAT_NUMBER_EU_FORMAT = 18        # (landsprefix,)
+    
+    BANKGIRO_OK = 20
+    BANKGIRO_LENGTH = 21
+    BANKGIRO_CHECKSUM = 22
+    
+    PLUSGIRO_OK = 30
+    PLUSGIRO_LENGTH = 31
+    PLUSGIRO_CHECKSUM = 32
+    
+    PERSONAL_NUMBER_OK = 40
+    PERSONAL_NUMBER_LENGTH = 41
+    PERSONAL_NUMBER_MONTH = 42       # (månad,)
+    PERSONAL_NUMBER_DAY = 43         # (dag,)
+    PERSONAL_NUMBER_CHECKSUM = 44
+    
+    VAT_CALCULATION_OK = 50
+    VAT_CALCULATION = 51             # (moms, sats, netto, förväntad moms, diff)
+    
+    GROSS_AMOUNT_OK = 60
+    GROSS_AMOUNT = 61                # (brutto, netto, moms, förväntat brutto)
+    
+    BAS_ACCOUNT_OK = 70              # (kontoklass,)
+    BAS_ACCOUNT_FORMAT = 71          # (konto,)
+    
+    FIELD_MISSING = 80               # (fält,)
+    KWH_NEGATIVE = 81
+    KWH_HIGH = 82                    # (kWh,)
+    
+    # Momsrapporten (vat_processor), belopp i öre. Radkontrollerna ligger i
+    # den ordning de visas för en rad.
+    TRANSACTION_VAT = 90             # (netto, moms, sats %, förväntad moms)
+    TRANSACTION_GROSS = 91           # (netto, moms, brutto)
+    TRANSACTION_VAT_RATE = 92        # (angiven sats %, gällande sats %)
+    TRANSACTION_REVERSE_CHARGE = 93  # (moms,)
+    VAT_BALANCE = 94                 # (beräknad, rapporterad)
+    # Dubbletter (dedup): (antal, källa, först sedd i, id, fler, borttagna)
+    DUPLICATES_REPLAYED = 95         # redovisade i en tidigare körning
+    DUPLICATES_WITHIN = 96           # inom samma källa
+    DUPLICATES_ACROSS = 97           # i en källa som redan lästs
+    # Ogiltigt motpartsnummer (counterparts): (slag, nummer, motpart, antal, kod, nyttolast)
+    COUNTERPART = 98
+    
+    @property
+    def is_valid(self) -> bool:
+        return self in VALID_CODES
+
+
+VALID_CODES = frozenset({
+    ValidationCode.ORG_NUMBER_OK, ValidationCode.VAT_NUMBER_OK,
+    ValidationCode.BANKGIRO_OK, ValidationCode.PLUSGIRO_OK,
+    ValidationCode.PERSONAL_NUMBER_OK, ValidationCode.VAT_CALCULATION_OK,
+    ValidationCode.GROSS_AMOUNT_OK, ValidationCode.BAS_ACCOUNT_OK,
+})
+
+# Utfall utan nyttolast som (kod, ()), delade så att de inte skapas per värde
+_PLAIN = {code: (code, ()) for code in ValidationCode}
+
+# Namn på slagen av nummer i CHECKS (sv, en)
+IDENTIFIER_NAMES = {
+    "org_number": ("organisationsnummer", "organisation number"),
+    "vat_number": ("VAT-nummer", "VAT number"),
+}
+
+# Kontoklassernas namn (sv, en)
+BAS_CLASS_NAMES = {
+    1: ("Tillgångar", "Assets"),
+    2: ("Eget kapital och skulder", "Equity and liabilities"),
+    3: ("Intäkter", "Revenue"),
+    4: ("Kostnader för varor/material", "Cost of goods and materials"),
+    5: ("Övriga externa kostnader", "Other external expenses"),
+    6: ("Övriga externa kostnader", "Other external expenses"),
+    7: ("Personalkostnader", "Personnel expenses"),
+    8: ("Finansiella poster", "Financial items")
+}
+
+
+def render_message(code: ValidationCode, args: tuple = (), lang: str = "sv",
+                   legacy: bool = False) -> str:
+    """
+    Meddelandet för ett utfall på språket lang ("sv" eller "en"). Med legacy
+    används de svenska texterna från rapportversion 1 där de skiljer sig.
+    """
+    return renderer(code, lang, legacy)(*args)
+
+
+@lru_cache(maxsize=None)
+def renderer(code: ValidationCode, lang: str = "sv",
+             legacy: bool = False) -> Callable[..., str]:
+    """Funktion som renderar nyttolasten för code på språket lang (cachad per par)"""
+    try:
+        template = MESSAGES[code][LANGUAGES.index(lang)]
+    except ValueError:
+        raise ValueError(f"Okänt språk: {lang} (tillåtna: {', '.join(LANGUAGES)})") from None
+    if legacy and lang == "sv":
+        template = LEGACY_MESSAGES.get(code, template)
+    return template if callable(template) else template.format
+
+
+def format_ore(ore: int) -> str:
+    """Öre till kronor med två decimaler, t.ex. -1234 -> '-12.34'"""
+    sign = "-" if ore < 0 else ""
+    kronor, rest = divmod(abs(int(ore)), 100)
+    return f"{sign}{kronor}.{rest:02d}"
+
+
+def _org_in_vat(lang: str) -> Callable[..., str]:
+    prefix = ("Ogiltigt organisationsnummer i VAT: " if lang == "sv"
+              else "Invalid organisation number in VAT number: ")
+    return lambda code, *args: prefix + render_message(code, args, lang)
+
+
+def _transaction_vat(lang: str) -> Callable[..., str]:
+    template = ("Momsbelopp {} stämmer inte med {}% av {} (förväntat {})" if lang == "sv"
+                else "VAT amount {} does not match {}% of {} (expected {})")
+    return lambda net, vat, percent, expected: template.format(
+        format_ore(vat), percent, format_ore(net), format_ore(expected))
+
+
+def _transaction_gross(lang: str) -> Callable[..., str]:
+    template = ("Bruttobelopp {} ≠ netto {} + moms {} (diff: {})" if lang == "sv"
+                else "Gross amount {} ≠ net {} + VAT {} (diff: {})")
+    return lambda net, vat, gross: template.format(
+        format_ore(gross), format_ore(net), format_ore(vat), format_ore(abs(gross - net - vat)))
+
+
+def _amounts(template: str) -> Callable[..., str]:
+    """Mall där hela nyttolasten är belopp i öre"""
+    return lambda *amounts: template.format(*map(format_ore, amounts))
 
 
-@dataclass
+def _duplicates(lang: str, what: str) -> Callable[..., str]:
+    """Dubblettvarning; what är mall med {source} (källan) och {first} (först sedd i)"""
+    english = lang == "en"
+    default = "input" if english else "indata"
+    
+    def message(count, source, first, listed, more, dropped) -> str:
+        text = what.format(source=source or default, first=first or default)
+        if english:
+            action = "were removed" if dropped else "are counted twice"
+            ids = ", ".join("(no id)" if row_id is None else row_id for row_id in listed)
+            return f"{count} {text} {action}: ids {ids}{' …' if more else ''}"
+        action = "togs bort" if dropped else "räknas två gånger"
+        ids = ", ".join("(utan id)" if row_id is None else row_id for row_id in listed)
+        return f"{count} {text} {action}: id {ids}{' …' if more else ''}"
+    return message
+
+
+def _counterpart(lang: str) -> Callable[..., str]:
+    """Varning för ett ogiltigt motpartsnummer, med numrets eget fel inom parentes"""
+    english = lang == "en"
+    
+    def message(kind, identifier, counterpart, count, code, args) -> str:
+        detail = render_message(code, tuple(args), lang)
+        where = f"{counterpart}: " if counterpart else ""
+        name = IDENTIFIER_NAMES[kind][english]
+        if english:
+            return f"{where}invalid {name} {identifier} ({detail}) on {count} transactions"
+        return f"{where}ogiltigt {name} {identifier} ({detail}) på {count} transaktioner"
+    return message
+
+
+# Meddelanden per kod: (svenska, engelska). Mall för str.format med
+# nyttolasten som argument, eller funktion som tar nyttolasten.
+MESSAGES = {
+    ValidationCode.TEXT: ("{0}", "{0}"),
+    
+    ValidationCode.ORG_NUMBER_OK: ("Giltigt organisationsnummer", "Valid organisation number"),
+    ValidationCode.ORG_NUMBER_LENGTH: ("Organisationsnummer måste vara 10 siffror",
+                                       "Organisation number must be 10 digits"),
+    ValidationCode.ORG_NUMBER_LEADING_ZERO: ("Organisationsnummer kan inte börja med 0",
+                                             "Organisation number cannot start with 0"),
+    ValidationCode.ORG_NUMBER_CHECKSUM: ("Ogiltig kontrollsiffra (förväntat {0}, fick {1})",
+                                         "Invalid check digit (expected {0}, got {1})"),
+    
+    ValidationCode.VAT_NUMBER_OK: ("Giltigt VAT-nummer", "Valid VAT number"),
+    ValidationCode.VAT_NUMBER_MISSING: ("VAT-nummer saknas", "VAT number missing"),
+    ValidationCode.VAT_NUMBER_PREFIX: ("Svenskt VAT-nummer måste börja med SE",
+                                       "Swedish VAT number must start with SE"),
+    ValidationCode.VAT_NUMBER_LENGTH: ("VAT-nummer måste ha 12 siffror efter SE (fick {0})",
+                                       "VAT number must have 12 digits after SE (got {0})"),
+    ValidationCode.VAT_NUMBER_ORG: (_org_in_vat("sv"), _org_in_vat("en")),
+    ValidationCode.VAT_NUMBER_SUFFIX: ("VAT-nummer ska sluta med 01 (fick {0})",
+                                       "VAT number must end with 01 (got {0})"),
+    ValidationCode.VAT_NUMBER_NO_COUNTRY: ("VAT-nummer saknar landsprefix",
+                                           "VAT number has no country prefix"),
+    ValidationCode.VAT_NUMBER_EU_COUNTRY: ("VAT-nummer saknar landsprefix för ett EU-land",
+                                           "VAT number has no country prefix for an EU country"),
+    ValidationCode.VAT_NUMBER_EU_FORMAT: ("VAT-nummer har fel format för {0}",
+                                          "VAT number has the wrong format for {0}"),
+    
+    ValidationCode.BANKGIRO_OK: ("Giltigt bankgironummer", "Valid bankgiro number"),
+    ValidationCode.BANKGIRO_LENGTH: ("Bankgironummer måste vara 7-8 siffror",
+                                     "Bankgiro number must be 7-8 digits"),
+    ValidationCode.BANKGIRO_CHECKSUM: ("Ogiltig kontrollsiffra för bankgiro",
+                                       "Invalid check digit for bankgiro"),
+    
+    ValidationCode.PLUSGIRO_OK: ("Giltigt plusgironummer", "Valid plusgiro number"),
+    ValidationCode.PLUSGIRO_LENGTH: ("Plusgironummer måste vara 2-8 siffror",
+                                     "Plusgiro number must be 2-8 digits"),
+    ValidationCode.PLUSGIRO_CHECKSUM: ("Ogiltig kontrollsiffra för plusgiro",
+                                       "Invalid check digit for plusgiro"),
+    
+    ValidationCode.PERSONAL_NUMBER_OK: ("Giltigt personnummer", "Valid personal identity number"),
+    ValidationCode.PERSONAL_NUMBER_LENGTH: ("Personnummer måste vara 10 eller 12 siffror",
+                                            "Personal identity number must be 10 or 12 digits"),
+    ValidationCode.PERSONAL_NUMBER_MONTH: ("Ogiltig månad: {0}", "Invalid month: {0}"),
+    ValidationCode.PERSONAL_NUMBER_DAY: ("Ogiltig dag: {0}", "Invalid day: {0}"),
+    ValidationCode.PERSONAL_NUMBER_CHECKSUM: ("Ogiltig kontrollsiffra", "Invalid check digit"),
+    
+    ValidationCode.VAT_CALCULATION_OK: ("Momsberäkning OK", "VAT calculation OK"),
+    ValidationCode.VAT_CALCULATION: (
+        "Moms {0:.2f} stämmer inte med {1}% av {2:.2f} (förväntat {3:.2f}, diff {4:.2f})",
+        "VAT {0:.2f} does not match {1}% of {2:.2f} (expected {3:.2f}, diff {4:.2f})"),
+    
+    ValidationCode.GROSS_AMOUNT_OK: ("Bruttobelopp OK", "Gross amount OK"),
+    ValidationCode.GROSS_AMOUNT: (
+        "Bruttobelopp {0:.2f} ≠ netto {1:.2f} + moms {2:.2f} (förväntat {3:.2f})",
+        "Gross amount {0:.2f} ≠ net {1:.2f} + VAT {2:.2f} (expected {3:.2f})"),
+    
+    ValidationCode.BAS_ACCOUNT_OK: (
+        lambda account_class: f"Giltigt BAS-konto ({BAS_CLASS_NAMES[account_class][0]})",
+        lambda account_class: f"Valid BAS account ({BAS_CLASS_NAMES[account_class][1]})"),
+    ValidationCode.BAS_ACCOUNT_FORMAT: (
+        "Ogiltigt BAS-konto: {0} (ska vara 4 siffror, börja med 1-8)",
+        "Invalid BAS account: {0} (must be 4 digits starting with 1-8)"),
+    
+    ValidationCode.FIELD_MISSING: ("Fält saknas: {0}", "Missing field: {0}"),
+    ValidationCode.KWH_NEGATIVE: ("kWh kan inte vara negativt", "kWh cannot be negative"),
+    ValidationCode.KWH_HIGH: ("Osannolikt högt kWh-värde: {0}", "Implausibly high kWh value: {0}"),
+    
+    ValidationCode.TRANSACTION_VAT: (_transaction_vat("sv"), _transaction_vat("en")),
+    ValidationCode.TRANSACTION_GROSS: (_transaction_gross("sv"), _transaction_gross("en")),
+    ValidationCode.TRANSACTION_VAT_RATE: (
+        "Angiven momssats {0}% avviker från gällande {1}% för kategorin på transaktionsdatumet",
+        "Stated VAT rate {0}% differs from the applicable {1}% for the category on the "
+        "transaction date"),
+    ValidationCode.TRANSACTION_REVERSE_CHARGE: (
+        _amounts("Moms {} debiterad på försäljning till motpart utanför Sverige "
+                 "(omvänd skattskyldighet eller export ska faktureras utan moms)"),
+        _amounts("VAT {} charged on a sale to a counterpart outside Sweden "
+                 "(reverse charge or export must be invoiced without VAT)")),
+    ValidationCode.VAT_BALANCE: (
+        _amounts("Momsbalans stämmer inte: beräknad {} ≠ rapporterad {}"),
+        _amounts("VAT balance does not match: calculated {} ≠ reported {}")),
+    
+    ValidationCode.DUPLICATES_REPLAYED: (
+        _duplicates("sv", "transaktioner i {source} redovisades redan för {first} och"),
+        _duplicates("en", "transactions in {source} were already reported for {first} and")),
+    ValidationCode.DUPLICATES_WITHIN: (_duplicates("sv", "dubbletter inom {first}"),
+                                       _duplicates("en", "duplicates within {first}")),
+    ValidationCode.DUPLICATES_ACROSS: (
+        _duplicates("sv", "dubbletter i {source} som redan lästs från {first}"),
+        _duplicates("en", "duplicates in {source} already read from {first}")),
+    
+    ValidationCode.COUNTERPART: (_counterpart("sv"), _counterpart("en")),
+}
+
+
+def _legacy_amount(ore: int) -> str:
+    """Belopp som i rapportversion 1, där indatans flyttal skrevs ut: 16170 -> '161.7'"""
+    return repr(ore / 100)
+
+
+def _legacy_gross(net: int, vat: int, gross: int) -> str:
+    amounts = [_legacy_amount(amount) for amount in (gross, net, vat)]
+    # Decimal-differensen hade lika många decimaler som det längsta beloppet
+    decimals = max(len(amount.partition(".")[2]) for amount in amounts)
+    diff = abs(gross - net - vat) / 100
+    return "Bruttobelopp {} ≠ netto {} + moms {} (diff: {:.{}f})".format(*amounts, diff, decimals)
+
+
+# Svenska meddelanden i rapportversion 1 (VATProcessor(report_version=1)),
+# med belopp och procentsatser formaterade som före heltalsöre. Koder som
+# saknas här har samma text i båda versionerna.
+LEGACY_MESSAGES = {
+    ValidationCode.ORG_NUMBER_CHECKSUM: "Ogiltig kontrollsiffra (förväntat {0})",
+    ValidationCode.TRANSACTION_VAT: lambda net, vat, percent, expected: (
+        f"Momsbelopp {_legacy_amount(vat)} stämmer inte med {percent}.00% av "
+        f"{_legacy_amount(net)} (förväntat {format_ore(expected)})"),
+    ValidationCode.TRANSACTION_GROSS: _legacy_gross,
+}
+
+
+@dataclass(init=False)
 class ValidationResult:
+    """
+    Utfall av en validering som kod och nyttolast. message renderas på
+    svenska från code och args när det efterfrågas (även i asdict), och
+    render(lang) ger valfritt språk.
+    
+    Som tidigare går det att skapa ett utfall med färdig text,
+    ValidationResult(False, "text"); det får koden TEXT. Ett meddelande
+    som anges eller tilldelas visas som det är på alla språk.
+    """
     is_valid: bool
     message: str
     field: Optional[str] = None
     value: Optional[str] = None
+    code: ValidationCode = ValidationCode.TEXT
+    args: tuple = ()
+    
+    def __init__(self, is_valid: bool, message: Optional[str] = None,
+                 field: Optional[str] = None, value: Optional[str] = None,
+                 code: Optional[ValidationCode] = None, args: tuple = ()):
+        if message is not None:
+            code, args = ValidationCode.TEXT, (message,)
+            self.message = message
+        elif code is None:
+            raise TypeError("ValidationResult kräver message eller code")
+        self.is_valid = is_valid
+        self.field = field
+        self.value = value
+        self.code = code
+        self.args = args
+    
+    def __getattr__(self, name: str):
+        # Anropas bara när message inte angetts eller tilldelats
+        if name == "message" and "code" in self.__dict__:
+            return render_message(self.code, self.args)
+        raise AttributeError(name)
+    
+    def render(self, lang: str = "sv") -> str:
+        if "message" in self.__dict__:
+            return self.__dict__["message"]
+        return render_message(self.code, self.args, lang)
+
+
+def _luhn_check_digit(digits: str, count: int) -> int:
+    """Kontrollsiffra (modulus 10) för de första count siffrorna i digits"""
+    checksum = 0
+    double = True
+    # Dubblering från höger; ord() i stället för int() så inget allokeras
+    for i in range(count - 1, -1, -1):
+        d = ord(digits[i]) - 48
+        if double:
+            d *= 2
+            if d > 9:
+                d -= 9
+        checksum += d
+        double = not double
+    return (10 - checksum % 10) % 10
+
+
+# Kontrollerna returnerar (kod, nyttolast). Godkända värden ger ett delat
+# utfall ur _PLAIN.
+
+def _check_org_number(org_nr: str) -> tuple:
+    clean = _NON_DIGITS.sub('', org_nr)
+    if len(clean) != 10:
+        return _PLAIN[ValidationCode.ORG_NUMBER_LENGTH]
+    # Första siffran måste vara 1-9 (inte 0)
+    if clean[0] == '0':
+        return _PLAIN[ValidationCode.ORG_NUMBER_LEADING_ZERO]
+    expected_check = _luhn_check_digit(clean, 9)
+    check = ord(clean[9]) - 48
+    if check != expected_check:
+        return ValidationCode.ORG_NUMBER_CHECKSUM, (expected_check, check)
+    return _PLAIN[ValidationCode.ORG_NUMBER_OK]
+
+
+def _check_vat_number(vat_nr: str) -> tuple:
+    if not vat_nr:
+        return _PLAIN[ValidationCode.VAT_NUMBER_MISSING]
+    if not vat_nr.upper().strip().startswith("SE"):
+        return _PLAIN[ValidationCode.VAT_NUMBER_PREFIX]
+    
+    digits = _NON_DIGITS.sub('', vat_nr)
+    if len(digits) != 12:
+        return ValidationCode.VAT_NUMBER_LENGTH, (len(digits),)
+    
+    # Organisationsnumret (första 10 siffrorna)
+    org_code, org_args = _check_org_number(digits[:10])
+    if org_code != ValidationCode.ORG_NUMBER_OK:
+        return ValidationCode.VAT_NUMBER_ORG, (org_code, *org_args)
+    
+    # Sista två siffrorna ska vara 01
+    if digits[10:] != "01":
+        return ValidationCode.VAT_NUMBER_SUFFIX, (digits[10:],)
+    return _PLAIN[ValidationCode.VAT_NUMBER_OK]
+
+
+def _check_giro(number: str, min_length: int, max_length: int,
+                ok: ValidationCode, length: ValidationCode, checksum: ValidationCode) -> tuple:
+    clean = _NON_DIGITS.sub('', number)
+    if len(clean) < min_length or len(clean) > max_length:
+        return _PLAIN[length]
+    if ord(clean[-1]) - 48 != _luhn_check_digit(clean, len(clean) - 1):
+        return _PLAIN[checksum]
+    return _PLAIN[ok]
+
+
+def _check_bankgiro(bg_nr: str) -> tuple:
+    return _check_giro(bg_nr, 7, 8, ValidationCode.BANKGIRO_OK,
+                       ValidationCode.BANKGIRO_LENGTH, ValidationCode.BANKGIRO_CHECKSUM)
+
+
+def _check_plusgiro(pg_nr: str) -> tuple:
+    # Samma Luhn-algoritm som bankgiro
+    return _check_giro(pg_nr, 2, 8, ValidationCode.PLUSGIRO_OK,
+                       ValidationCode.PLUSGIRO_LENGTH, ValidationCode.PLUSGIRO_CHECKSUM)
+
+
+def _check_personal_number(pnr: str) -> tuple:
+    clean = _NON_DIGITS.sub('', pnr)
+    # 12-siffrigt (ÅÅÅÅMMDD-NNNN) valideras som 10-siffrigt
+    offset = 2 if len(clean) == 12 else 0
+    if len(clean) - offset != 10:
+        return _PLAIN[ValidationCode.PERSONAL_NUMBER_LENGTH]
+    if offset:
+        clean = clean[offset:]
+    
+    # Validera datum (grundläggande)
+    month = (ord(clean[2]) - 48) * 10 + ord(clean[3]) - 48
+    day = (ord(clean[4]) - 48) * 10 + ord(clean[5]) - 48
+    if month < 1 or month > 12:
+        return ValidationCode.PERSONAL_NUMBER_MONTH, (month,)
+    if day < 1 or day > 31:
+        return ValidationCode.PERSONAL_NUMBER_DAY, (day,)
+    
+    if ord(clean[9]) - 48 != _luhn_check_digit(clean, 9):
+        return _PLAIN[ValidationCode.PERSONAL_NUMBER_CHECKSUM]
+    return _PLAIN[ValidationCode.PERSONAL_NUMBER_OK]
+
+
+# Godkända BAS-konton per första siffra (kontoklass)
+_BAS_ACCOUNT_CLASSES = {
+    str(account_class): (ValidationCode.BAS_ACCOUNT_OK, (account_class,))
+    for account_class in BAS_CLASS_NAMES
+}
+
+
+def _check_bas_account(account: str) -> tuple:
+    if not _BAS_ACCOUNT.match(account):
+        return ValidationCode.BAS_ACCOUNT_FORMAT, (account,)
+    return _BAS_ACCOUNT_CLASSES[account[0]]
 
 
+# Kontroller för validate/validate_many, per slag (samma som ValidationResult.field)
+CHECKS = {
+    "org_number": _check_org_number,
+    "vat_number": _check_vat_number,
+    "bankgiro": _check_bankgiro,
+    "plusgiro": _check_plusgiro,
+    "personal_number": _check_personal_number,
+    "bas_account": _check_bas_account,
+}
+
 class SwedishValidators:
     """Samling av svenska validerare"""
     
+    @staticmethod
+    def validate(kind: str, value: str) -> ValidationResult:
+        """Validerar value som kind (nyckel i CHECKS, t.ex. "org_number")"""
+        code, args = CHECKS[kind](value)
+        return ValidationResult(code in VALID_CODES, field=kind, value=value, code=code, args=args)
+    
+    @staticmethod
+    def validate_many(kind: str, values: Iterable[str]) -> array:
+        """
+        Validerar många värden av slaget kind till en array('B') med en
+        ValidationCode per värde. Inga resultatobjekt eller meddelanden
+        skapas; meddelandet för ett underkänt värde fås med validate.
+        """
+        check = CHECKS[kind]
+        return array('B', (check(value)[0] for value in values))
+    
     # === ORGANISATIONSNUMMER ===
     
     @staticmethod
@@ -29,46 +520,7 @@ class SwedishValidators:
         Format: NNNNNN-NNNN eller NNNNNNNNNN
         Kontrollsiffra enligt Luhn-algoritmen.
         """
-        clean = re.sub(r'[^0-9]', '', org_nr)
-        
-        if len(clean) != 10:
-            return ValidationResult(
-                False, 
-                "Organisationsnummer måste vara 10 siffror",
-                "org_number",
-                org_nr
-            )
-        
-        # Första siffran måste vara 1-9 (inte 0)
-        if clean[0] == '0':
-            return ValidationResult(
-                False,
-                "Organisationsnummer kan inte börja med 0",
-                "org_number",
-                org_nr
-            )
-        
-        # Luhn-algoritm
-        digits = [int(d) for d in clean]
-        checksum = 0
-        for i in range(9):
-            d = digits[i]
-            if i % 2 == 0:
-                doubled = d * 2
-                checksum += doubled if doubled < 10 else doubled - 9
-            else:
-                checksum += d
-        
-        expected_check = (10 - (checksum % 10)) % 10
-        if digits[9] != expected_check:
-            return ValidationResult(
-                False,
-                f"Ogiltig kontrollsiffra (förväntat {expected_check}, fick {digits[9]})",
-                "org_number",
-                org_nr
-            )
-        
-        return ValidationResult(True, "Giltigt organisationsnummer", "org_number", org_nr)
+        return SwedishValidators.validate("org_number", org_nr)
     
     # === VAT-NUMMER ===
     
@@ -78,49 +530,7 @@ class SwedishValidators:
         Validerar svenskt VAT-nummer.
         Format: SE + 10 siffror org.nr + 01
         """
-        if not vat_nr:
-            return ValidationResult(False, "VAT-nummer saknas", "vat_number", vat_nr)
-        
-        upper = vat_nr.upper().strip()
-        
-        if not upper.startswith("SE"):
-            return ValidationResult(
-                False,
-                "Svenskt VAT-nummer måste börja med SE",
-                "vat_number",
-                vat_nr
-            )
-        
-        digits = re.sub(r'[^0-9]', '', vat_nr)
-        
-        if len(digits) != 12:
-            return ValidationResult(
-                False,
-                f"VAT-nummer måste ha 12 siffror efter SE (fick {len(digits)})",
-                "vat_number",
-                vat_nr
-            )
-        
-        # Validera organisationsnummer (första 10 siffrorna)
-        org_result = SwedishValidators.validate_org_number(digits[:10])
-        if not org_result.is_valid:
-            return ValidationResult(
-                False,
-                f"Ogiltigt organisationsnummer i VAT: {org_result.message}",
-                "vat_number",
-                vat_nr
-            )
-        
-        # Sista två siffrorna ska vara 01
-        if digits[10:] != "01":
-            return ValidationResult(
-                False,
-                f"VAT-nummer ska sluta med 01 (fick {digits[10:]})",
-                "vat_number",
-                vat_nr
-            )
-        
-        return ValidationResult(True, "Giltigt VAT-nummer", "vat_number", vat_nr)
+        return SwedishValidators.validate("vat_number", vat_nr)
     
     # === BANKGIRO ===
     
@@ -131,36 +541,7 @@ class SwedishValidators:
         Format: NNN-NNNN eller NNNN-NNNN (7-8 siffror)
         Kontrollsiffra enligt modulus 10.
         """
-        clean = re.sub(r'[^0-9]', '', bg_nr)
-        
-        if len(clean) < 7 or len(clean) > 8:
-            return ValidationResult(
-                False,
-                "Bankgironummer måste vara 7-8 siffror",
-                "bankgiro",
-                bg_nr
-            )
-        
-        # Luhn-algoritm (modulus 10)
-        digits = [int(d) for d in clean]
-        checksum = 0
-        for i, d in enumerate(reversed(digits[:-1])):
-            if i % 2 == 0:
-                doubled = d * 2
-                checksum += doubled if doubled < 10 else doubled - 9
-            else:
-                checksum += d
-        
-        expected_check = (10 - (checksum % 10)) % 10
-        if digits[-1] != expected_check:
-            return ValidationResult(
-                False,
-                f"Ogiltig kontrollsiffra för bankgiro",
-                "bankgiro",
-                bg_nr
-            )
-        
-        return ValidationResult(True, "Giltigt bankgironummer", "bankgiro", bg_nr)
+        return SwedishValidators.validate("bankgiro", bg_nr)
     
     # === PLUSGIRO ===
     
@@ -170,36 +551,7 @@ class SwedishValidators:
         Validerar plusgironummer.
         Format: N-NNNNNN eller liknande (2-8 siffror)
         """
-        clean = re.sub(r'[^0-9]', '', pg_nr)
-        
-        if len(clean) < 2 or len(clean) > 8:
-            return ValidationResult(
-                False,
-                "Plusgironummer måste vara 2-8 siffror",
-                "plusgiro",
-                pg_nr
-            )
-        
-        # Samma Luhn-algoritm som bankgiro
-        digits = [int(d) for d in clean]
-        checksum = 0
-        for i, d in enumerate(reversed(digits[:-1])):
-            if i % 2 == 0:
-                doubled = d * 2
-                checksum += doubled if doubled < 10 else doubled - 9
-            else:
-                checksum += d
-        
-        expected_check = (10 - (checksum % 10)) % 10
-        if digits[-1] != expected_check:
-            return ValidationResult(
-                False,
-                "Ogiltig kontrollsiffra för plusgiro",
-                "plusgiro",
-                pg_nr
-            )
-        
-        return ValidationResult(True, "Giltigt plusgironummer", "plusgiro", pg_nr)
+        return SwedishValidators.validate("plusgiro", pg_nr)
     
     # === PERSONNUMMER ===
     
@@ -209,61 +561,7 @@ class SwedishValidators:
         Validerar svenskt personnummer.
         Format: ÅÅMMDD-NNNN eller ÅÅÅÅMMDD-NNNN
         """
-        clean = re.sub(r'[^0-9]', '', pnr)
-        
-        # Konvertera 12-siffrigt till 10-siffrigt
-        if len(clean) == 12:
-            clean = clean[2:]
-        
-        if len(clean) != 10:
-            return ValidationResult(
-                False,
-                "Personnummer måste vara 10 eller 12 siffror",
-                "personal_number",
-                pnr
-            )
-        
-        # Validera datum (grundläggande)
-        month = int(clean[2:4])
-        day = int(clean[4:6])
-        
-        if month < 1 or month > 12:
-            return ValidationResult(
-                False,
-                f"Ogiltig månad: {month}",
-                "personal_number",
-                pnr
-            )
-        
-        if day < 1 or day > 31:
-            return ValidationResult(
-                False,
-                f"Ogiltig dag: {day}",
-                "personal_number",
-                pnr
-            )
-        
-        # Luhn-algoritm
-        digits = [int(d) for d in clean]
-        checksum = 0
-        for i in range(9):
-            d = digits[i]
-            if i % 2 == 0:
-                doubled = d * 2
-                checksum += doubled if doubled < 10 else doubled - 9
-            else:
-                checksum += d
-        
-        expected_check = (10 - (checksum % 10)) % 10
-        if digits[9] != expected_check:
-            return ValidationResult(
-                False,
-                "Ogiltig kontrollsiffra",
-                "personal_number",
-                pnr
-            )
-        
-        return ValidationResult(True, "Giltigt personnummer", "personal_number", pnr)
+        return SwedishValidators.validate("personal_number", pnr)
     
     # === MOMSBERÄKNING ===
     
@@ -280,19 +578,16 @@ class SwedishValidators:
             rate_percent: Momssats i procent (25, 12, 6, 0)
             tolerance: Tillåten avvikelse i SEK
         """
-        rate = Decimal(str(rate_percent)) / Decimal("100")
-        expected_vat = net * rate
-        diff = abs(vat - expected_vat)
+        rate = rate_percent if isinstance(rate_percent, int) else Decimal(str(rate_percent))
+        # |moms - netto * sats / 100| <= tolerans, utan division
+        if abs(vat * 100 - net * rate) <= tolerance * 100:
+            return ValidationResult(True, field="vat_calculation",
+                                    code=ValidationCode.VAT_CALCULATION_OK)
         
-        if diff > tolerance:
-            return ValidationResult(
-                False,
-                f"Moms {vat:.2f} stämmer inte med {rate_percent}% av {net:.2f} "
-                f"(förväntat {expected_vat:.2f}, diff {diff:.2f})",
-                "vat_calculation"
-            )
-        
-        return ValidationResult(True, "Momsberäkning OK", "vat_calculation")
+        expected_vat = net * (Decimal(str(rate_percent)) / Decimal("100"))
+        diff = abs(vat - expected_vat)
+        return ValidationResult(False, field="vat_calculation", code=ValidationCode.VAT_CALCULATION,
+                                args=(vat, rate_percent, net, expected_vat, diff))
     
     @staticmethod
     def validate_gross_amount(net: Decimal, vat: Decimal, gross: Decimal,
@@ -301,17 +596,10 @@ class SwedishValidators:
         Validerar att bruttobelopp = netto + moms.
         """
         expected_gross = net + vat
-        diff = abs(gross - expected_gross)
-        
-        if diff > tolerance:
-            return ValidationResult(
-                False,
-                f"Bruttobelopp {gross:.2f} ≠ netto {net:.2f} + moms {vat:.2f} "
-                f"(förväntat {expected_gross:.2f})",
-                "gross_amount"
-            )
-        
-        return ValidationResult(True, "Bruttobelopp OK", "gross_amount")
+        if abs(gross - expected_gross) <= tolerance:
+            return ValidationResult(True, field="gross_amount", code=ValidationCode.GROSS_AMOUNT_OK)
+        return ValidationResult(False, field="gross_amount", code=ValidationCode.GROSS_AMOUNT,
+                                args=(gross, net, vat, expected_gross))
     
     # === BAS-KONTO ===
     
@@ -321,33 +609,7 @@ class SwedishValidators:
         Validerar BAS-kontonummer.
         Format: 4 siffror, börjar med 1-8
         """
-        if not re.match(r'^[1-8]\d{3}$', account):
-            return ValidationResult(
-                False,
-                f"Ogiltigt BAS-konto: {account} (ska vara 4 siffror, börja med 1-8)",
-                "bas_account",
-                account
-            )
-        
-        # Kontrollera kontoklass
-        account_class = int(account[0])
-        class_names = {
-            1: "Tillgångar",
-            2: "Eget kapital och skulder",
-            3: "Intäkter",
-            4: "Kostnader för varor/material",
-            5: "Övriga externa kostnader",
-            6: "Övriga externa kostnader",
-            7: "Personalkostnader",
-            8: "Finansiella poster"
-        }
-        
-        return ValidationResult(
-            True,
-            f"Giltigt BAS-konto ({class_names.get(account_class, 'Okänd klass')})",
-            "bas_account",
-            account
-        )
+        return SwedishValidators.validate("bas_account", account)
 
 
 class TransactionValidator:
@@ -368,9 +630,7 @@ class TransactionValidator:
         required = ['amount', 'subAmount', 'vat', 'vatRate']
         for field in required:
             if field not in transaction:
-                results.append(ValidationResult(
-                    False, f"Fält saknas: {field}", field
-                ))
+                results.append(_missing(field))
         
         if results:
             return results
@@ -392,17 +652,72 @@ class TransactionValidator:
         
         # Validera kWh om det finns
         if 'kwh' in transaction and transaction['kwh']:
-            kwh = Decimal(str(transaction['kwh']))
-            if kwh < 0:
-                results.append(ValidationResult(
-                    False, "kWh kan inte vara negativt", "kwh"
-                ))
-            elif kwh > 500:  # Rimlighetskontroll
-                results.append(ValidationResult(
-                    False, f"Osannolikt högt kWh-värde: {kwh}", "kwh"
-                ))
+            result = _kwh_result(Decimal(str(transaction['kwh'])))
+            if result is not None:
+                results.append(result)
         
         return results
+    
+    def validate_batch(self, batch) -> list[tuple[int, ValidationResult]]:
+        """
+        Validerar en vat_processor.TransactionBatch kolumnvis med samma regler
+        som validate_ev_charging_transaction, räknat i öre. Bara underkända
+        kontroller returneras, som (radposition, resultat) i radordning;
+        godkända rader ger inga objekt.
+        """
+        if batch.vat_rate is None:
+            return [(row, _missing("vatRate")) for row in range(len(batch))]
+        
+        net = abs(batch.net)
+        vat = abs(batch.vat)
+        gross = abs(batch.gross)
+        rate = batch.vat_rate.astype("int64")
+        stated = batch.has(batch.FLAG_RATE)
+        
+        # Tolerans 0,05 kr: |moms - netto * sats / 100| > 5 öre, exakt i heltal
+        failed = [
+            ((~stated).nonzero()[0], 0),
+            ((stated & (abs(vat * 100 - net * rate) > 500)).nonzero()[0], 1),
+            ((stated & (abs(gross - net - vat) > 5)).nonzero()[0], 2),
+        ]
+        if batch.kwh is not None:
+            kwh = batch.has(batch.FLAG_KWH)
+            failed.append(((stated & kwh & ((batch.kwh < 0) | (batch.kwh > 500))).nonzero()[0], 3))
+        
+        results = []
+        for rows, check in failed:
+            for row in rows.tolist():
+                results.append((row, check, self._batch_result(batch, row, check)))
+        results.sort(key=lambda item: item[:2])
+        return [(row, result) for row, _, result in results]
+    
+    def _batch_result(self, batch, row: int, check: int) -> ValidationResult:
+        """Resultat (kod och nyttolast) för en underkänd kontroll i en batch"""
+        def kronor(ore) -> Decimal:
+            return Decimal(abs(int(ore))).scaleb(-2)
+        
+        if check == 0:
+            return _missing("vatRate")
+        if check == 1:
+            return self.validators.validate_vat_calculation(
+                kronor(batch.net[row]), kronor(batch.vat[row]), int(batch.vat_rate[row]))
+        if check == 2:
+            return self.validators.validate_gross_amount(
+                kronor(batch.net[row]), kronor(batch.vat[row]), kronor(batch.gross[row]))
+        return _kwh_result(Decimal(str(float(batch.kwh[row]))))
+
+
+def _missing(field: str) -> ValidationResult:
+    return ValidationResult(False, field=field, code=ValidationCode.FIELD_MISSING, args=(field,))
+
+
+def _kwh_result(kwh: Decimal) -> Optional[ValidationResult]:
+    """Underkänt resultat för ett orimligt kWh-värde, annars None"""
+    if kwh < 0:
+        return ValidationResult(False, field="kwh", code=ValidationCode.KWH_NEGATIVE)
+    if kwh > 500:  # Rimlighetskontroll
+        return ValidationResult(False, field="kwh", code=ValidationCode.KWH_HIGH, args=(kwh,))
+    return None
 
 
 # CLI-stöd
@@ -410,27 +725,29 @@ if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 3:
-        print("Användning: python validators.py <typ> <värde>")
+        print("Användning: python validators.py <typ> <värde> [sv|en]")
         print("Typer: org, vat, bg, pg, pnr")
         sys.exit(1)
     
     validator_type = sys.argv[1].lower()
     value = sys.argv[2]
-    
-    validators = SwedishValidators()
+    lang = sys.argv[3] if len(sys.argv) > 3 else "sv"
     
     type_map = {
-        "org": validators.validate_org_number,
-        "vat": validators.validate_vat_number,
-        "bg": validators.validate_bankgiro,
-        "pg": validators.validate_plusgiro,
-        "pnr": validators.validate_personal_number
+        "org": "org_number",
+        "vat": "vat_number",
+        "bg": "bankgiro",
+        "pg": "plusgiro",
+        "pnr": "personal_number"
     }
     
     if validator_type not in type_map:
         print(f"Okänd typ: {validator_type}")
         sys.exit(1)
+    if lang not in LANGUAGES:
+        print(f"Okänt språk: {lang} (tillåtna: {', '.join(LANGUAGES)})")
+        sys.exit(1)
     
-    result = type_map[validator_type](value)
-    print(f"{'✓' if result.is_valid else '✗'} {result.message}")
+    result = SwedishValidators.validate(type_map[validator_type], value)
+    print(f"{'✓' if result.is_valid else '✗'} {result.render(lang)}")
     sys.exit(0 if result.is_valid else 1)
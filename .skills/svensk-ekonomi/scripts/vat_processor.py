@@ -4,14 +4,45 @@ Svensk momsprocessor för elbilsladdning och allmän redovisning.
 Validerar mot svenska regler och BAS-kontoplanen.
 """
 
+from __future__ import annotations
+
+import importlib
 import json
+import os
 import re
-from dataclasses import dataclass, field, asdict
-from datetime import datetime
-from decimal import Decimal, ROUND_HALF_UP
+import time
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from enum import Enum
-from typing import Optional
-import pandas as pd
+from typing import Callable, Iterable, Optional
+
+from constants import (CATEGORY_COLUMN, COUNTERPART_COLUMN, COUNTRY_COLUMN, DATE_COLUMN,
+                       DUPLICATE_POLICIES, ORG_NUMBER_COLUMN, ROAMING_COLUMN, VAT_NUMBER_COLUMN)
+from validators import LANGUAGES, ValidationCode, format_ore, render_message, renderer
+
+
+class _LazyModule:
+    """
+    Importerar en tung modul (numpy, pandas) först när den används, så att
+    t.ex. --help och import av modulen startar snabbt. Vid första åtkomst
+    ersätts platshållaren med den riktiga modulen.
+    """
+    
+    def __init__(self, name: str, alias: str):
+        self._name = name
+        self._alias = alias
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+np = _LazyModule("numpy", "np")
+pd = _LazyModule("pandas", "pd")
 
 
 class VATRate(Enum):
@@ -20,29 +51,407 @@ class VATRate(Enum):
     REDUCED_12 = Decimal("0.12")
     REDUCED_6 = Decimal("0.06")
     ZERO = Decimal("0")
+    
+    @property
+    def percent(self) -> int:
+        """Momssats i hela procent"""
+        return int(self.value * 100)
+
+
+ENGINES = ("scalar", "vectorized")
+
+# Rapportformat: 1 är formatet före heltalsöre (samma nycklar, bokföringsförslag,
+# meddelandetexter och inköpstotaler utan 6 %), 2 har klassning, 6 % inköp
+# och balanserat bokföringsförslag
+REPORT_VERSIONS = (1, 2)
+
+# Ordning för momssatskoder i den kolumnvisa motorn
+RATE_ORDER = (VATRate.STANDARD, VATRate.REDUCED_12, VATRate.REDUCED_6, VATRate.ZERO)
+RATE_PERCENT = (25, 12, 6, 0)
+
+# Alla belopp i pipelinen räknas i heltal öre. Decimal/float förekommer
+# bara vid inläsning (to_ore) och i output (ore_to_float, validators.format_ore).
+ORE_PER_SEK = 100
+
+# Valideringstolerans (0,02 kr) i öre
+TOLERANCE_ORE = 2
+
+# Största belopp (i öre) som kan läsas exakt från float64. Upp till 15
+# signifikanta siffror överlever str(float) -> Decimal oförändrat.
+MAX_ABS_ORE = 10**15 - 1
+
+# Summor vars absolutbelopp kan nå hit räknas med Python-heltal i stället
+# för int64 så att de aldrig slår runt
+_INT64_SUM_LIMIT = 2**62
+
+
+def to_ore(value) -> int:
+    """
+    Konverterar ett belopp i kronor till heltal öre.
+    Värden med fler än två decimaler avrundas ROUND_HALF_UP.
+    """
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Ogiltigt belopp: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Ogiltigt belopp: {value!r}")
+    
+    ore = int((amount * ORE_PER_SEK).to_integral_value(rounding=ROUND_HALF_UP))
+    if abs(ore) > MAX_ABS_ORE:
+        raise OverflowError(f"Belopp utanför giltigt intervall: {value!r}")
+    return ore
+
+
+def ore_array(values: np.ndarray) -> np.ndarray:
+    """
+    Konverterar en beloppskolumn till int64 öre med samma regler som to_ore.
+    Bara värden som inte redan är exakta örebelopp konverteras ett och ett.
+    """
+    if values.dtype.kind in "iu":
+        if len(values) and np.abs(values).max() > MAX_ABS_ORE // ORE_PER_SEK:
+            bad = values[np.abs(values) > MAX_ABS_ORE // ORE_PER_SEK][0]
+            raise OverflowError(f"Belopp utanför giltigt intervall: {bad!r}")
+        return values.astype(np.int64) * ORE_PER_SEK
+    
+    if values.dtype.kind != "f":
+        return np.fromiter((to_ore(v) for v in values), dtype=np.int64, count=len(values))
+    
+    with np.errstate(invalid="ignore"):
+        ore = np.rint(values * ORE_PER_SEK)
+        exact = np.isfinite(ore) & (np.abs(ore) <= MAX_ABS_ORE) & (ore / ORE_PER_SEK == values)
+    result = np.where(exact, ore, 0).astype(np.int64)
+    for position in np.flatnonzero(~exact):
+        result[position] = to_ore(values[position])
+    return result
+
+
+def ore_to_float(ore: int) -> float:
+    """Öre till kronor som float (för JSON-output)"""
+    return int(ore) / ORE_PER_SEK
+
+
+def _bucket_sums(buckets: np.ndarray, values: np.ndarray, size: int) -> list:
+    """
+    Summerar öre per hink i ett pass. Om summan skulle kunna spilla över
+    int64 räknas den i stället exakt med Python-heltal.
+    """
+    if np.abs(values).sum(dtype=np.float64) < _INT64_SUM_LIMIT:
+        sums = np.zeros(size, dtype=np.int64)
+        np.add.at(sums, buckets, values)
+        return [int(s) for s in sums]
+    
+    sums = [0] * size
+    for bucket, value in zip(buckets.tolist(), values.tolist()):
+        sums[bucket] += value
+    return sums
+
+
+def _row_ids(df: pd.DataFrame, positions: np.ndarray) -> np.ndarray:
+    """
+    Transaktions-id för givna radpositioner, med samma typ som en rad från
+    iterrows() får (t.ex. 1.0 i en helt numerisk frame med flyttal).
+    """
+    if 'id' not in df.columns:
+        return np.full(len(positions), "unknown", dtype=object)
+    
+    ids = df['id'].iloc[positions]
+    row_dtype = df.iloc[:0].to_numpy().dtype
+    if row_dtype == object:
+        return ids.to_numpy(dtype=object)
+    return ids.to_numpy().astype(row_dtype).astype(object)
+
+
+PERIODS = ("month", "quarter")
+
+# Tidszon som perioder och momssatser räknas i när datumen har tidszon (t.ex. ISO-tider i UTC)
+LOCAL_TIMEZONE = "Europe/Stockholm"
+
+
+def _local_dates(values) -> pd.Series:
+    """Datum utan tidszon, omräknade till svensk tid om de har tidszon"""
+    dates = pd.to_datetime(pd.Series(values), errors="coerce")
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(LOCAL_TIMEZONE).dt.tz_localize(None)
+    return dates
+
+
+def _period_codes(df: pd.DataFrame, date_column: str, period_by: str) -> tuple:
+    """
+    Periodindex per rad (0..n-1) och periodnamnen i stigande ordning.
+    Rader utan belopp (amount == 0 eller saknas) behöver inget datum.
+    """
+    if period_by not in PERIODS:
+        raise ValueError(f"Okänd periodindelning: {period_by} (tillåtna: {', '.join(PERIODS)})")
+    if date_column not in df.columns:
+        raise ValueError(f"Datumkolumnen '{date_column}' saknas")
+    
+    dates = _local_dates(df[date_column])
+    
+    amount = df['amount']
+    missing = dates.isna().to_numpy() & ((amount > 0) | (amount < 0)).to_numpy(dtype=bool)
+    if missing.any():
+        raise ValueError(f"{int(missing.sum())} transaktioner saknar giltigt datum i '{date_column}'")
+    
+    years = dates.dt.year.fillna(0).to_numpy(dtype=np.int64)
+    months = dates.dt.month.fillna(1).to_numpy(dtype=np.int64)
+    if period_by == "month":
+        keys = years * 12 + (months - 1)
+    else:
+        keys = years * 4 + (months - 1) // 3
+    keys[dates.isna().to_numpy()] = -1
+    
+    unique_keys, codes = np.unique(keys, return_inverse=True)
+    if len(unique_keys) and unique_keys[0] == -1:
+        # Rader utan datum och belopp bidrar inte till någon rapport
+        unique_keys = unique_keys[1:]
+        codes = codes - 1
+        codes[codes < 0] = 0
+    
+    if period_by == "month":
+        labels = [f"{key // 12:04d}-{key % 12 + 1:02d}" for key in unique_keys]
+    else:
+        labels = [f"{key // 4:04d}-Q{key % 4 + 1}" for key in unique_keys]
+    return codes, labels
+
+
+# Procentsats -> VATRate; okända satser räknas som 25%
+RATE_BY_PERCENT = {rate.percent: rate for rate in RATE_ORDER}
+
+# Nyckel i tidslinjen: kategoriindex * _TIMELINE_SPAN + dagnummer + _TIMELINE_OFFSET
+_TIMELINE_SPAN = 2**32
+_TIMELINE_OFFSET = 2**31
+
+
+def _day_number(day: date) -> int:
+    """Dagar sedan 1970-01-01"""
+    return (day - date(1970, 1, 1)).days
+
+
+class VATRateTimeline:
+    """
+    Momssats per kategori över tid. Varje kategori har en lista med
+    (gäller från och med, momssats); en sats gäller tills nästa ändring.
+    Hela datumkolumner slås upp med en enda searchsorted.
+    """
+    
+    def __init__(self, changes: dict):
+        self.categories = tuple(sorted(changes))
+        self._changes = {
+            category: sorted(changes[category], key=lambda change: change[0])
+            for category in self.categories
+        }
+        keys = []
+        codes = []
+        for index, category in enumerate(self.categories):
+            for start, rate in self._changes[category]:
+                keys.append(index * _TIMELINE_SPAN + _day_number(start) + _TIMELINE_OFFSET)
+                codes.append(RATE_ORDER.index(rate))
+        self._keys = keys
+        self._codes = codes
+    
+    @staticmethod
+    def _normalize(category) -> str:
+        return str(category).strip().lower()
+    
+    def rate_for(self, category: str, day: date) -> VATRate:
+        """Momssats för en kategori ett visst datum"""
+        name = self._normalize(category)
+        if name not in self._changes:
+            raise ValueError(f"Okänd momskategori: {category} (tillåtna: {', '.join(self.categories)})")
+        changes = self._changes[name]
+        position = bisect_right([start for start, _ in changes], day) - 1
+        if position < 0:
+            raise ValueError(f"Ingen momssats för {name} före {changes[0][0]}")
+        return changes[position][1]
+    
+    def resolve(self, categories, dates) -> np.ndarray:
+        """
+        Momssats per rad som index i RATE_ORDER.
+        
+        Args:
+            categories: Kategorinamn per rad
+            dates: Datum per rad (datetime64, utan tidszon)
+        """
+        names = pd.Series(categories, dtype=object).map(self._normalize)
+        index = pd.Categorical(names, categories=self.categories).codes
+        if (index < 0).any():
+            unknown = sorted(set(names[index < 0]))
+            raise ValueError(f"Okänd momskategori: {', '.join(unknown)} (tillåtna: {', '.join(self.categories)})")
+        
+        days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+        keys = index.astype(np.int64) * _TIMELINE_SPAN + days + _TIMELINE_OFFSET
+        starts = np.array(self._keys, dtype=np.int64)
+        positions = np.searchsorted(starts, keys, side="right") - 1
+        # Datum före kategorins första sats landar i föregående kategori
+        before = (positions < 0) | (starts[np.maximum(positions, 0)] // _TIMELINE_SPAN != index)
+        if before.any():
+            raise ValueError(f"{int(before.sum())} transaktioner är daterade före sin kategoris första momssats")
+        return np.array(self._codes, dtype=np.uint8)[positions]
+
+
+# Gällande momssatser per kategori. Livsmedel sänks tillfälligt till 6%
+# från 2026-04-01 till och med 2027-12-31.
+VAT_RATE_TIMELINE = VATRateTimeline({
+    "standard": [(date.min, VATRate.STANDARD)],
+    "livsmedel": [
+        (date.min, VATRate.REDUCED_12),
+        (date(2026, 4, 1), VATRate.REDUCED_6),
+        (date(2028, 1, 1), VATRate.REDUCED_12),
+    ],
+    "restaurang": [(date.min, VATRate.REDUCED_12)],
+    "hotell": [(date.min, VATRate.REDUCED_12)],
+    "kultur": [(date.min, VATRate.REDUCED_6)],
+    "persontransport": [(date.min, VATRate.REDUCED_6)],
+    "momsfri": [(date.min, VATRate.ZERO)],
+})
+
+
+def _round_half_up_div(numerator: np.ndarray, denominator: int) -> np.ndarray:
+    """Heltalsdivision avrundad som ROUND_HALF_UP (halva bort från noll)"""
+    half = denominator // 2
+    return np.sign(numerator) * ((np.abs(numerator) + half) // denominator)
+
+
+def _round_half_up_ore(numerator: int, denominator: int) -> int:
+    """Skalär motsvarighet till _round_half_up_div"""
+    quotient = (abs(numerator) + denominator // 2) // denominator
+    return quotient if numerator >= 0 else -quotient
 
 
 @dataclass
 class ValidationError:
+    """
+    Validering som kod (validators.ValidationCode) och nyttolast med belopp
+    i öre. Meddelandet renderas först i to_dict/render, på svenska eller
+    engelska, från validators.MESSAGES.
+    """
     field: str
-    message: str
+    check: ValidationCode
+    args: tuple = ()
     severity: str = "error"  # error, warning, info
+    
+    @property
+    def message(self) -> str:
+        return render_message(self.check, self.args)
+    
+    def render(self, lang: str = "sv") -> str:
+        return render_message(self.check, self.args, lang)
+    
+    def to_dict(self, lang: str = "sv", legacy: bool = False) -> dict:
+        # Snabbare än asdict, som kopierar fälten rekursivt. lang kontrolleras
+        # av anroparen (VATProcessor), inte per validering.
+        return {"field": self.field,
+                "message": render_message(self.check, self.args, lang, legacy),
+                "severity": self.severity}
+    
+    def to_state(self) -> dict:
+        return {"field": self.field, "check": int(self.check), "args": list(self.args),
+                "severity": self.severity}
+    
+    @classmethod
+    def from_state(cls, state: dict) -> "ValidationError":
+        return cls(state["field"], ValidationCode(state["check"]), tuple(state["args"]),
+                   state["severity"])
 
 
 @dataclass
-class Transaction:
-    id: str
-    date: datetime
-    description: str
-    gross_amount: Decimal
-    net_amount: Decimal
-    vat_amount: Decimal
-    vat_rate: VATRate
-    account_debit: str
-    account_credit: str
-    counterpart: Optional[str] = None
-    is_roaming: bool = False
-    kwh: Optional[Decimal] = None
+class ValidationTable:
+    """
+    Radvalideringar från den kolumnvisa motorn som kompakt tabell:
+    (rad-id, kontrollkod, förväntat, faktiskt) med belopp i öre, plus
+    nettobelopp och momssats som behövs för meddelandet. Meddelanden
+    renderas först när en rad visas.
+    """
+    row_id: np.ndarray    # transaktions-id (object)
+    check: np.ndarray     # ValidationCode.TRANSACTION_* (uint8)
+    expected: np.ndarray  # öre (int64)
+    actual: np.ndarray    # öre (int64)
+    net: np.ndarray       # öre (int64)
+    percent: np.ndarray   # momssats i procent (uint8)
+    
+    @classmethod
+    def empty(cls) -> "ValidationTable":
+        return cls(
+            row_id=np.empty(0, dtype=object),
+            check=np.empty(0, dtype=np.uint8),
+            expected=np.empty(0, dtype=np.int64),
+            actual=np.empty(0, dtype=np.int64),
+            net=np.empty(0, dtype=np.int64),
+            percent=np.empty(0, dtype=np.uint8)
+        )
+    
+    @classmethod
+    def concat(cls, tables: list) -> "ValidationTable":
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+        return cls(**{
+            column.name: np.concatenate([getattr(t, column.name) for t in tables])
+            for column in fields(cls)
+        })
+    
+    def __len__(self) -> int:
+        return len(self.check)
+    
+    def to_state(self) -> dict:
+        """Tabellen som JSON-serialiserbara kolumner"""
+        state = {column.name: getattr(self, column.name).tolist() for column in fields(self)}
+        # Id:n behövs bara för att renderas, så de sparas som text
+        state["row_id"] = [str(row_id) for row_id in self.row_id]
+        return state
+    
+    @classmethod
+    def from_state(cls, state: dict) -> "ValidationTable":
+        empty = cls.empty()
+        return cls(**{
+            column.name: np.array(state[column.name], dtype=getattr(empty, column.name).dtype)
+            for column in fields(cls)
+        })
+    
+    def take(self, indices: np.ndarray) -> "ValidationTable":
+        """Delmängd av tabellens rader"""
+        return ValidationTable(**{
+            column.name: getattr(self, column.name)[indices] for column in fields(self)
+        })
+    
+    def render(self, limit: Optional[int] = None, lang: str = "sv",
+               legacy: bool = False) -> list:
+        """
+        Renderar de första `limit` raderna som valideringsdictar på språket
+        lang (med legacy: texterna i rapportversion 1)
+        """
+        if lang not in LANGUAGES:
+            raise ValueError(f"Okänt språk: {lang} (tillåtna: {', '.join(LANGUAGES)})")
+        count = len(self) if limit is None else min(limit, len(self))
+        rendered = []
+        vat_code = int(ValidationCode.TRANSACTION_VAT)
+        rate_code = int(ValidationCode.TRANSACTION_VAT_RATE)
+        charge_code = int(ValidationCode.TRANSACTION_REVERSE_CHARGE)
+        # Mallarna slås upp en gång per anrop, inte per rad
+        render = {int(code): renderer(code, lang, legacy) for code in (
+            ValidationCode.TRANSACTION_VAT, ValidationCode.TRANSACTION_GROSS,
+            ValidationCode.TRANSACTION_VAT_RATE, ValidationCode.TRANSACTION_REVERSE_CHARGE)}
+        # Kolumnerna som Python-listor: snabbare än att indexera numpy-skalärer
+        columns = zip(*(getattr(self, name)[:count].tolist()
+                        for name in ("row_id", "check", "expected", "actual", "net", "percent")))
+        for row_id, check, expected, actual, net, percent in columns:
+            if check == vat_code:
+                message = render[check](net, actual, percent, expected)
+            elif check == rate_code:
+                message = render[check](actual, expected)
+            elif check == charge_code:
+                message = render[check](actual)
+            else:
+                message = render[check](net, expected - net, actual)
+            rendered.append({
+                "field": f"transaction_{row_id}",
+                "message": message,
+                "severity": "warning"
+            })
+        return rendered
 
 
 @dataclass
@@ -51,45 +460,252 @@ class VATReport:
     company_name: str
     org_number: str
     
+    # Alla belopp nedan är heltal öre
+    
     # Utgående moms (försäljning)
-    sales_25: Decimal = Decimal("0")
-    sales_12: Decimal = Decimal("0")
-    sales_6: Decimal = Decimal("0")
-    sales_0: Decimal = Decimal("0")
+    sales_25: int = 0
+    sales_12: int = 0
+    sales_6: int = 0
+    sales_0: int = 0
     
-    outgoing_vat_25: Decimal = Decimal("0")
-    outgoing_vat_12: Decimal = Decimal("0")
-    outgoing_vat_6: Decimal = Decimal("0")
+    outgoing_vat_25: int = 0
+    outgoing_vat_12: int = 0
+    outgoing_vat_6: int = 0
     
     # Ingående moms (kostnader)
-    purchases_25: Decimal = Decimal("0")
-    purchases_12: Decimal = Decimal("0")
-    purchases_0: Decimal = Decimal("0")
+    purchases_25: int = 0
+    purchases_12: int = 0
+    purchases_6: int = 0
+    purchases_0: int = 0
+    
+    incoming_vat: int = 0
+    # Moms på inköp som inte dras av (6% och 0%), bokförs på kostnaden
+    non_deductible_vat: int = 0
     
-    incoming_vat: Decimal = Decimal("0")
+    # Försäljning utan svensk moms oavsett angiven sats (classification.py),
+    # utanför satshinkarna ovan. Hela beloppet (netto + angiven moms) är intäkt.
+    eu_sales: int = 0                 # omvänd skattskyldighet, försäljning inom EU (3308)
+    export_sales: int = 0             # försäljning utanför EU (3305)
     
-    # Beräknade fält
-    total_outgoing_vat: Decimal = Decimal("0")
-    net_vat: Decimal = Decimal("0")
+    # Delsummor per transaktionsklass (classification.py), ingår i summorna ovan
+    roaming_sales: int = 0            # inkommande roaming med moms (3012 i st.f. satsens konto)
+    roaming_sales_12: int = 0         # varav 12% (3012 i st.f. 3002)
+    roaming_sales_6: int = 0          # varav 6% (3012 i st.f. 3003)
+    roaming_sales_0: int = 0          # inkommande roaming utan moms (3012 i st.f. 3011)
+    roaming_vat: int = 0              # utgående moms på inkommande roaming
+    eu_purchases: int = 0             # omvänd skattskyldighet, inköp inom EU
+    import_purchases: int = 0         # omvänd skattskyldighet, inköp utanför EU
+    reverse_charge_vat: int = 0       # beräknad moms på inköpen ovan (2614/2641)
     
-    # Validering
+    # Beräknade fält (finalize)
+    total_sales: int = 0
+    total_purchases: int = 0
+    total_outgoing_vat: int = 0
+    net_vat: int = 0
+    
+    # Validering (ValidationError-objekt)
     validations: list = field(default_factory=list)
+    # Dubblettvarningar hålls för sig och visas före radvarningarna, så att
+    # ordningen blir densamma i båda motorerna oavsett bitindelning
+    duplicate_warnings: list = field(default_factory=list)
     is_valid: bool = True
     
+    # Radvalideringar från den kolumnvisa motorn (renderas i _to_dict)
+    row_validations: ValidationTable = field(default_factory=ValidationTable.empty)
+    
+    # Ogiltiga motpartsnummer: (slag, nummer, motpart, kontroll, nyttolast) ->
+    # antal transaktioner; blir en varning per motpart i finalize
+    counterpart_issues: dict = field(default_factory=dict)
+    
     # Verifikationer
     journal_entries: list = field(default_factory=list)
+    
+    def merge(self, other: "VATReport") -> "VATReport":
+        """
+        Slår ihop två delrapporter för samma bolag och period (t.ex. dagliga
+        deltan eller parallella bitar). Sammanslagningen är associativ; totaler,
+        momsbalans och bokföringsförslag räknas om av VATProcessor.finalize.
+        """
+        for name in ("period", "company_name", "org_number"):
+            if getattr(self, name) != getattr(other, name):
+                raise ValueError(
+                    f"Kan inte slå ihop rapporter med olika {name}: "
+                    f"{getattr(self, name)!r} ≠ {getattr(other, name)!r}"
+                )
+        
+        merged = VATReport(self.period, self.company_name, self.org_number)
+        for name in ACCUMULATED_FIELDS:
+            setattr(merged, name, getattr(self, name) + getattr(other, name))
+        merged.validations = self.validations + other.validations
+        merged.duplicate_warnings = self.duplicate_warnings + other.duplicate_warnings
+        merged.row_validations = ValidationTable.concat([self.row_validations, other.row_validations])
+        merged.counterpart_issues = dict(self.counterpart_issues)
+        for issue, count in other.counterpart_issues.items():
+            merged.counterpart_issues[issue] = merged.counterpart_issues.get(issue, 0) + count
+        return merged
+    
+    def to_state(self) -> dict:
+        """Ackumulerat tillstånd som JSON-serialiserbar dict (för inkrementella körningar)"""
+        return {
+            "version": STATE_VERSION,
+            "period": self.period,
+            "company_name": self.company_name,
+            "org_number": self.org_number,
+            "amounts": {name: getattr(self, name) for name in ACCUMULATED_FIELDS},
+            "validations": [v.to_state() for v in self.validations],
+            "duplicate_warnings": [v.to_state() for v in self.duplicate_warnings],
+            "row_validations": self.row_validations.to_state(),
+            "counterpart_issues": [[*issue[:4], list(issue[4]), count]
+                                   for issue, count in self.counterpart_issues.items()]
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict) -> "VATReport":
+        """Återskapar en delrapport från to_state() (även version 1-3)"""
+        version = state.get("version")
+        if version == 1:
+            state = _state_from_v1(state)
+            version = 2
+        if version == 2:
+            state = _state_from_v2(state)
+            version = 3
+        if version == 3:
+            state = _state_from_v3(state)
+        elif version != STATE_VERSION:
+            raise ValueError(
+                f"Tillståndsversion {version!r} stöds inte (läser 1-{STATE_VERSION}); "
+                f"summera perioden på nytt utan tillståndsfilen"
+            )
+        
+        report = cls(state["period"], state["company_name"], state["org_number"])
+        for name in ACCUMULATED_FIELDS:
+            # Klassdelsummor saknas i tillstånd från före klassningen
+            setattr(report, name, int(state["amounts"].get(name, 0)))
+        report.validations = [ValidationError.from_state(v) for v in state["validations"]]
+        report.duplicate_warnings = [ValidationError.from_state(v)
+                                     for v in state["duplicate_warnings"]]
+        report.row_validations = ValidationTable.from_state(state["row_validations"])
+        report.counterpart_issues = {
+            (*issue[:3], ValidationCode(issue[3]), tuple(issue[4])): int(issue[5])
+            for issue in state["counterpart_issues"]
+        }
+        return report
+
+
+# Fält som summeras när rapporter slås ihop. Övriga beräknas i finalize.
+ACCUMULATED_FIELDS = (
+    "sales_25", "sales_12", "sales_6", "sales_0",
+    "outgoing_vat_25", "outgoing_vat_12", "outgoing_vat_6",
+    "purchases_25", "purchases_12", "purchases_6", "purchases_0",
+    "incoming_vat", "non_deductible_vat",
+    "roaming_sales", "roaming_sales_12", "roaming_sales_6", "roaming_sales_0", "roaming_vat",
+    "eu_sales", "export_sales",
+    "eu_purchases", "import_purchases", "reverse_charge_vat"
+)
+
+STATE_VERSION = 4
+
+
+def _state_from_v1(state: dict) -> dict:
+    """
+    Tillstånd version 1 i form av version 2. Version 1 hade dubblettvarningar
+    bland valideringarna, valideringar och motpartsproblem som färdig text
+    och saknade delsummor som då inte fanns (de blir 0).
+    """
+    validations = [
+        {"field": v["field"], "check": ValidationCode.TEXT, "args": [v["message"]],
+         "severity": v["severity"]}
+        if "message" in v else v
+        for v in state["validations"]
+    ]
+    return dict(
+        state,
+        version=2,
+        validations=[v for v in validations if v["field"] != "duplicates"],
+        duplicate_warnings=[v for v in validations if v["field"] == "duplicates"],
+        counterpart_issues=[[kind, identifier, counterpart, ValidationCode.TEXT, [message], count]
+                            for kind, identifier, counterpart, message, count
+                            in state.get("counterpart_issues", [])],
+    )
+
+
+# Version 2 hade egna kontrollkoder för valideringarna ...
+_V2_CODES = {0: ValidationCode.TEXT, 1: ValidationCode.TRANSACTION_VAT,
+             2: ValidationCode.TRANSACTION_GROSS, 3: ValidationCode.TRANSACTION_VAT_RATE,
+             4: ValidationCode.TRANSACTION_REVERSE_CHARGE}
+_V2_DUPLICATES = 8
+_V2_DUPLICATE_KINDS = {"replayed": ValidationCode.DUPLICATES_REPLAYED,
+                       "within": ValidationCode.DUPLICATES_WITHIN,
+                       "across": ValidationCode.DUPLICATES_ACROSS}
+# ... och textkoder för motpartsregistrets egna fel
+_V2_COUNTERPART_CODES = {"no_country_prefix": ValidationCode.VAT_NUMBER_NO_COUNTRY,
+                         "eu_country_prefix": ValidationCode.VAT_NUMBER_EU_COUNTRY,
+                         "eu_format": ValidationCode.VAT_NUMBER_EU_FORMAT}
+
+
+def _state_from_v2(state: dict) -> dict:
+    """
+    Tillstånd version 2 i form av version 3, där alla koder är
+    validators.ValidationCode. Dubblettvarningarna hade slaget i nyttolasten.
+    Motpartsnummer som validerarna underkänt kontrolleras om, eftersom
+    nyttolasten för deras fel har fått den faktiska siffran/längden.
+    """
+    def validation(v: dict) -> dict:
+        if v["check"] == _V2_DUPLICATES:
+            count, kind, *args = v["args"]
+            return dict(v, check=_V2_DUPLICATE_KINDS[kind], args=[count, *args])
+        return dict(v, check=_V2_CODES[v["check"]])
+    
+    issues = []
+    for kind, identifier, counterpart, check, args, count in state["counterpart_issues"]:
+        if check in _V2_COUNTERPART_CODES:
+            check = _V2_COUNTERPART_CODES[check]
+        elif check != ValidationCode.TEXT:
+            clean = re.sub(r"[\s.\-]", "", identifier).upper()
+            validate = (SwedishValidators.org_number_issue if kind == "org_number"
+                        else SwedishValidators.vat_number_issue)
+            check, args = validate(clean)
+        issues.append([kind, identifier, counterpart, check, list(args), count])
+    
+    rows = state["row_validations"]
+    return dict(
+        state,
+        version=3,
+        validations=[validation(v) for v in state["validations"]],
+        duplicate_warnings=[validation(v) for v in state["duplicate_warnings"]],
+        row_validations=dict(rows, check=[_V2_CODES[check] for check in rows["check"]]),
+        counterpart_issues=issues,
+    )
+
+
+def _state_from_v3(state: dict) -> dict:
+    """
+    Tillstånd version 3 i form av version 4. Version 3 summerade EU- och
+    exportförsäljning även i hinken för sin angivna momssats. Utan moms, som
+    de ska faktureras, låg de i sales_0 och flyttas ut därifrån; med moms
+    går fördelningen per sats inte att återskapa.
+    """
+    amounts = dict(state["amounts"])
+    foreign = amounts.get("eu_sales", 0) + amounts.get("export_sales", 0)
+    if foreign > amounts.get("sales_0", 0):
+        raise ValueError(
+            "Tillståndet (version 3) har EU- eller exportförsäljning med moms, som nu "
+            "bokförs för sig; summera perioden på nytt utan tillståndsfilen"
+        )
+    amounts["sales_0"] = amounts.get("sales_0", 0) - foreign
+    return dict(state, version=STATE_VERSION, amounts=amounts)
 
 
 class SwedishValidators:
     """Validerare för svenska format och regler"""
     
     @staticmethod
-    def validate_org_number(org_nr: str) -> tuple[bool, str]:
-        """Validerar svenskt organisationsnummer (NNNNNN-NNNN)"""
+    def org_number_issue(org_nr: str) -> Optional[tuple]:
+        """Fel i ett organisationsnummer som (ValidationCode, nyttolast), None om giltigt"""
         clean = re.sub(r'[^0-9]', '', org_nr)
         
         if len(clean) != 10:
-            return False, "Organisationsnummer måste vara 10 siffror"
+            return ValidationCode.ORG_NUMBER_LENGTH, ()
         
         # Luhn-algoritm för kontrollsiffra
         digits = [int(d) for d in clean]
@@ -103,53 +719,88 @@ class SwedishValidators:
         
         expected_check = (10 - (checksum % 10)) % 10
         if digits[-1] != expected_check:
-            return False, f"Ogiltig kontrollsiffra (förväntat {expected_check})"
+            return ValidationCode.ORG_NUMBER_CHECKSUM, (expected_check, digits[-1])
         
+        return None
+    
+    @staticmethod
+    def validate_org_number(org_nr: str) -> tuple[bool, str]:
+        """Validerar svenskt organisationsnummer (NNNNNN-NNNN)"""
+        issue = SwedishValidators.org_number_issue(org_nr)
+        if issue is not None:
+            return False, render_message(*issue)
         return True, "OK"
     
     @staticmethod
-    def validate_vat_number(vat_nr: str) -> tuple[bool, str]:
-        """Validerar svenskt VAT-nummer (SE + 12 siffror)"""
+    def vat_number_issue(vat_nr: str) -> Optional[tuple]:
+        """Fel i ett svenskt VAT-nummer som (ValidationCode, nyttolast), None om giltigt"""
         if not vat_nr.upper().startswith("SE"):
-            return False, "Svenskt VAT-nummer måste börja med SE"
+            return ValidationCode.VAT_NUMBER_PREFIX, ()
         
         digits = re.sub(r'[^0-9]', '', vat_nr)
         if len(digits) != 12:
-            return False, "VAT-nummer måste ha 12 siffror efter SE"
+            return ValidationCode.VAT_NUMBER_LENGTH, (len(digits),)
         
         # Kontrollera att de första 10 siffrorna är ett giltigt org.nr
-        org_valid, org_msg = SwedishValidators.validate_org_number(digits[:10])
-        if not org_valid:
-            return False, f"Ogiltigt organisationsnummer i VAT: {org_msg}"
+        org_issue = SwedishValidators.org_number_issue(digits[:10])
+        if org_issue is not None:
+            org_check, org_args = org_issue
+            return ValidationCode.VAT_NUMBER_ORG, (org_check, *org_args)
         
         # De sista två siffrorna ska vara 01
         if digits[10:] != "01":
-            return False, "VAT-nummer ska sluta med 01"
+            return ValidationCode.VAT_NUMBER_SUFFIX, (digits[10:],)
         
+        return None
+    
+    @staticmethod
+    def validate_vat_number(vat_nr: str) -> tuple[bool, str]:
+        """Validerar svenskt VAT-nummer (SE + 12 siffror)"""
+        issue = SwedishValidators.vat_number_issue(vat_nr)
+        if issue is not None:
+            return False, render_message(*issue)
         return True, "OK"
     
     @staticmethod
-    def validate_vat_calculation(net: Decimal, vat: Decimal, rate: VATRate, 
-                                  tolerance: Decimal = Decimal("0.02")) -> tuple[bool, str]:
-        """Validerar att moms är korrekt beräknad"""
-        expected_vat = (net * rate.value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    def vat_calculation_issue(net: int, vat: int, rate: VATRate,
+                              tolerance: int = TOLERANCE_ORE) -> Optional[tuple]:
+        """Felberäknad moms som (ValidationCode, nyttolast), None om rätt (belopp i öre)"""
+        expected_vat = _round_half_up_ore(net * rate.percent, 100)
         diff = abs(vat - expected_vat)
         
         if diff > tolerance:
-            return False, f"Momsbelopp {vat} stämmer inte med {rate.value*100}% av {net} (förväntat {expected_vat})"
+            return ValidationCode.TRANSACTION_VAT, (net, vat, rate.percent, expected_vat)
         
-        return True, "OK"
+        return None
     
     @staticmethod
-    def validate_gross_amount(net: Decimal, vat: Decimal, gross: Decimal,
-                               tolerance: Decimal = Decimal("0.02")) -> tuple[bool, str]:
-        """Validerar att bruttobelopp = netto + moms"""
+    def gross_amount_issue(net: int, vat: int, gross: int,
+                           tolerance: int = TOLERANCE_ORE) -> Optional[tuple]:
+        """Bruttobelopp ≠ netto + moms som (ValidationCode, nyttolast), None om lika (belopp i öre)"""
         expected_gross = net + vat
         diff = abs(gross - expected_gross)
         
         if diff > tolerance:
-            return False, f"Bruttobelopp {gross} ≠ netto {net} + moms {vat} (diff: {diff})"
+            return ValidationCode.TRANSACTION_GROSS, (net, vat, gross)
         
+        return None
+    
+    @staticmethod
+    def validate_vat_calculation(net: int, vat: int, rate: VATRate,
+                                  tolerance: int = TOLERANCE_ORE) -> tuple[bool, str]:
+        """Validerar att moms är korrekt beräknad (belopp i öre)"""
+        issue = SwedishValidators.vat_calculation_issue(net, vat, rate, tolerance)
+        if issue is not None:
+            return False, render_message(*issue)
+        return True, "OK"
+    
+    @staticmethod
+    def validate_gross_amount(net: int, vat: int, gross: int,
+                               tolerance: int = TOLERANCE_ORE) -> tuple[bool, str]:
+        """Validerar att bruttobelopp = netto + moms (belopp i öre)"""
+        issue = SwedishValidators.gross_amount_issue(net, vat, gross, tolerance)
+        if issue is not None:
+            return False, render_message(*issue)
         return True, "OK"
 
 
@@ -160,6 +811,10 @@ class BASAccounts:
     SALES_SERVICES_25 = "3010"  # Försäljning tjänster 25%
     SALES_SERVICES_0 = "3011"   # Försäljning tjänster momsfri
     SALES_ROAMING = "3012"      # Roaming-intäkter
+    SALES_SERVICES_12 = "3002"  # Försäljning tjänster 12%
+    SALES_SERVICES_6 = "3003"   # Försäljning tjänster 6%
+    SALES_SERVICES_EXPORT = "3305"  # Försäljning tjänster till land utanför EU
+    SALES_SERVICES_EU = "3308"      # Försäljning tjänster till annat EU-land
     
     # Kostnader
     EXTERNAL_SERVICES = "6590"  # Övriga externa tjänster
@@ -171,19 +826,52 @@ class BASAccounts:
     OUTGOING_VAT_12 = "2621"    # Utgående moms 12%
     OUTGOING_VAT_6 = "2631"     # Utgående moms 6%
     INCOMING_VAT = "2641"       # Ingående moms
+    OUTGOING_VAT_REVERSE = "2614"  # Utgående moms omvänd skattskyldighet
     VAT_SETTLEMENT = "2650"     # Momsredovisning
     
     # Kund/Leverantör
     ACCOUNTS_RECEIVABLE = "1510"  # Kundfordringar
+    ROAMING_RECEIVABLES = "1580"  # Fordringar roaming
     ACCOUNTS_PAYABLE = "2440"     # Leverantörsskulder
     
+    # Övrigt
+    ROUNDING = "3740"             # Öres- och kronutjämning
+    
+    NAMES = {
+        "1510": "Kundfordringar",
+        "1580": "Fordringar roaming",
+        "2440": "Leverantörsskulder",
+        "2611": "Utgående moms 25%",
+        "2614": "Utgående moms omvänd skattskyldighet",
+        "2621": "Utgående moms 12%",
+        "2631": "Utgående moms 6%",
+        "2641": "Ingående moms",
+        "2650": "Momsredovisning",
+        "3002": "Försäljning tjänster 12%",
+        "3003": "Försäljning tjänster 6%",
+        "3010": "Försäljning tjänster 25%",
+        "3011": "Försäljning tjänster momsfri",
+        "3012": "Roaming-intäkter",
+        "3305": "Försäljning tjänster till land utanför EU",
+        "3308": "Försäljning tjänster till annat EU-land",
+        "3740": "Öres- och kronutjämning",
+        "6590": "Övriga externa tjänster",
+        "6591": "Plattformsavgifter",
+        "6592": "Abonnemangskostnader"
+    }
+    
     @classmethod
     def get_sales_account(cls, vat_rate: VATRate, is_roaming: bool = False) -> str:
         if is_roaming:
             return cls.SALES_ROAMING
-        if vat_rate == VATRate.ZERO:
-            return cls.SALES_SERVICES_0
-        return cls.SALES_SERVICES_25
+        
+        mapping = {
+            VATRate.STANDARD: cls.SALES_SERVICES_25,
+            VATRate.REDUCED_12: cls.SALES_SERVICES_12,
+            VATRate.REDUCED_6: cls.SALES_SERVICES_6,
+            VATRate.ZERO: cls.SALES_SERVICES_0
+        }
+        return mapping[vat_rate]
     
     @classmethod
     def get_vat_account(cls, vat_rate: VATRate, is_outgoing: bool = True) -> str:
@@ -199,72 +887,953 @@ class BASAccounts:
         return mapping.get(vat_rate)
 
 
+# Verifikationsindelning för create_journal
+JOURNAL_GROUPS = ("transaction", "day", "counterpart")
+# Textkolumner som TransactionBatch lagrar som kategorier
+BATCH_TEXT_COLUMNS = (CATEGORY_COLUMN, COUNTERPART_COLUMN, COUNTRY_COLUMN, ROAMING_COLUMN,
+                      VAT_NUMBER_COLUMN, ORG_NUMBER_COLUMN, "transactionName")
+
+
+@dataclass
+class TransactionBatch:
+    """
+    Transaktioner som typade kolumner (struct-of-arrays) i stället för ett
+    objekt per rad: belopp i öre (int64), datum som int64 (ns sedan 1970 i
+    svensk tid, NaT som i datetime64), angiven momssats i procent (uint8)
+    och flaggor som bitar (FLAG_*, uint8). Textkolumner lagras som
+    kategorier. Utsnitt (batch[start:stop], chunks) delar minne med batchen.
+    
+    Saknade belopp är tillåtna (som 0) bara på rader utan belopp (amount
+    saknas eller är 0), precis som i motorerna. Kolumner som saknas i
+    indata är None.
+    """
+    FLAG_DATE = 1     # giltigt datum
+    FLAG_RATE = 2     # vatRate angiven
+    FLAG_KWH = 4      # kWh angiven
+    FLAG_ROAMING = 8  # roamingOperator ifylld
+    
+    # Rader per DataFrame när processorn tar emot en batch
+    FRAME_ROWS = 1_000_000
+    
+    gross: np.ndarray                 # amount, öre (int64)
+    net: np.ndarray                   # subAmount, öre (int64)
+    vat: np.ndarray                   # öre (int64)
+    flags: np.ndarray                 # FLAG_* (uint8)
+    id: Optional[np.ndarray] = None        # transaktions-id, samma typ som i indata
+    date: Optional[np.ndarray] = None      # ns sedan 1970-01-01 (int64)
+    vat_rate: Optional[np.ndarray] = None  # procent (uint8), gäller där FLAG_RATE är satt
+    kwh: Optional[np.ndarray] = None       # float64, gäller där FLAG_KWH är satt
+    text: dict = field(default_factory=dict)  # kolumn -> pd.Categorical
+    date_column: str = DATE_COLUMN
+    source: str = ""
+    
+    def __len__(self) -> int:
+        return len(self.flags)
+    
+    def __getitem__(self, key) -> "TransactionBatch":
+        """Utsnitt (slice, mask eller index); en slice delar minne med batchen"""
+        def take(values):
+            return None if values is None else values[key]
+        return TransactionBatch(
+            gross=self.gross[key], net=self.net[key], vat=self.vat[key], flags=self.flags[key],
+            id=take(self.id), date=take(self.date), vat_rate=take(self.vat_rate),
+            kwh=take(self.kwh), text={name: values[key] for name, values in self.text.items()},
+            date_column=self.date_column, source=self.source
+        )
+    
+    @property
+    def nbytes(self) -> int:
+        """Minne för kolumnerna (utan id-objekten och kategoriernas text)"""
+        arrays = (self.gross, self.net, self.vat, self.flags, self.id, self.date,
+                  self.vat_rate, self.kwh, *(values.codes for values in self.text.values()))
+        return sum(values.nbytes for values in arrays if values is not None)
+    
+    def has(self, flag: int) -> np.ndarray:
+        """Mask över raderna där flaggan är satt"""
+        return (self.flags & flag) != 0
+    
+    def chunks(self, rows: int) -> Iterable["TransactionBatch"]:
+        """Batchen i utsnitt om högst rows rader, utan kopiering"""
+        for start in range(0, len(self), rows):
+            yield self[start:start + rows]
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_column: str = DATE_COLUMN) -> "TransactionBatch":
+        """
+        Bygger en batch från en DataFrame med kolumnkontraktet (amount,
+        subAmount, vat, vatRate, id, date, kategorier, kwh).
+        """
+        for name in ("amount", "subAmount", "vat"):
+            if name not in df.columns:
+                raise ValueError(f"Kolumnen '{name}' saknas")
+        rows = len(df)
+        amount = df['amount']
+        active = ((amount > 0) | (amount < 0)).to_numpy(dtype=bool)
+        flags = np.zeros(rows, dtype=np.uint8)
+        
+        def ore(name):
+            values = df[name].to_numpy()
+            missing = pd.isna(values)
+            if (missing & active).any():
+                raise ValueError(f"Belopp saknas i '{name}' på minst en transaktion med belopp")
+            result = np.zeros(rows, dtype=np.int64)
+            result[~missing] = ore_array(values[~missing])
+            return result
+        
+        batch = cls(gross=ore('amount'), net=ore('subAmount'), vat=ore('vat'), flags=flags,
+                    date_column=date_column, source=df.attrs.get("source", ""))
+        
+        if 'id' in df.columns:
+            # Talkolumner som numpy, text (readers: StringDtype) som pandas-array
+            ids = df['id']
+            batch.id = ids.to_numpy() if isinstance(ids.dtype, np.dtype) else ids.array
+        
+        if date_column in df.columns:
+            dates = _local_dates(df[date_column]).to_numpy(dtype="datetime64[ns]")
+            batch.date = dates.view(np.int64)
+            flags[~np.isnat(dates)] |= cls.FLAG_DATE
+        
+        if 'vatRate' in df.columns:
+            rates = pd.to_numeric(df['vatRate'], errors="coerce").to_numpy(dtype=np.float64)
+            stated = df['vatRate'].notna().to_numpy(dtype=bool)
+            if np.isnan(rates[stated]).any():
+                raise ValueError("Momssats saknas eller är ogiltig på minst en rad")
+            rates = np.trunc(np.where(stated, rates, 0))
+            if ((rates < 0) | (rates > 100)).any():
+                raise ValueError("Momssats utanför 0–100% på minst en rad")
+            batch.vat_rate = rates.astype(np.uint8)
+            flags[stated] |= cls.FLAG_RATE
+        
+        if 'kwh' in df.columns:
+            batch.kwh = pd.to_numeric(df['kwh'], errors="coerce").to_numpy(dtype=np.float64)
+            flags[np.isfinite(batch.kwh)] |= cls.FLAG_KWH
+        
+        for name in BATCH_TEXT_COLUMNS:
+            if name in df.columns:
+                values = df[name].array
+                if not isinstance(values, pd.Categorical):
+                    values = pd.Categorical(df[name].to_numpy(dtype=object))
+                batch.text[name] = values
+        
+        if ROAMING_COLUMN in batch.text:
+            operators = batch.text[ROAMING_COLUMN]
+            filled = np.append(operators.categories.astype(str).str.strip() != "", False)
+            flags[filled[operators.codes]] |= cls.FLAG_ROAMING
+        return batch
+    
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame med kolumnkontraktet: belopp i kronor (float64, exakt
+        tillbaka till öre), vatRate som float64 (NaN = ej angiven).
+        """
+        columns = {}
+        if self.id is not None:
+            columns['id'] = self.id
+        columns['amount'] = self.gross / ORE_PER_SEK
+        columns['subAmount'] = self.net / ORE_PER_SEK
+        columns['vat'] = self.vat / ORE_PER_SEK
+        if self.vat_rate is not None:
+            columns['vatRate'] = np.where(self.has(self.FLAG_RATE), self.vat_rate, np.nan)
+        if self.date is not None:
+            columns[self.date_column] = self.date.view("datetime64[ns]")
+        if self.kwh is not None:
+            columns['kwh'] = self.kwh
+        columns.update(self.text)
+        df = pd.DataFrame(columns, copy=False)
+        if self.source:
+            df.attrs["source"] = self.source
+        return df
+
+
+def _frames(data, rows: Optional[int] = None) -> Iterable[pd.DataFrame]:
+    """En DataFrame som den är, eller en TransactionBatch som DataFrames i bitar"""
+    if isinstance(data, TransactionBatch):
+        return (chunk.to_frame() for chunk in data.chunks(rows or data.FRAME_ROWS))
+    return (data,)
+
+
+@dataclass
+class Journal:
+    """
+    Kolumnvis grundbok att exportera med SIEExporter.add_journal.
+    Raderna är sorterade på verifikation och varje verifikation balanserar.
+    """
+    verification: np.ndarray   # Verifikationsindex per rad (int64, 0..n-1)
+    account: np.ndarray        # BAS-konto per rad (object)
+    amount: np.ndarray         # Öre per rad, debet positivt och kredit negativt (int64)
+    dates: np.ndarray          # Datum per verifikation (datetime64[D], NaT = okänt)
+    descriptions: np.ndarray   # Text per verifikation (object)
+    account_names: dict = field(default_factory=dict)
+    
+    def __len__(self) -> int:
+        return len(self.amount)
+    
+    @property
+    def verification_count(self) -> int:
+        return len(self.descriptions)
+    
+    def unbalanced(self) -> np.ndarray:
+        """Index för verifikationer vars rader inte summerar till noll"""
+        sums = _bucket_sums(self.verification, self.amount, self.verification_count)
+        return np.flatnonzero(np.array(sums, dtype=object) != 0)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """En rad per kontering med debet/kredit i kronor"""
+        return pd.DataFrame({
+            "verification": self.verification + 1,
+            "date": self.dates[self.verification],
+            "description": self.descriptions[self.verification],
+            "account": self.account,
+            "debit": np.where(self.amount > 0, self.amount, 0) / ORE_PER_SEK,
+            "credit": np.where(self.amount < 0, -self.amount, 0) / ORE_PER_SEK
+        })
+
+
+class StageTimer:
+    """
+    Mäter väggtid, CPU-tid och antal rader per bearbetningssteg. Upprepade
+    steg (t.ex. en gång per bit i --stream-läge) summeras. metrics anropas
+    efter varje steg med (steg, väggtid s, CPU-tid s, rader).
+    """
+    
+    def __init__(self, metrics: Optional[Callable[[str, float, float, int], None]] = None):
+        self.metrics = metrics
+        self.stages = {}
+    
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """Mäter blocket; sätt record["rows"] i blocket om antalet blir känt där"""
+        record = {"rows": rows}
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            total = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows": 0})
+            total["calls"] += 1
+            total["wall_s"] += wall
+            total["cpu_s"] += cpu
+            total["rows"] += int(record["rows"])
+            if self.metrics:
+                self.metrics(name, wall, cpu, int(record["rows"]))
+    
+    def to_dict(self) -> dict:
+        """diagnostics-blocket i resultatet"""
+        return {
+            "stages": {
+                name: {
+                    "calls": total["calls"],
+                    "wall_s": round(total["wall_s"], 6),
+                    "cpu_s": round(total["cpu_s"], 6),
+                    "rows": total["rows"]
+                }
+                for name, total in self.stages.items()
+            },
+            "total_wall_s": round(sum(t["wall_s"] for t in self.stages.values()), 6),
+            "total_cpu_s": round(sum(t["cpu_s"] for t in self.stages.values()), 6)
+        }
+
+
+@dataclass
+class BatchJob:
+    """Ett företag/en period i en batchkörning (process_many)"""
+    input: str
+    company_name: str = ""
+    org_number: str = ""
+    period: str = ""
+    file_format: Optional[str] = None
+    
+    @classmethod
+    def from_dict(cls, data: dict, base_dir: str = "") -> "BatchJob":
+        """Skapar jobb från en manifestrad (file, company, org_number, period, format)"""
+        path = data.get("file") or data.get("input")
+        if not path:
+            raise ValueError(f"Manifestrad saknar fil: {data}")
+        return cls(
+            input=os.path.join(base_dir, str(path)),
+            company_name=str(data.get("company") or ""),
+            org_number=str(data.get("org_number") or data.get("org") or ""),
+            period=str(data.get("period") or ""),
+            file_format=data.get("format") or None
+        )
+
+
+def read_manifest(path: str) -> list:
+    """
+    Läser ett batchmanifest: JSON-lista med objekt, eller CSV med kolumnerna
+    file, company, org_number, period (och valfritt format). Relativa
+    filsökvägar tolkas relativt manifestet.
+    """
+    import csv
+    
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+    return [BatchJob.from_dict(row, base_dir) for row in rows]
+
+
+def _process_job(job: BatchJob, engine: str, max_warnings: Optional[int],
+                 cache, rate_timeline: "VATRateTimeline", diagnostics: bool,
+                 duplicates: str, counterparts: Optional["CounterpartTable"],
+                 language: str = "sv", report_version: int = 1) -> dict:
+    """Kör ett batchjobb; fel fångas och rapporteras i resultatet"""
+    from readers import read_transactions
+    
+    result = {
+        "file": job.input,
+        "company": job.company_name,
+        "org_number": job.org_number,
+        "period": job.period
+    }
+    try:
+        processor = VATProcessor(rate_timeline, diagnostics, duplicates=duplicates,
+                                 counterparts=counterparts, language=language,
+                                 report_version=report_version)
+        with processor.stage("read") as stage:
+            df = read_transactions(job.input, cache, job.file_format, processor.input_columns())
+            stage["rows"] = len(df)
+        report = processor.process_transactions(
+            df, job.company_name, job.org_number, job.period, engine, max_warnings)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    else:
+        result.update(status="ok", report=report)
+    return result
+
+
 class VATProcessor:
     """Huvudprocessor för svensk momsredovisning"""
     
-    def __init__(self):
+    # Kolumner som processorn använder; övriga kolumner i indata behöver inte läsas
+    INPUT_COLUMNS = ("id", "amount", "subAmount", "vat", "vatRate",
+                     DATE_COLUMN, CATEGORY_COLUMN, COUNTERPART_COLUMN,
+                     COUNTRY_COLUMN, ROAMING_COLUMN, VAT_NUMBER_COLUMN, ORG_NUMBER_COLUMN)
+    
+    def __init__(self, rate_timeline: Optional[VATRateTimeline] = None,
+                 diagnostics: bool = False,
+                 metrics: Optional[Callable[[str, float, float, int], None]] = None,
+                 duplicates: str = "report",
+                 seen_store: Optional["SeenStore"] = None,
+                 counterparts: Optional["CounterpartTable"] = None,
+                 registry: Optional["CounterpartRegistry"] = None,
+                 language: str = "sv",
+                 on_rows: Optional[Callable[[pd.DataFrame], None]] = None,
+                 report_version: int = 1):
+        """
+        Args:
+            rate_timeline: Momssatser per kategori och datum (standard: VAT_RATE_TIMELINE)
+            diagnostics: Lägg till ett diagnostics-block med tid och rader per
+                steg i resultatet (summerat sedan start eller reset_diagnostics)
+            metrics: Anropas efter varje steg med (steg, väggtid s, CPU-tid s, rader)
+            duplicates: Hantering av upprepade transaktioner (samma id, eller
+                samma innehåll utan id): "report" varnar, "drop" tar bort
+                och varnar, "off" stänger av kontrollen
+            seen_store: dedup.SeenStore med transaktioner från tidigare
+                körningar. Rader som redan redovisats för en annan period
+                räknas som dubbletter, och varje lyckad process_*-körning
+                sparar sina transaktioner i storen. Används inte av process_many.
+            counterparts: classification.CounterpartTable med land och roaming
+                per motpart, för transaktionsklassningen (utan tabell används
+                bara kolumnerna counterpartCountry och roamingOperator)
+            registry: counterparts.CounterpartRegistry som validerar motparternas
+                VAT- och organisationsnummer (standard: registret som delas av
+                alla processorer i samma process; process_many med flera
+                workers har ett per arbetsprocess)
+            language: Språk för valideringsmeddelanden i resultatet ("sv"
+                eller "en"); valideringarna lagras som koder och renderas
+                först i resultatet
+            on_rows: Anropas med varje bit transaktioner som summeras in,
+                efter dubblettkontrollen (samma rader som rapporten), t.ex.
+                för att kontera dem med create_journal
+            report_version: Resultatets format (REPORT_VERSIONS). 1 ger samma
+                nycklar, bokföringsförslag och texter som före heltalsöre;
+                2 lägger till report_version, classification och
+                purchases.vat_6_percent och ger ett balanserat bokföringsförslag
+        """
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"Okänd dubblettpolicy: {duplicates} "
+                             f"(tillåtna: {', '.join(DUPLICATE_POLICIES)})")
+        if language not in LANGUAGES:
+            raise ValueError(f"Okänt språk: {language} (tillåtna: {', '.join(LANGUAGES)})")
+        if report_version not in REPORT_VERSIONS:
+            raise ValueError(f"Okänd rapportversion: {report_version} "
+                             f"(tillåtna: {', '.join(map(str, REPORT_VERSIONS))})")
         self.validators = SwedishValidators()
         self.accounts = BASAccounts()
+        # Används för rader med vatCategory; övriga rader använder vatRate
+        self.rate_timeline = rate_timeline or VAT_RATE_TIMELINE
+        self.diagnostics = diagnostics
+        self.timer = StageTimer(metrics) if diagnostics or metrics else None
+        self.duplicates = duplicates
+        self.seen_store = seen_store
+        self.counterparts = counterparts
+        self.registry = registry
+        self.language = language
+        self.on_rows = on_rows
+        self.report_version = report_version
     
-    def process_transactions(self, df: pd.DataFrame, 
+    def stage(self, name: str, rows: int = 0):
+        """
+        Mäter ett steg om instrumentering är påslagen (annars utan kostnad).
+        Används som `with processor.stage("read") as stage: ...; stage["rows"] = n`.
+        """
+        if self.timer is None:
+            return nullcontext({"rows": rows})
+        return self.timer.stage(name, rows)
+    
+    def reset_diagnostics(self):
+        """Nollställer uppmätta steg inför nästa körning"""
+        if self.timer is not None:
+            self.timer.stages = {}
+    
+    def input_columns(self, date_column: str = DATE_COLUMN) -> tuple:
+        """
+        Kolumner att läsa från indatafilen (date_column för periodindelning).
+        Med dubblettkontroll läses även kolumnerna som rader utan id jämförs på.
+        """
+        columns = self.INPUT_COLUMNS + (date_column,)
+        if self.duplicates != "off":
+            from dedup import CONTENT_COLUMNS
+            columns += CONTENT_COLUMNS
+        return tuple(dict.fromkeys(columns))
+    
+    def process_transactions(self, df: pd.DataFrame,
                              company_name: str = "",
                              org_number: str = "",
-                             period: str = "") -> dict:
+                             period: str = "",
+                             engine: str = "scalar",
+                             max_warnings: Optional[int] = None) -> dict:
         """
         Processerar transaktioner och returnerar validerad momsrapport.
         
         Args:
-            df: DataFrame med kolumner: amount, subAmount, vat, vatRate, transactionName, etc.
+            df: DataFrame med kolumner: amount, subAmount, vat, vatRate, transactionName, etc.,
+                eller TransactionBatch
             company_name: Företagsnamn
             org_number: Organisationsnummer
             period: Redovisningsperiod (YYYY-MM)
+            engine: "scalar" (rad för rad) eller "vectorized" (kolumnvis).
+                Båda motorerna ger identisk output.
+            max_warnings: Visa högst så många varningar (None = alla)
         
         Returns:
             dict med momsrapport, valideringar och bokföringsförslag
         """
+        report = self.begin_report(company_name, org_number, period)
+        seen = self.duplicate_index()
+        self.accumulate(report, df, engine, seen)
+        result = self.finalize(report, max_warnings)
+        self.commit_seen(seen)
+        return result
+    
+    def process_chunks(self, chunks: Iterable[pd.DataFrame],
+                       company_name: str = "",
+                       org_number: str = "",
+                       period: str = "",
+                       engine: str = "vectorized",
+                       max_warnings: Optional[int] = None) -> dict:
+        """
+        Processerar transaktioner som kommer i bitar (t.ex. från readers.iter_chunks)
+        utan att hela filen behöver finnas i minnet. Varje bit summeras in i
+        samma rapport, så minnesåtgången styrs av bitstorleken. Bitarna kan
+        komma från flera filer; dubbletter söks över alla bitar. En bit kan
+        vara en DataFrame eller en TransactionBatch.
+        
+        Returns:
+            Samma dict som process_transactions för hela datamängden
+        """
+        report = self.begin_report(company_name, org_number, period)
+        seen = self.duplicate_index()
+        for chunk in self._timed_chunks(chunks):
+            self.accumulate(report, chunk, engine, seen)
+        result = self.finalize(report, max_warnings)
+        self.commit_seen(seen)
+        return result
+    
+    def process_periods(self, data,
+                        company_name: str = "",
+                        org_number: str = "",
+                        period_by: str = "month",
+                        date_column: str = "date",
+                        engine: str = "vectorized",
+                        max_warnings: Optional[int] = None) -> dict:
+        """
+        Delar upp transaktionerna per månad eller kvartal utifrån datumkolumnen
+        och skapar en momsrapport per period i ett grupperat pass.
         
-        report = VATReport(
+        Args:
+            data: DataFrame eller TransactionBatch, eller en följd av dem
+                (t.ex. readers.iter_chunks)
+            period_by: "month" (YYYY-MM) eller "quarter" (YYYY-Qn)
+            date_column: Kolumn med transaktionsdatum
+        
+        Returns:
+            dict period -> samma dict som process_transactions, sorterad på period
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Okänd motor: {engine} (tillåtna: {', '.join(ENGINES)})")
+        
+        chunks = (_frames(data) if isinstance(data, (pd.DataFrame, TransactionBatch))
+                  else self._timed_chunks(data))
+        reports = {}
+        seen = self.duplicate_index()
+        for chunk in chunks:
+            with self.stage("periods", len(chunk)):
+                codes, labels = _period_codes(chunk, date_column, period_by)
+            chunk_reports = []
+            for label in labels:
+                if label not in reports:
+                    reports[label] = self.begin_report(company_name, org_number, label)
+                chunk_reports.append(reports[label])
+            
+            keep = self._check_duplicates(chunk, seen, chunk_reports, codes)
+            if keep is not None:
+                chunk = chunk[keep]
+                codes = codes[keep]
+            if self.on_rows is not None:
+                self.on_rows(chunk)
+            self._check_counterparts(chunk, chunk_reports, codes)
+            
+            if engine == "vectorized":
+                self._accumulate_columns(chunk, chunk_reports, codes)
+            else:
+                for index, report in enumerate(chunk_reports):
+                    self._accumulate_rows(chunk[codes == index], report, report.validations)
+        
+        results = {
+            label: self.finalize(reports[label], max_warnings)
+            for label in sorted(reports)
+        }
+        self.commit_seen(seen)
+        if self.diagnostics:
+            # Samma block för hela körningen i varje period
+            diagnostics = self.timer.to_dict()
+            for result in results.values():
+                result["diagnostics"] = diagnostics
+        return results
+    
+    def _timed_chunks(self, chunks: Iterable) -> Iterable:
+        """Mäter inläsningen av varje bit som steget "read" """
+        iterator = iter(chunks)
+        while True:
+            with self.stage("read") as stage:
+                chunk = next(iterator, None)
+                stage["rows"] = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                return
+            yield from _frames(chunk)
+    
+    def process_many(self, jobs: Iterable,
+                     workers: Optional[int] = None,
+                     engine: str = "vectorized",
+                     max_warnings: Optional[int] = None,
+                     cache=None) -> list:
+        """
+        Processerar många företag/perioder parallellt i en processpool.
+        
+        Args:
+            jobs: BatchJob eller manifestdictar (file, company, org_number, period)
+            workers: Antal processer (None = antal kärnor, 1 = i denna process)
+            cache: Valfri readers.ParsedInputCache som delas av alla processer
+        
+        Returns:
+            Ett resultat per jobb i samma ordning som jobs, med status "ok" och
+            report (samma dict som process_transactions), eller status "error"
+            och error. Ett fel i ett jobb avbryter inte de övriga.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Okänd motor: {engine} (tillåtna: {', '.join(ENGINES)})")
+        jobs = [job if isinstance(job, BatchJob) else BatchJob.from_dict(job) for job in jobs]
+        options = (engine, max_warnings, cache, self.rate_timeline, self.diagnostics,
+                   self.duplicates, self.counterparts, self.language, self.report_version)
+        
+        if workers == 1 or len(jobs) <= 1:
+            return [_process_job(job, *options) for job in jobs]
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_process_job, job, *options) for job in jobs]
+            results = []
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # T.ex. en process som dött (minnesbrist); övriga jobb fortsätter
+                    results.append({
+                        "file": job.input,
+                        "company": job.company_name,
+                        "org_number": job.org_number,
+                        "period": job.period,
+                        "status": "error",
+                        "error": f"{type(e).__name__}: {e}"
+                    })
+        return results
+    
+    def begin_report(self, company_name: str = "", org_number: str = "",
+                     period: str = "") -> VATReport:
+        """Skapar en tom rapport att summera transaktioner i"""
+        return VATReport(
             period=period or datetime.now().strftime("%Y-%m"),
             company_name=company_name,
             org_number=org_number
         )
+    
+    def accumulate(self, report: VATReport, df: pd.DataFrame, engine: str = "scalar",
+                   seen: Optional["DuplicateIndex"] = None):
+        """
+        Summerar transaktionerna i df (DataFrame eller TransactionBatch,
+        som summeras i bitar om TransactionBatch.FRAME_ROWS rader) in i rapporten.
         
-        validations = []
+        Args:
+            seen: Dubblettindex som delas mellan flera anrop (t.ex. bitar och
+                filer i samma körning); None = dubbletter söks bara inom df.
+                Anroparen sparar ett delat index i seen_store med commit_seen.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Okänd motor: {engine} (tillåtna: {', '.join(ENGINES)})")
         
-        # Validera org.nummer om angivet
-        if org_number:
-            valid, msg = self.validators.validate_org_number(org_number)
-            if not valid:
-                validations.append(ValidationError("org_number", msg))
+        own_index = seen is None
+        if own_index:
+            seen = self.duplicate_index()
+        for frame in _frames(df):
+            keep = self._check_duplicates(frame, seen, [report])
+            if keep is not None:
+                frame = frame[keep]
+            if self.on_rows is not None:
+                self.on_rows(frame)
+            self._check_counterparts(frame, [report])
+            
+            if engine == "vectorized":
+                self._accumulate_columns(frame, [report])
+            else:
+                self._accumulate_rows(frame, report, report.validations)
+        if own_index:
+            self.commit_seen(seen)
+    
+    def classify(self, df: pd.DataFrame) -> np.ndarray:
+        """Transaktionsklass per rad i df (classification.CLASSES), kolumnvis"""
+        with self.stage("classify", len(df)):
+            from classification import classify
+            return classify(df, self.counterparts)
+    
+    def duplicate_index(self) -> Optional["DuplicateIndex"]:
+        """Nytt dubblettindex för en körning (None om kontrollen är avstängd)"""
+        if self.duplicates == "off":
+            return None
+        from dedup import DuplicateIndex
+        return DuplicateIndex(self.seen_store)
+    
+    def commit_seen(self, seen: Optional["DuplicateIndex"]) -> int:
+        """Sparar körningens transaktioner i seen_store; returnerar antalet nya"""
+        if seen is None or self.seen_store is None:
+            return 0
+        with self.stage("seen_store") as stage:
+            added = seen.commit()
+            stage["rows"] = added
+        return added
+    
+    def _check_duplicates(self, df: pd.DataFrame, seen: Optional["DuplicateIndex"],
+                          reports: list, groups: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Söker upprepade transaktioner i df mot seen och varnar i rapporten
+        (per period med groups). Returnerar en mask över raderna att behålla
+        om dubbletter ska tas bort, annars None.
+        """
+        if seen is None or self.duplicates == "off" or not len(df):
+            return None
         
-        # Separera intäkter och kostnader
-        income = df[df['amount'] > 0].copy()
-        costs = df[df['amount'] < 0].copy()
-        
-        # Processa intäkter (utgående moms)
-        for _, row in income.iterrows():
-            vat_rate = self._get_vat_rate(row.get('vatRate', 25))
-            net = Decimal(str(row['subAmount']))
-            vat = Decimal(str(row['vat']))
-            gross = Decimal(str(row['amount']))
+        with self.stage("dedup", len(df)):
+            # Perioden som raderna redovisas för, jämförs med tidigare körningar
+            labels = (reports[0].period if groups is None
+                      else np.array([report.period for report in reports], dtype=object)[groups])
+            found = seen.check(df, df.attrs.get("source", ""), labels)
+            if not len(found):
+                return None
             
-            # Validera beräkningar
-            if vat_rate != VATRate.ZERO:
-                valid, msg = self.validators.validate_vat_calculation(net, vat, vat_rate)
-                if not valid:
-                    validations.append(ValidationError(
-                        f"transaction_{row.get('id', 'unknown')}", 
-                        msg, 
-                        "warning"
-                    ))
+            dropped = self.duplicates == "drop"
+            row_ids = _row_ids(df, np.flatnonzero(found.mask))
+            group = (np.zeros(len(row_ids), dtype=np.intp) if groups is None
+                     else groups[found.mask])
+            for index in dict.fromkeys(group.tolist()):
+                for code, args in found.issues(row_ids, np.flatnonzero(group == index)):
+                    reports[index].duplicate_warnings.append(
+                        ValidationError("duplicates", code, (*args, dropped), "warning"))
+            return ~found.mask if dropped else None
+    
+    def _check_counterparts(self, df: pd.DataFrame, reports: list,
+                            groups: Optional[np.ndarray] = None):
+        """
+        Validerar motparternas VAT- och organisationsnummer (ett anrop per
+        unikt nummer) och räknar ogiltiga nummer per motpart i rapporterna
+        (per period med groups).
+        """
+        if VAT_NUMBER_COLUMN not in df.columns and ORG_NUMBER_COLUMN not in df.columns:
+            return
+        
+        with self.stage("counterparts", len(df)):
+            from counterparts import shared_registry
+            if self.registry is None:
+                self.registry = shared_registry(type(self.validators))
+            found = self.registry.check(df)
+            if not len(found):
+                return
+            
+            group = (np.zeros(len(found.rows), dtype=np.int64) if groups is None
+                     else groups[found.rows].astype(np.int64))
+            keys, counts = np.unique(group * len(found.issues) + found.issue, return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                index, issue = divmod(key, len(found.issues))
+                issues = reports[index].counterpart_issues
+                issues[found.issues[issue]] = issues.get(found.issues[issue], 0) + count
+    
+    def finalize(self, report: VATReport, max_warnings: Optional[int] = None) -> dict:
+        """
+        Beräknar totaler, momsbalans och bokföringsförslag för det som
+        summerats hittills. Rapporten kan fortsätta summeras efteråt.
+        
+        Kostnaden beror bara på antalet momshinkar och visade varningar,
+        inte på hur många transaktioner som summerats in.
+        """
+        with self.stage("finalize"):
+            validations = []
             
-            valid, msg = self.validators.validate_gross_amount(net, vat, gross)
-            if not valid:
+            # Validera org.nummer om angivet
+            if report.org_number:
+                issue = self.validators.org_number_issue(report.org_number)
+                if issue is not None:
+                    validations.append(ValidationError("org_number", *issue))
+            
+            # Varningar som samlas över bitarna kommer före radvarningarna, som
+            # den kolumnvisa motorn renderar sist
+            validations.extend(report.duplicate_warnings)
+            
+            # En varning per motpart med ogiltigt nummer, sorterade på nummer och
+            # motpart så att ordningen inte beror på bitindelning eller kolumntyp
+            issues = sorted(report.counterpart_issues.items(), key=lambda item: item[0][:3])
+            for (kind, identifier, counterpart, code, args), count in issues:
                 validations.append(ValidationError(
-                    f"transaction_{row.get('id', 'unknown')}", 
-                    msg,
-                    "warning"
-                ))
+                    f"counterpart_{counterpart}" if counterpart else "counterpart",
+                    ValidationCode.COUNTERPART, (kind, identifier, counterpart, count, code, args),
+                    "warning"))
+            
+            validations.extend(report.validations)
+            
+            # Beräkna totaler
+            report.total_sales = (report.sales_25 + report.sales_12 + report.sales_6 +
+                                  report.sales_0 + report.eu_sales + report.export_sales)
+            report.total_purchases = (report.purchases_25 + report.purchases_12 +
+                                      report.purchases_6 + report.purchases_0)
+            report.total_outgoing_vat = (
+                report.outgoing_vat_25 + 
+                report.outgoing_vat_12 + 
+                report.outgoing_vat_6
+            )
+            report.net_vat = report.total_outgoing_vat - report.incoming_vat
+            
+            # Validera momsbalans
+            self._validate_vat_balance(report, validations)
+        
+        # Skapa bokföringsförslag
+        with self.stage("journal"):
+            if self.report_version == 1:
+                report.journal_entries = self._create_legacy_journal_entries(report)
+            else:
+                report.journal_entries = self._create_journal_entries(report)
+        
+        # Sammanställ valideringar: fel och varningar delas upp i ett pass
+        errors = []
+        warnings = []
+        for v in validations:
+            if v.severity == "error":
+                errors.append(v)
+            elif v.severity == "warning":
+                warnings.append(v)
+        report.is_valid = not errors
+        
+        with self.stage("to_dict", len(report.row_validations) + len(validations)):
+            result = self._to_dict(report, errors, warnings, max_warnings)
+        if self.diagnostics:
+            result["diagnostics"] = self.timer.to_dict()
+        return result
+    
+    def create_journal(self, df: pd.DataFrame, group_by: str = "transaction") -> Journal:
+        """
+        Skapar en balanserad verifikation per transaktion, dag eller motpart.
+        
+        Intäkter: debet 1510, kredit försäljnings- och momskonto för satsen;
+        inkommande roaming debet 1580 och kredit 3012.
+        Kostnader: debet 6590 och 2641 (25%/12%), kredit 2440. Ingående moms
+        som inte dras av bokförs på kostnaden, och skillnaden mellan brutto och
+        netto + moms på öresutjämning (3740), så att varje verifikation balanserar.
+        Inköp med omvänd skattskyldighet får 25% moms debet 2641 och kredit 2614.
+        
+        Args:
+            df: Transaktioner (DataFrame eller TransactionBatch)
+            group_by: "transaction", "day" (kolumnen date) eller
+                "counterpart" (kolumnen counterpart)
+        """
+        if group_by not in JOURNAL_GROUPS:
+            raise ValueError(f"Okänd verifikationsindelning: {group_by} (tillåtna: {', '.join(JOURNAL_GROUPS)})")
+        if isinstance(df, TransactionBatch):
+            df = df.to_frame()
+        
+        amount = df['amount']
+        is_income = (amount > 0).to_numpy(dtype=bool)
+        active = is_income | (amount < 0).to_numpy(dtype=bool)
+        rows = np.flatnonzero(active)
+        
+        from classification import EU_REVERSE_CHARGE, EXPORT, IMPORT, ROAMING_IN
+        classes = self.classify(df)[active]
+        rate_codes, _ = self._rate_codes(df, active)
+        net = np.abs(ore_array(df['subAmount'].to_numpy()[active]))
+        vat = np.abs(ore_array(df['vat'].to_numpy()[active]))
+        gross = np.abs(ore_array(amount.to_numpy()[active]))
+        income = is_income[active]
+        
+        # Konton som index i en sorterad kontotabell; -1 = inget momskonto (0%)
+        sales_names = [BASAccounts.get_sales_account(r) for r in RATE_ORDER]
+        vat_names = [BASAccounts.get_vat_account(r) for r in RATE_ORDER]
+        fixed = (BASAccounts.ACCOUNTS_RECEIVABLE, BASAccounts.ACCOUNTS_PAYABLE,
+                 BASAccounts.EXTERNAL_SERVICES, BASAccounts.INCOMING_VAT, BASAccounts.ROUNDING,
+                 BASAccounts.ROAMING_RECEIVABLES, BASAccounts.SALES_ROAMING,
+                 BASAccounts.OUTGOING_VAT_REVERSE, BASAccounts.SALES_SERVICES_EU,
+                 BASAccounts.SALES_SERVICES_EXPORT)
+        accounts = np.array(sorted({*fixed, *sales_names, *filter(None, vat_names)}), dtype=object)
+        code = {account: index for index, account in enumerate(accounts)}
+        sales_accounts = np.array([code[a] for a in sales_names], dtype=np.int64)
+        vat_accounts = np.array([code.get(a, -1) for a in vat_names], dtype=np.int64)
+        deductible = np.isin(rate_codes, [RATE_ORDER.index(VATRate.STANDARD),
+                                          RATE_ORDER.index(VATRate.REDUCED_12)])
+        
+        roaming = income & (classes == ROAMING_IN)
+        eu_sales = income & (classes == EU_REVERSE_CHARGE)
+        export_sales = income & (classes == EXPORT)
+        # Utan svensk moms är hela beloppet (netto + angiven moms) intäkt
+        foreign = eu_sales | export_sales
+        
+        # Fyra konteringar per transaktion: motkonto, intäkt/kostnad, moms och
+        # öresutjämning, plus ingående och utgående moms vid omvänd skattskyldighet
+        vat_booked = np.where(income, (vat_accounts[rate_codes] >= 0) & ~foreign, deductible) * vat
+        counter = np.where(income, gross, -gross)
+        main = np.where(income, -net - np.where(foreign, vat, 0), net + vat - vat_booked)
+        vat_line = np.where(income, -vat_booked, vat_booked)
+        rounding = -(counter + main + vat_line)
+        reverse_charge = np.flatnonzero(~income & np.isin(classes, (EU_REVERSE_CHARGE, IMPORT)))
+        reverse_charge_vat = _round_half_up_div(net[reverse_charge] * VATRate.STANDARD.percent, 100)
+        
+        account_codes = np.concatenate([
+            np.where(income, np.where(roaming, code[BASAccounts.ROAMING_RECEIVABLES],
+                                      code[BASAccounts.ACCOUNTS_RECEIVABLE]),
+                     code[BASAccounts.ACCOUNTS_PAYABLE]),
+            np.where(income, np.select([roaming, eu_sales, export_sales],
+                                       [code[BASAccounts.SALES_ROAMING],
+                                        code[BASAccounts.SALES_SERVICES_EU],
+                                        code[BASAccounts.SALES_SERVICES_EXPORT]],
+                                       sales_accounts[rate_codes]),
+                     code[BASAccounts.EXTERNAL_SERVICES]),
+            np.where(income, np.where(foreign, -1, vat_accounts[rate_codes]),
+                     code[BASAccounts.INCOMING_VAT]),
+            np.full(len(rows), code[BASAccounts.ROUNDING]),
+            np.full(len(reverse_charge), code[BASAccounts.INCOMING_VAT]),
+            np.full(len(reverse_charge), code[BASAccounts.OUTGOING_VAT_REVERSE])
+        ])
+        line_amounts = np.concatenate([counter, main, vat_line, rounding,
+                                       reverse_charge_vat, -reverse_charge_vat])
+        
+        # Verifikation per transaktion, eller grupperat på dag/motpart
+        days = (_local_dates(df[DATE_COLUMN]).to_numpy()[active].astype("datetime64[D]")
+                if DATE_COLUMN in df.columns else np.full(len(rows), np.datetime64("NaT"), "datetime64[D]"))
+        if group_by == "transaction":
+            groups = np.arange(len(rows))
+            dates = days
+            descriptions = ("Transaktion " + pd.Series(_row_ids(df, rows), dtype=str)).to_numpy(dtype=object)
+        elif group_by == "day":
+            if DATE_COLUMN not in df.columns or np.isnat(days).any():
+                raise ValueError(f"Verifikation per dag kräver giltigt datum i '{DATE_COLUMN}'")
+            dates, groups = np.unique(days, return_inverse=True)
+            descriptions = ("Dagsverifikation " + pd.Series(dates.astype(str))).to_numpy(dtype=object)
+        else:
+            if COUNTERPART_COLUMN not in df.columns:
+                raise ValueError(f"Kolumnen '{COUNTERPART_COLUMN}' saknas")
+            counterparts = df[COUNTERPART_COLUMN].to_numpy()[active]
+            groups, names = pd.factorize(pd.Series(counterparts, dtype=object).fillna(""), sort=True)
+            dates = pd.Series(days).groupby(groups).max().to_numpy().astype("datetime64[D]")
+            descriptions = ("Motpart " + pd.Series(names.astype(str))).to_numpy(dtype=object)
+        
+        # Summera per (verifikation, konto) och släpp nollrader
+        booked = account_codes >= 0
+        line_groups = np.concatenate([np.tile(groups.astype(np.int64), 4),
+                                      np.tile(groups[reverse_charge].astype(np.int64), 2)])
+        keys = line_groups[booked] * len(accounts) + account_codes[booked]
+        unique_keys, buckets = np.unique(keys, return_inverse=True)
+        sums = np.array(_bucket_sums(buckets, line_amounts[booked], len(unique_keys)), dtype=np.int64)
+        keep = sums != 0
+        unique_keys = unique_keys[keep]
+        used = accounts[unique_keys % len(accounts)]
+        
+        return Journal(
+            verification=unique_keys // len(accounts),
+            account=used,
+            amount=sums[keep],
+            dates=np.asarray(dates, dtype="datetime64[D]"),
+            descriptions=descriptions,
+            account_names={a: BASAccounts.NAMES.get(a, a) for a in accounts[np.unique(unique_keys % len(accounts))]}
+        )
+    
+    def _accumulate_rows(self, df: pd.DataFrame, report: VATReport, validations: list):
+        """Radvis motor: summerar en transaktion i taget"""
+        classes = self.classify(df)
+        
+        # Separera intäkter och kostnader
+        with self.stage("split", len(df)):
+            is_income = (df['amount'] > 0).to_numpy(dtype=bool)
+            is_cost = (df['amount'] < 0).to_numpy(dtype=bool)
+            income = df[is_income].copy()
+            costs = df[is_cost].copy()
+        
+        with self.stage("income_rows", len(income)):
+            self._accumulate_income_rows(income, report, validations, classes[is_income])
+        with self.stage("cost_rows", len(costs)):
+            self._accumulate_cost_rows(costs, report, classes[is_cost])
+    
+    def _accumulate_income_rows(self, income: pd.DataFrame, report: VATReport, validations: list,
+                                classes: Optional[np.ndarray] = None):
+        """Utgående moms, en intäktsrad i taget"""
+        from classification import DOMESTIC, EU_REVERSE_CHARGE, EXPORT, ROAMING_IN
+        
+        if classes is None:
+            classes = np.full(len(income), DOMESTIC, dtype=np.uint8)
+        for (_, row), transaction_class in zip(income.iterrows(), classes.tolist()):
+            vat_rate, declared, net, vat, gross = self._parse_row(row)
+            self._validate_income_row(row.get('id', 'unknown'), vat_rate, net, vat, gross,
+                                      validations, declared,
+                                      transaction_class in (EU_REVERSE_CHARGE, EXPORT))
+            
+            # EU- och exportförsäljning har ingen svensk moms, oavsett angiven sats
+            if transaction_class == EU_REVERSE_CHARGE:
+                report.eu_sales += net + vat
+                continue
+            if transaction_class == EXPORT:
+                report.export_sales += net + vat
+                continue
+            
+            # Delsummor per klass
+            if transaction_class == ROAMING_IN:
+                if vat_rate == VATRate.ZERO:
+                    report.roaming_sales_0 += net
+                else:
+                    report.roaming_sales += net
+                if vat_rate == VATRate.REDUCED_12:
+                    report.roaming_sales_12 += net
+                elif vat_rate == VATRate.REDUCED_6:
+                    report.roaming_sales_6 += net
+                report.roaming_vat += vat
             
             # Summera per momssats
             if vat_rate == VATRate.STANDARD:
@@ -278,12 +1847,27 @@ class VATProcessor:
                 report.outgoing_vat_6 += vat
             else:
                 report.sales_0 += net
+    
+    def _accumulate_cost_rows(self, costs: pd.DataFrame, report: VATReport,
+                              classes: Optional[np.ndarray] = None):
+        """Ingående moms, en kostnadsrad i taget"""
+        from classification import DOMESTIC, EU_REVERSE_CHARGE, IMPORT
         
-        # Processa kostnader (ingående moms)
-        for _, row in costs.iterrows():
-            vat_rate = self._get_vat_rate(row.get('vatRate', 25))
-            net = abs(Decimal(str(row['subAmount'])))
-            vat = abs(Decimal(str(row['vat'])))
+        if classes is None:
+            classes = np.full(len(costs), DOMESTIC, dtype=np.uint8)
+        for (_, row), transaction_class in zip(costs.iterrows(), classes.tolist()):
+            vat_rate, _ = self._row_rate(row)
+            net = abs(to_ore(row['subAmount']))
+            vat = abs(to_ore(row['vat']))
+            
+            # Omvänd skattskyldighet: köparen beräknar momsen (25%) på nettot
+            if transaction_class in (EU_REVERSE_CHARGE, IMPORT):
+                if transaction_class == EU_REVERSE_CHARGE:
+                    report.eu_purchases += net
+                else:
+                    report.import_purchases += net
+                report.reverse_charge_vat += _round_half_up_ore(
+                    net * VATRate.STANDARD.percent, 100)
             
             if vat_rate == VATRate.STANDARD:
                 report.purchases_25 += net
@@ -291,104 +1875,432 @@ class VATProcessor:
             elif vat_rate == VATRate.REDUCED_12:
                 report.purchases_12 += net
                 report.incoming_vat += vat
-            elif vat_rate == VATRate.ZERO:
+            elif vat_rate == VATRate.REDUCED_6:
+                report.purchases_6 += net
+                report.non_deductible_vat += vat
+            else:
                 report.purchases_0 += net
+                report.non_deductible_vat += vat
+    
+    def _accumulate_columns(self, df: pd.DataFrame, reports: list,
+                            groups: Optional[np.ndarray] = None):
+        """
+        Kolumnvis motor: grupperar på (rapport, momssats, tecken) och summerar
+        netto/moms per hink i ett pass, räknat i int64 öre.
         
-        # Beräkna totaler
-        report.total_outgoing_vat = (
-            report.outgoing_vat_25 + 
-            report.outgoing_vat_12 + 
-            report.outgoing_vat_6
-        )
-        report.net_vat = report.total_outgoing_vat - report.incoming_vat
+        Args:
+            df: Transaktioner
+            reports: Rapporter att summera in i
+            groups: Rapportindex per rad i df (None = allt till reports[0])
+        """
+        from classification import EU_REVERSE_CHARGE, EXPORT, IMPORT, ROAMING_IN
         
-        # Validera momsbalans
-        self._validate_vat_balance(report, validations)
+        classes = self.classify(df)
+        with self.stage("split", len(df)):
+            amount = df['amount']
+            is_income = (amount > 0).to_numpy(dtype=bool)
+            is_cost = (amount < 0).to_numpy(dtype=bool)
+            active = is_income | is_cost
+            
+            rate_codes, declared = self._rate_codes(df, active)
+            net = ore_array(df['subAmount'].to_numpy()[active])
+            vat = ore_array(df['vat'].to_numpy()[active])
+            gross = ore_array(amount.to_numpy()[active])
+            group = (np.zeros(len(net), dtype=np.intp) if groups is None
+                     else groups[active].astype(np.intp))
+            
+            income = is_income[active]
+            classes = classes[active]
+            foreign = income & np.isin(classes, (EU_REVERSE_CHARGE, EXPORT))
+            # Kostnader summeras som absolutbelopp, precis som i radloopen
+            net_abs = np.where(income, net, np.abs(net))
+            vat_abs = np.where(income, vat, np.abs(vat))
         
-        # Skapa bokföringsförslag
-        report.journal_entries = self._create_journal_entries(report)
+        with self.stage("sums", len(net)):
+            # EU- och exportförsäljning hamnar i en sista hink per rapport,
+            # utanför satshinkarna, och summeras i class_sums
+            size = len(RATE_ORDER) * 2 + 1
+            buckets = np.where(foreign, group * size + size - 1,
+                               group * size + rate_codes.astype(np.intp) * 2 + (~income))
+            net_sums = _bucket_sums(buckets, net_abs, size * len(reports))
+            vat_sums = _bucket_sums(buckets, vat_abs, size * len(reports))
+            
+            for index, report in enumerate(reports):
+                def total(sums, rate, cost=False):
+                    return sums[index * size + RATE_ORDER.index(rate) * 2 + cost]
+                
+                report.sales_25 += total(net_sums, VATRate.STANDARD)
+                report.sales_12 += total(net_sums, VATRate.REDUCED_12)
+                report.sales_6 += total(net_sums, VATRate.REDUCED_6)
+                report.sales_0 += total(net_sums, VATRate.ZERO)
+                report.outgoing_vat_25 += total(vat_sums, VATRate.STANDARD)
+                report.outgoing_vat_12 += total(vat_sums, VATRate.REDUCED_12)
+                report.outgoing_vat_6 += total(vat_sums, VATRate.REDUCED_6)
+                
+                # Ingående moms på 6% och 0% dras inte av, precis som i radloopen
+                report.purchases_25 += total(net_sums, VATRate.STANDARD, cost=True)
+                report.purchases_12 += total(net_sums, VATRate.REDUCED_12, cost=True)
+                report.purchases_6 += total(net_sums, VATRate.REDUCED_6, cost=True)
+                report.purchases_0 += total(net_sums, VATRate.ZERO, cost=True)
+                report.incoming_vat += (
+                    total(vat_sums, VATRate.STANDARD, cost=True) +
+                    total(vat_sums, VATRate.REDUCED_12, cost=True)
+                )
+                report.non_deductible_vat += (
+                    total(vat_sums, VATRate.REDUCED_6, cost=True) +
+                    total(vat_sums, VATRate.ZERO, cost=True)
+                )
+        
+        with self.stage("class_sums", len(net)):
+            # Delsummor per transaktionsklass, samma regler som radloopen
+            roaming = income & (classes == ROAMING_IN)
+            zero = rate_codes == RATE_ORDER.index(VATRate.ZERO)
+            reverse_charge = ~income & np.isin(classes, (EU_REVERSE_CHARGE, IMPORT))
+            reverse_charge_vat = _round_half_up_div(net_abs * VATRate.STANDARD.percent, 100)
+            for name, mask, values in (
+                ("roaming_sales", roaming & ~zero, net_abs),
+                ("roaming_sales_12", roaming & (rate_codes == RATE_ORDER.index(VATRate.REDUCED_12)), net_abs),
+                ("roaming_sales_6", roaming & (rate_codes == RATE_ORDER.index(VATRate.REDUCED_6)), net_abs),
+                ("roaming_sales_0", roaming & zero, net_abs),
+                ("roaming_vat", roaming, vat_abs),
+                ("eu_sales", income & (classes == EU_REVERSE_CHARGE), net + vat),
+                ("export_sales", income & (classes == EXPORT), net + vat),
+                ("eu_purchases", ~income & (classes == EU_REVERSE_CHARGE), net_abs),
+                ("import_purchases", ~income & (classes == IMPORT), net_abs),
+                ("reverse_charge_vat", reverse_charge, reverse_charge_vat),
+            ):
+                if not mask.any():
+                    continue
+                sums = _bucket_sums(group[mask], values[mask], len(reports))
+                for report, amount in zip(reports, sums):
+                    setattr(report, name, getattr(report, name) + amount)
+        
+        with self.stage("validate", int(income.sum())):
+            # Radkontrollerna som masker över alla intäktsrader
+            percent = np.array(RATE_PERCENT, dtype=np.int64)[rate_codes]
+            expected_vat = _round_half_up_div(net * percent, 100)
+            expected_gross = net + vat
+            vat_off = income & (percent != 0) & (np.abs(vat - expected_vat) > TOLERANCE_ORE)
+            gross_off = income & (np.abs(gross - expected_gross) > TOLERANCE_ORE)
+            rate_off = income & (declared >= 0) & (declared != percent)
+            charged = foreign & (np.abs(vat) > TOLERANCE_ORE)
+            
+            vat_rows = np.flatnonzero(vat_off)
+            gross_rows = np.flatnonzero(gross_off)
+            rate_rows = np.flatnonzero(rate_off)
+            charged_rows = np.flatnonzero(charged)
+            rows = np.concatenate([vat_rows, gross_rows, rate_rows, charged_rows])
+            checks = np.concatenate([
+                np.full(len(vat_rows), ValidationCode.TRANSACTION_VAT, dtype=np.uint8),
+                np.full(len(gross_rows), ValidationCode.TRANSACTION_GROSS, dtype=np.uint8),
+                np.full(len(rate_rows), ValidationCode.TRANSACTION_VAT_RATE, dtype=np.uint8),
+                np.full(len(charged_rows), ValidationCode.TRANSACTION_REVERSE_CHARGE, dtype=np.uint8)
+            ])
+            # Samma ordning som radloopen: per rad, moms-, brutto-, sats- och
+            # sedan kontrollen av omvänd skattskyldighet
+            order = np.lexsort((checks, rows))
+            rows = rows[order]
+            checks = checks[order]
+            is_vat = checks == ValidationCode.TRANSACTION_VAT
+            is_rate = checks == ValidationCode.TRANSACTION_VAT_RATE
+            is_charged = checks == ValidationCode.TRANSACTION_REVERSE_CHARGE
+            
+            table = ValidationTable(
+                row_id=_row_ids(df, np.flatnonzero(active)[rows]),
+                check=checks,
+                expected=np.select([is_vat, is_rate, is_charged],
+                                   [expected_vat[rows], percent[rows], 0], expected_gross[rows]),
+                actual=np.select([is_vat, is_rate, is_charged],
+                                 [vat[rows], declared[rows], vat[rows]], gross[rows]),
+                net=net[rows],
+                percent=percent[rows].astype(np.uint8)
+            )
+        
+        if len(reports) == 1:
+            reports[0].row_validations = ValidationTable.concat([reports[0].row_validations, table])
+            return
+        
+        table_groups = group[rows]
+        for index in np.unique(table_groups):
+            report = reports[index]
+            part = table.take(np.flatnonzero(table_groups == index))
+            report.row_validations = ValidationTable.concat([report.row_validations, part])
+
+    def _parse_row(self, row: pd.Series) -> tuple:
+        """Läser momssats, angiven sats och belopp (öre) från en intäktsrad"""
+        vat_rate, declared = self._row_rate(row)
+        net = to_ore(row['subAmount'])
+        vat = to_ore(row['vat'])
+        gross = to_ore(row['amount'])
+        return vat_rate, declared, net, vat, gross
+    
+    def _row_rate(self, row: pd.Series) -> tuple:
+        """
+        Momssats för en rad. Med vatCategory avgör tidslinjen satsen utifrån
+        datumet, och den angivna vatRate returneras för jämförelse (annars None).
+        """
+        category = row.get(CATEGORY_COLUMN)
+        if category is None or pd.isna(category):
+            return self._get_vat_rate(row.get('vatRate', 25)), None
         
-        # Sammanställ valideringar
-        report.validations = [asdict(v) for v in validations]
-        report.is_valid = not any(v.severity == "error" for v in validations)
+        stamp = pd.to_datetime(row.get(DATE_COLUMN), errors="coerce")
+        if pd.isna(stamp):
+            raise ValueError(f"Transaktion med momskategori saknar giltigt datum i '{DATE_COLUMN}'")
+        if stamp.tzinfo is not None:
+            stamp = stamp.tz_convert(LOCAL_TIMEZONE)
+        vat_rate = self.rate_timeline.rate_for(category, stamp.date())
         
-        return self._to_dict(report)
+        declared = row.get('vatRate')
+        if declared is None or pd.isna(declared):
+            return vat_rate, None
+        return vat_rate, int(declared)
+    
+    def _validate_income_row(self, row_id, vat_rate: VATRate,
+                             net: int, vat: int, gross: int,
+                             validations: list, declared: Optional[int] = None,
+                             zero_rated: bool = False):
+        """
+        Validerar moms- och bruttobelopp, och angiven momssats, för en
+        intäktsrad. zero_rated: motparten är utländsk och ska faktureras utan moms.
+        """
+        if vat_rate != VATRate.ZERO:
+            issue = self.validators.vat_calculation_issue(net, vat, vat_rate)
+            if issue is not None:
+                validations.append(ValidationError(
+                    f"transaction_{row_id}",
+                    *issue,
+                    "warning"
+                ))
+        
+        issue = self.validators.gross_amount_issue(net, vat, gross)
+        if issue is not None:
+            validations.append(ValidationError(
+                f"transaction_{row_id}",
+                *issue,
+                "warning"
+            ))
+        
+        if declared is not None and declared != vat_rate.percent:
+            validations.append(ValidationError(
+                f"transaction_{row_id}",
+                ValidationCode.TRANSACTION_VAT_RATE,
+                (declared, vat_rate.percent),
+                "warning"
+            ))
+        
+        if zero_rated and abs(vat) > TOLERANCE_ORE:
+            validations.append(ValidationError(
+                f"transaction_{row_id}",
+                ValidationCode.TRANSACTION_REVERSE_CHARGE,
+                (vat,),
+                "warning"
+            ))
+    
+    def _rate_codes(self, df: pd.DataFrame, mask: np.ndarray) -> tuple:
+        """
+        Momssats per rad som index i RATE_ORDER (samma regler som _row_rate),
+        och angiven vatRate där tidslinjen avgör satsen (-1 = ingen jämförelse).
+        """
+        count = int(mask.sum())
+        declared = np.full(count, -1, dtype=np.int64)
+        if CATEGORY_COLUMN not in df.columns:
+            return self._percent_codes(df, mask), declared
+        
+        by_category = df[CATEGORY_COLUMN].notna().to_numpy(dtype=bool)
+        timeline_rows = mask & by_category
+        if not timeline_rows.any():
+            return self._percent_codes(df, mask), declared
+        if DATE_COLUMN not in df.columns:
+            raise ValueError(f"Datumkolumnen '{DATE_COLUMN}' saknas för rader med {CATEGORY_COLUMN}")
+        
+        dates = _local_dates(df[DATE_COLUMN]).to_numpy()[timeline_rows]
+        if np.isnat(dates).any():
+            raise ValueError(f"Transaktion med momskategori saknar giltigt datum i '{DATE_COLUMN}'")
+        
+        codes = np.zeros(count, dtype=np.uint8)
+        selected = by_category[mask]
+        codes[selected] = self.rate_timeline.resolve(df[CATEGORY_COLUMN].to_numpy()[timeline_rows], dates)
+        codes[~selected] = self._percent_codes(df, mask & ~by_category)
+        
+        if 'vatRate' in df.columns:
+            rates = df['vatRate'].to_numpy()[timeline_rows]
+            if rates.dtype.kind in "iuf":
+                rates = np.trunc(rates.astype(np.float64))
+                stated = np.isfinite(rates)
+                declared[np.flatnonzero(selected)[stated]] = rates[stated].astype(np.int64)
+            else:
+                declared[selected] = np.fromiter(
+                    (-1 if pd.isna(r) else int(r) for r in rates), dtype=np.int64, count=len(rates))
+        return codes, declared
+    
+    def _percent_codes(self, df: pd.DataFrame, mask: np.ndarray) -> np.ndarray:
+        """Momssats per rad utifrån vatRate (samma regler som _get_vat_rate)"""
+        if 'vatRate' not in df.columns:
+            return np.zeros(int(mask.sum()), dtype=np.uint8)
+        
+        rates = df['vatRate'].to_numpy()[mask]
+        if rates.dtype.kind not in "iuf":
+            return np.fromiter((RATE_ORDER.index(self._get_vat_rate(r)) for r in rates),
+                               dtype=np.uint8, count=len(rates))
+        rates = np.trunc(rates.astype(np.float64))
+        if not np.isfinite(rates).all():
+            raise ValueError("Momssats saknas eller är ogiltig på minst en rad")
+        
+        codes = np.zeros(len(rates), dtype=np.uint8)
+        for code, percent in enumerate(RATE_PERCENT):
+            codes[rates == percent] = code
+        return codes
     
     def _get_vat_rate(self, rate_percent: float) -> VATRate:
         """Konverterar procentsats till VATRate"""
-        rate_map = {
-            25: VATRate.STANDARD,
-            12: VATRate.REDUCED_12,
-            6: VATRate.REDUCED_6,
-            0: VATRate.ZERO
-        }
-        return rate_map.get(int(rate_percent), VATRate.STANDARD)
+        try:
+            percent = int(rate_percent)
+        except (ValueError, OverflowError):
+            raise ValueError("Momssats saknas eller är ogiltig på minst en rad") from None
+        return RATE_BY_PERCENT.get(percent, VATRate.STANDARD)
     
     def _validate_vat_balance(self, report: VATReport, validations: list):
         """Validerar att momsberäkningen balanserar"""
         calculated_net = report.total_outgoing_vat - report.incoming_vat
-        if abs(calculated_net - report.net_vat) > Decimal("0.01"):
+        if abs(calculated_net - report.net_vat) > 1:
             validations.append(ValidationError(
                 "vat_balance",
-                f"Momsbalans stämmer inte: beräknad {calculated_net} ≠ rapporterad {report.net_vat}",
+                ValidationCode.VAT_BALANCE,
+                (calculated_net, report.net_vat),
                 "error"
             ))
     
+    def _create_legacy_journal_entries(self, report: VATReport) -> list:
+        """
+        Bokföringsförslaget i rapportversion 1: försäljning 25 %, momsfri
+        försäljning (med EU- och exportförsäljning), utgående moms 25 %,
+        kostnader (inköp utom 6 %) och ingående moms, var och en bara om
+        beloppet är positivt. Förslaget är inte balanserat; se
+        _create_journal_entries för version 2.
+        """
+        tax_free = report.sales_0 + report.eu_sales + report.export_sales
+        lines = (
+            (BASAccounts.SALES_SERVICES_25, "Försäljning tjänster 25% moms", 0, report.sales_25,
+             "Intäkter med 25% moms"),
+            (BASAccounts.SALES_SERVICES_0, "Försäljning tjänster momsfri", 0, tax_free,
+             "Momsfria intäkter (t.ex. roaming)"),
+            (BASAccounts.OUTGOING_VAT_25, "Utgående moms 25%", 0, report.outgoing_vat_25,
+             "Utgående moms på försäljning"),
+            (BASAccounts.EXTERNAL_SERVICES, "Övriga externa tjänster",
+             report.total_purchases - report.purchases_6, 0,
+             "Kostnader för avgifter och abonnemang"),
+            (BASAccounts.INCOMING_VAT, "Ingående moms", report.incoming_vat, 0,
+             "Avdragsgill ingående moms")
+        )
+        # Beloppet som float och den tomma sidan som heltalet 0, som tidigare
+        return [
+            {
+                "account": account,
+                "account_name": name,
+                "debit": ore_to_float(debit) if debit else 0,
+                "credit": ore_to_float(credit) if credit else 0,
+                "description": description
+            }
+            for account, name, debit, credit, description in lines
+            if debit + credit > 0
+        ]
+    
     def _create_journal_entries(self, report: VATReport) -> list:
-        """Skapar bokföringsförslag enligt BAS-kontoplanen"""
-        entries = []
-        
-        if report.sales_25 > 0:
-            entries.append({
-                "account": BASAccounts.SALES_SERVICES_25,
-                "account_name": "Försäljning tjänster 25% moms",
-                "debit": 0,
-                "credit": float(report.sales_25),
-                "description": "Intäkter med 25% moms"
-            })
-        
-        if report.sales_0 > 0:
-            entries.append({
-                "account": BASAccounts.SALES_SERVICES_0,
-                "account_name": "Försäljning tjänster momsfri",
-                "debit": 0,
-                "credit": float(report.sales_0),
-                "description": "Momsfria intäkter (t.ex. roaming)"
-            })
-        
-        if report.outgoing_vat_25 > 0:
-            entries.append({
-                "account": BASAccounts.OUTGOING_VAT_25,
-                "account_name": "Utgående moms 25%",
-                "debit": 0,
-                "credit": float(report.outgoing_vat_25),
-                "description": "Utgående moms på försäljning"
-            })
+        """
+        Skapar ett balanserat bokföringsförslag enligt BAS-kontoplanen:
+        försäljning och utgående moms mot kundfordringar (1510), kostnader
+        och ingående moms mot leverantörsskulder (2440). Inkommande roaming
+        bokförs på 3012 mot roamingfordringar (1580), EU-försäljning med omvänd
+        skattskyldighet på 3308 och försäljning utanför EU på 3305, båda utan
+        utgående moms. Moms på inköp med omvänd skattskyldighet bokförs både
+        som utgående (2614) och ingående (2641).
+        """
+        sales = {}
+        outgoing = {}
+        for rate, net, vat in (
+            (VATRate.STANDARD, report.sales_25, report.outgoing_vat_25),
+            (VATRate.REDUCED_12, report.sales_12, report.outgoing_vat_12),
+            (VATRate.REDUCED_6, report.sales_6, report.outgoing_vat_6),
+            (VATRate.ZERO, report.sales_0, 0)
+        ):
+            account = BASAccounts.get_sales_account(rate)
+            sales[account] = sales.get(account, 0) + net
+            vat_account = BASAccounts.get_vat_account(rate)
+            if vat_account:
+                outgoing[vat_account] = outgoing.get(vat_account, 0) + vat
         
-        if report.purchases_25 + report.purchases_12 + report.purchases_0 > 0:
-            total_costs = report.purchases_25 + report.purchases_12 + report.purchases_0
-            entries.append({
-                "account": BASAccounts.EXTERNAL_SERVICES,
-                "account_name": "Övriga externa tjänster",
-                "debit": float(total_costs),
-                "credit": 0,
-                "description": "Kostnader för avgifter och abonnemang"
-            })
+        # Inkommande roaming flyttas från satsens konto till roamingkontot
+        sales[BASAccounts.SALES_SERVICES_25] -= (
+            report.roaming_sales - report.roaming_sales_12 - report.roaming_sales_6)
+        sales[BASAccounts.SALES_SERVICES_12] -= report.roaming_sales_12
+        sales[BASAccounts.SALES_SERVICES_6] -= report.roaming_sales_6
+        sales[BASAccounts.SALES_SERVICES_0] -= report.roaming_sales_0
+        sales[BASAccounts.SALES_ROAMING] = report.roaming_sales + report.roaming_sales_0
+        sales[BASAccounts.SALES_SERVICES_EU] = report.eu_sales
+        sales[BASAccounts.SALES_SERVICES_EXPORT] = report.export_sales
+        roaming_receivables = sales[BASAccounts.SALES_ROAMING] + report.roaming_vat
         
-        if report.incoming_vat > 0:
-            entries.append({
-                "account": BASAccounts.INCOMING_VAT,
-                "account_name": "Ingående moms",
-                "debit": float(report.incoming_vat),
-                "credit": 0,
-                "description": "Avdragsgill ingående moms"
-            })
+        descriptions = {
+            BASAccounts.SALES_SERVICES_0: "Momsfria intäkter",
+            BASAccounts.SALES_ROAMING: "Intäkter från inkommande roaming",
+            BASAccounts.SALES_SERVICES_EU: "Intäkter från EU-land, omvänd skattskyldighet",
+            BASAccounts.SALES_SERVICES_EXPORT: "Intäkter från land utanför EU"
+        }
+        # Moms som inte dras av ingår i kostnaden, som i create_journal
+        costs = report.total_purchases + report.non_deductible_vat
+        lines = [
+            *((account, -net, descriptions.get(account, "Intäkter med moms"))
+              for account, net in sales.items()),
+            *((account, -vat, "Utgående moms på försäljning")
+              for account, vat in outgoing.items()),
+            (BASAccounts.ACCOUNTS_RECEIVABLE,
+             sum(sales.values()) + sum(outgoing.values()) - roaming_receivables,
+             "Fordringar för periodens försäljning"),
+            (BASAccounts.ROAMING_RECEIVABLES, roaming_receivables,
+             "Fordringar på roamingpartner"),
+            (BASAccounts.EXTERNAL_SERVICES, costs, "Kostnader för avgifter och abonnemang"),
+            (BASAccounts.INCOMING_VAT, report.incoming_vat, "Avdragsgill ingående moms"),
+            (BASAccounts.ACCOUNTS_PAYABLE, -(costs + report.incoming_vat),
+             "Skulder för periodens kostnader"),
+            (BASAccounts.INCOMING_VAT, report.reverse_charge_vat,
+             "Ingående moms, omvänd skattskyldighet"),
+            (BASAccounts.OUTGOING_VAT_REVERSE, -report.reverse_charge_vat,
+             "Utgående moms, omvänd skattskyldighet")
+        ]
         
-        return entries
+        # Positivt belopp är debet, negativt kredit
+        return [
+            {
+                "account": account,
+                "account_name": BASAccounts.NAMES[account],
+                "debit": ore_to_float(max(amount, 0)),
+                "credit": ore_to_float(max(-amount, 0)),
+                "description": description
+            }
+            for account, amount, description in lines
+            if amount != 0
+        ]
     
-    def _to_dict(self, report: VATReport) -> dict:
-        """Konverterar rapport till JSON-serialiserbar dict"""
-        return {
+    def _to_dict(self, report: VATReport, errors: list, warnings: list,
+                 max_warnings: Optional[int] = None) -> dict:
+        """
+        Konverterar rapport till JSON-serialiserbar dict. Totalerna är
+        beräknade i finalize och errors/warnings redan uppdelade, så
+        kostnaden är O(fält + visade varningar).
+        """
+        warning_count = len(warnings) + len(report.row_validations)
+        if max_warnings is not None:
+            warnings = warnings[:max_warnings]
+        legacy = self.report_version == 1
+        shown = [v.to_dict(self.language, legacy) for v in warnings]
+        # Tabellrader renderas bara för de varningar som faktiskt visas
+        remaining = None if max_warnings is None else max_warnings - len(shown)
+        shown.extend(report.row_validations.render(remaining, self.language, legacy))
+        
+        net_vat = ore_to_float(report.net_vat)
+        total_outgoing_vat = ore_to_float(report.total_outgoing_vat)
+        incoming_vat = ore_to_float(report.incoming_vat)
+        result = {
             "period": report.period,
             "company": {
                 "name": report.company_name,
@@ -396,79 +2308,321 @@ class VATProcessor:
             },
             "sales": {
                 "vat_25_percent": {
-                    "net": float(report.sales_25),
-                    "vat": float(report.outgoing_vat_25)
+                    "net": ore_to_float(report.sales_25),
+                    "vat": ore_to_float(report.outgoing_vat_25)
                 },
                 "vat_12_percent": {
-                    "net": float(report.sales_12),
-                    "vat": float(report.outgoing_vat_12)
+                    "net": ore_to_float(report.sales_12),
+                    "vat": ore_to_float(report.outgoing_vat_12)
                 },
                 "vat_6_percent": {
-                    "net": float(report.sales_6),
-                    "vat": float(report.outgoing_vat_6)
+                    "net": ore_to_float(report.sales_6),
+                    "vat": ore_to_float(report.outgoing_vat_6)
                 },
                 "vat_0_percent": {
-                    "net": float(report.sales_0)
+                    "net": ore_to_float(report.sales_0)
                 },
-                "total_net": float(report.sales_25 + report.sales_12 + report.sales_6 + report.sales_0),
-                "total_outgoing_vat": float(report.total_outgoing_vat)
+                "total_net": ore_to_float(report.total_sales),
+                "total_outgoing_vat": total_outgoing_vat
             },
             "purchases": {
                 "vat_25_percent": {
-                    "net": float(report.purchases_25)
+                    "net": ore_to_float(report.purchases_25)
                 },
                 "vat_12_percent": {
-                    "net": float(report.purchases_12)
+                    "net": ore_to_float(report.purchases_12)
+                },
+                "vat_6_percent": {
+                    "net": ore_to_float(report.purchases_6)
                 },
                 "vat_0_percent": {
-                    "net": float(report.purchases_0)
+                    "net": ore_to_float(report.purchases_0)
                 },
-                "total_net": float(report.purchases_25 + report.purchases_12 + report.purchases_0),
-                "incoming_vat": float(report.incoming_vat)
+                "total_net": ore_to_float(report.total_purchases),
+                "incoming_vat": incoming_vat
             },
             "vat_summary": {
-                "outgoing_vat": float(report.total_outgoing_vat),
-                "incoming_vat": float(report.incoming_vat),
-                "net_vat": float(report.net_vat),
-                "to_pay": float(report.net_vat) if report.net_vat > 0 else 0,
-                "to_refund": float(abs(report.net_vat)) if report.net_vat < 0 else 0
+                "outgoing_vat": total_outgoing_vat,
+                "incoming_vat": incoming_vat,
+                "net_vat": net_vat,
+                "to_pay": net_vat if report.net_vat > 0 else 0,
+                "to_refund": -net_vat if report.net_vat < 0 else 0
+            },
+            "classification": {
+                "roaming_in": {
+                    "net": ore_to_float(report.roaming_sales + report.roaming_sales_0),
+                    "vat": ore_to_float(report.roaming_vat)
+                },
+                "eu_reverse_charge": {
+                    "sales_net": ore_to_float(report.eu_sales),
+                    "purchases_net": ore_to_float(report.eu_purchases)
+                },
+                "export": {
+                    "net": ore_to_float(report.export_sales)
+                },
+                "import": {
+                    "net": ore_to_float(report.import_purchases)
+                },
+                "reverse_charge_vat": ore_to_float(report.reverse_charge_vat)
             },
             "journal_entries": report.journal_entries,
             "validation": {
                 "is_valid": report.is_valid,
-                "errors": [v for v in report.validations if v["severity"] == "error"],
-                "warnings": [v for v in report.validations if v["severity"] == "warning"]
+                "errors": [v.to_dict(self.language, legacy) for v in errors],
+                "warnings": shown
             }
         }
+        if max_warnings is not None:
+            result["validation"]["warning_count"] = warning_count
+        if legacy:
+            # Version 1 har bara de nycklar som fanns före heltalsöre: EU- och
+            # exportförsäljning ingår i den momsfria, och inköpstotalen
+            # summerar de inköpshinkar som visas
+            del result["purchases"]["vat_6_percent"], result["classification"]
+            result["sales"]["vat_0_percent"]["net"] = ore_to_float(
+                report.sales_0 + report.eu_sales + report.export_sales)
+            result["purchases"]["total_net"] = ore_to_float(
+                report.total_purchases - report.purchases_6)
+            return result
+        return {"report_version": self.report_version, **result}
 
 
 # CLI-stöd
+def _with_source(df: pd.DataFrame, path: str) -> pd.DataFrame:
+    """Märker indata med filnamnet (används i dubblettvarningar)"""
+    df.attrs["source"] = path
+    return df
+
+
+def _split_warnings(result, path: str) -> Iterable[dict]:
+    """
+    Flyttar ut varningarna ur resultatet (en rapport, en per period eller
+    batchresultat) och ger dem en i taget, med period eller fil för att
+    skilja rapporterna åt. Rapporten får warning_count och warnings_file.
+    """
+    if isinstance(result, list):
+        reports = [({"file": job["file"]}, job["report"]) for job in result if job["status"] == "ok"]
+    elif "validation" in result:
+        reports = [({}, result)]
+    else:
+        reports = [({"period": period}, report) for period, report in result.items()]
+    
+    for context, report in reports:
+        validation = report["validation"]
+        warnings = validation.pop("warnings")
+        validation.setdefault("warning_count", len(warnings))
+        validation["warnings_file"] = path
+        for warning in warnings:
+            yield {**context, **warning}
+
+
 if __name__ == "__main__":
     import argparse
+    import sys
     
     parser = argparse.ArgumentParser(description="Svensk momsprocessor")
-    parser.add_argument("input", help="Excel-fil med transaktioner")
+    parser.add_argument("input", nargs="*",
+                        help="Fil(er) med transaktioner (Excel, CSV, Parquet eller Arrow); "
+                             "flera filer, t.ex. överlappande exporter, blir en rapport")
+    parser.add_argument("--format", dest="file_format",
+                        choices=("csv", "parquet", "arrow", "excel", "xls"),
+                        help="Filformat (standard: utifrån filändelsen, annars Excel)")
     parser.add_argument("--output", "-o", help="Output JSON-fil")
+    parser.add_argument("--compact", action="store_true",
+                        help="Kompakt JSON utan indentering och mellanslag")
+    parser.add_argument("--warnings-ndjson", metavar="FILE",
+                        help="Skriv varningarna som NDJSON (en per rad) till FILE i stället "
+                             "för i rapporten")
     parser.add_argument("--company", help="Företagsnamn")
     parser.add_argument("--org", help="Organisationsnummer")
     parser.add_argument("--period", help="Period (YYYY-MM)")
+    parser.add_argument("--engine", choices=ENGINES, default="scalar",
+                        help="Beräkningsmotor (standard: scalar)")
+    parser.add_argument("--max-warnings", type=int,
+                        help="Visa högst så många varningar i rapporten")
+    parser.add_argument("--lang", choices=LANGUAGES, default="sv",
+                        help="Språk för valideringsmeddelanden (standard: sv)")
+    parser.add_argument("--report-version", type=int, choices=REPORT_VERSIONS, default=1,
+                        help="Rapportformat: 1 som tidigare, 2 med klassning och "
+                             "balanserat bokföringsförslag (standard: 1)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Läs filen i bitar i stället för att ladda allt i minnet")
+    parser.add_argument("--chunk-size", type=int, default=50_000,
+                        help="Antal rader per bit i --stream-läge (standard: 50000)")
+    parser.add_argument("--split-periods", choices=PERIODS,
+                        help="En rapport per månad/kvartal utifrån datumkolumnen")
+    parser.add_argument("--date-column", default="date",
+                        help="Datumkolumn för --split-periods (standard: date)")
+    parser.add_argument("--state",
+                        help="JSON-fil med ackumulerat tillstånd: läses om den finns, "
+                             "indata summeras in och filen skrivs tillbaka")
+    parser.add_argument("--cache-dir", default=os.environ.get("SVENSK_EKONOMI_CACHE_DIR"),
+                        help="Katalog för cache av inlästa filer (standard: "
+                             "$SVENSK_EKONOMI_CACHE_DIR, annars ingen cache)")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="Maxstorlek för cachen i MB (standard: 512)")
+    parser.add_argument("--sie",
+                        help="Skriv även en SIE4-fil med en balanserad verifikation per "
+                             "transaktion (eller per --journal-by)")
+    parser.add_argument("--journal-by", choices=JOURNAL_GROUPS, default="transaction",
+                        help="Verifikationsindelning för --sie (standard: transaction)")
+    parser.add_argument("--manifest",
+                        help="Batchläge: JSON- eller CSV-manifest med file, company, "
+                             "org_number, period; en rapport per rad")
+    parser.add_argument("--workers", type=int,
+                        help="Antal processer i batchläge (standard: antal kärnor)")
+    parser.add_argument("--duplicates", choices=DUPLICATE_POLICIES, default="report",
+                        help="Upprepade transaktioner (samma id, eller samma innehåll utan id) "
+                             "inom och mellan filerna: report varnar, drop tar bort och varnar, "
+                             "off stänger av kontrollen (standard: report)")
+    parser.add_argument("--seen-store", metavar="DIR",
+                        help="Katalog som minns redovisade transaktioner mellan körningar; "
+                             "transaktioner som redan redovisats för en annan period "
+                             "räknas som dubbletter enligt --duplicates")
+    parser.add_argument("--counterparts", metavar="FILE",
+                        help="Motpartstabell (CSV eller JSON med counterpart, country, roaming) "
+                             "för klassning i inrikes, roaming, omvänd skattskyldighet och export")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="Lägg till tid (vägg/CPU) och antal rader per steg i rapporten")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profilera körningen: PREFIX.pstats, PREFIX.collapsed.txt "
+                             "(flamegraph) och PREFIX.memory.txt")
+    parser.add_argument("--profile-prefix", metavar="PREFIX",
+                        help="Filprefix för --profile (innebär --profile; "
+                             "standard: vat_processor-profile)")
+    parser.add_argument("--debug", action="store_true",
+                        help="Skriv felsökningsinformation (t.ex. kolumner som inte läses) till stderr")
     
     args = parser.parse_args()
+    # Profileringen startar innan något tungt (pandas, läsarna) importeras
+    if args.profile or args.profile_prefix:
+        from profiling import enable_profiling
+        enable_profiling(args.profile_prefix or "vat_processor-profile")
+    
+    import logging
     
-    df = pd.read_excel(args.input)
-    processor = VATProcessor()
-    result = processor.process_transactions(
-        df,
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
+    if bool(args.input) == bool(args.manifest):
+        parser.error("ange antingen en indatafil eller --manifest")
+    if args.manifest and (args.stream or args.state or args.split_periods or args.sie
+                          or args.seen_store):
+        parser.error("--manifest kan inte kombineras med --stream, --state, --split-periods, "
+                     "--sie eller --seen-store")
+    if args.state and args.split_periods:
+        parser.error("--state kan inte kombineras med --split-periods")
+    if args.sie and args.stream:
+        parser.error("--sie kan inte kombineras med --stream")
+    if args.stream:
+        from readers import READERS, detect_format
+        for path in args.input:
+            file_format = detect_format(path, args.file_format)
+            if not READERS[file_format].streaming:
+                parser.error(f"{path}: formatet {file_format} kan inte läsas i bitar "
+                             f"(hela filen läses ändå); kör utan --stream")
+    
+    seen_store = None
+    if args.seen_store and args.duplicates != "off":
+        from dedup import SeenStore
+        seen_store = SeenStore(args.seen_store)
+    counterparts = None
+    if args.counterparts:
+        from classification import CounterpartTable
+        counterparts = CounterpartTable.from_file(args.counterparts)
+    # Med --sie konteras samma rader som rapporten summerar (utan borttagna dubbletter)
+    journal_frames = [] if args.sie else None
+    processor = VATProcessor(diagnostics=args.diagnostics, duplicates=args.duplicates,
+                             seen_store=seen_store, counterparts=counterparts,
+                             language=args.lang, report_version=args.report_version,
+                             on_rows=None if journal_frames is None else journal_frames.append)
+    options = dict(
         company_name=args.company or "",
         org_number=args.org or "",
-        period=args.period or ""
+        period=args.period or "",
+        engine=args.engine,
+        max_warnings=args.max_warnings
     )
     
-    output = json.dumps(result, indent=2, ensure_ascii=False)
+    columns = processor.input_columns(args.date_column)
+    if args.stream:
+        from readers import iter_chunks
+        data = (_with_source(chunk, path) for path in args.input
+                for chunk in iter_chunks(path, args.chunk_size, args.file_format, columns))
+    else:
+        from readers import ParsedInputCache, read_transactions
+        cache = None
+        if args.cache_dir:
+            cache = ParsedInputCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+        frames = []
+        for path in args.input:
+            with processor.stage("read") as stage:
+                frames.append(_with_source(read_transactions(path, cache, args.file_format, columns),
+                                           path))
+                stage["rows"] = len(frames[-1])
+        # En fil blir en DataFrame, flera filer en följd av bitar
+        data = frames[0] if len(frames) == 1 else frames
+    
+    if args.manifest:
+        jobs = read_manifest(args.manifest)
+        if args.file_format:
+            for job in jobs:
+                job.file_format = job.file_format or args.file_format
+        result = processor.process_many(jobs, args.workers, args.engine, args.max_warnings, cache)
+        failed = sum(r["status"] != "ok" for r in result)
+        if failed:
+            print(f"{failed} av {len(result)} jobb misslyckades", file=sys.stderr)
+    elif args.state:
+        if os.path.exists(args.state):
+            with open(args.state, encoding="utf-8") as f:
+                report = VATReport.from_state(json.load(f))
+            # Företag, org.nr och period följer med tillståndet om de inte anges
+            expected = VATReport(args.period or report.period,
+                                 args.company or report.company_name,
+                                 args.org or report.org_number)
+            report = expected.merge(report)
+        else:
+            report = processor.begin_report(options["company_name"], options["org_number"],
+                                            options["period"])
+        
+        seen = processor.duplicate_index()
+        for chunk in (data if args.stream or len(args.input) > 1 else [data]):
+            processor.accumulate(report, chunk, args.engine, seen)
+        
+        with open(args.state, "w", encoding="utf-8") as f:
+            json.dump(report.to_state(), f, ensure_ascii=False)
+        processor.commit_seen(seen)
+        result = processor.finalize(report, args.max_warnings)
+    elif args.split_periods:
+        del options["period"]
+        result = processor.process_periods(data, period_by=args.split_periods,
+                                           date_column=args.date_column, **options)
+    elif args.stream or len(args.input) > 1:
+        result = processor.process_chunks(data, **options)
+    else:
+        result = processor.process_transactions(data, **options)
+    
+    if args.sie:
+        from sie_export import SIEExporter
+        exporter = SIEExporter(args.company or "", args.org or "")
+        journal_data = (pd.concat(journal_frames, ignore_index=True) if len(journal_frames) > 1
+                        else journal_frames[0])
+        with processor.stage("sie", len(journal_data)):
+            exporter.add_journal(processor.create_journal(journal_data, args.journal_by))
+        year = int(args.period[:4]) if args.period else datetime.now().year
+        exporter.export(year, args.sie)
+    
+    from json_writer import write_json, write_ndjson
+    
+    if args.warnings_ndjson:
+        with open(args.warnings_ndjson, "w", encoding="utf-8") as f:
+            count = write_ndjson(_split_warnings(result, args.warnings_ndjson), f)
+        print(f"{count} varningar sparade till {args.warnings_ndjson}", file=sys.stderr)
     
+    indent = None if args.compact else 2
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
-            f.write(output)
+            write_json(result, f, indent)
         print(f"Rapport sparad till {args.output}")
     else:
-        print(output)
+        write_json(result, sys.stdout, indent)
+        sys.stdout.write("\n")
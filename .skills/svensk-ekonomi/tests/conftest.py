@@ -0,0 +1,34 @@
+"""
+Gemensamt för testerna: skripten och benchmarks (exportgeneratorn,
+motorjämförelsen) importeras som i benchmarks, direkt från katalogerna.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SKILL_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = SKILL_DIR / "scripts"
+BENCHMARKS_DIR = SKILL_DIR / "benchmarks"
+sys.path[:0] = [str(SCRIPTS_DIR), str(BENCHMARKS_DIR)]
+
+from monta_export import generate_monta_export  # noqa: E402
+
+
+@pytest.fixture
+def export():
+    """Liten seedad Monta-export, 2025-11-20 till 2025-12-09"""
+    return generate_monta_export(300, seed=1, start="2025-11-20", days=20)
+
+
+@pytest.fixture
+def run_cli(tmp_path):
+    """Kör vat_processor.py med argumenten i tmp_path och returnerar processen"""
+    def run(*args):
+        result = subprocess.run([sys.executable, str(SCRIPTS_DIR / "vat_processor.py"), *args],
+                                cwd=tmp_path, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        return result
+    return run
@@ -0,0 +1,22 @@
+"""Kommandoraden i vat_processor.py"""
+
+import json
+
+from monta_export import write_export
+
+
+def test_profile_is_a_flag(tmp_path, export, run_cli):
+    # --profile före indatafilen får inte ta filen som prefix
+    write_export(export, str(tmp_path / "export.csv"))
+    run_cli("--profile", "export.csv", "-o", "report.json")
+    assert json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))["sales"]
+    for suffix in (".pstats", ".collapsed.txt", ".memory.txt"):
+        assert (tmp_path / f"vat_processor-profile{suffix}").exists()
+
+
+def test_profile_prefix(tmp_path, export, run_cli):
+    write_export(export, str(tmp_path / "export.csv"))
+    run_cli("--profile-prefix", "run", "export.csv", "-o", "report.json")
+    assert (tmp_path / "report.json").exists()
+    assert (tmp_path / "run.pstats").exists()
+    assert not (tmp_path / "vat_processor-profile.pstats").exists()
@@ -0,0 +1,65 @@
+"""Motpartsregistret: VAT- och organisationsnummer valideras en gång per unikt nummer"""
+
+import pandas as pd
+import pytest
+
+from counterparts import CounterpartRegistry
+from validators import ValidationCode
+from vat_processor import SwedishValidators, VATProcessor
+
+
+@pytest.fixture
+def registry():
+    return CounterpartRegistry(SwedishValidators)
+
+
+@pytest.mark.parametrize("kind, identifier, code", [
+    ("org_number", "556183-9191", None),
+    ("org_number", "5561839192", ValidationCode.ORG_NUMBER_CHECKSUM),
+    ("vat_number", "SE556183919101", None),
+    ("vat_number", "se 5561 8391 9101", None),
+    ("vat_number", "SE556183919201", ValidationCode.VAT_NUMBER_ORG),
+    ("vat_number", "DE123456789", None),
+    ("vat_number", "DE1", ValidationCode.VAT_NUMBER_EU_FORMAT),
+    ("vat_number", "556183919101", ValidationCode.VAT_NUMBER_NO_COUNTRY),
+    ("vat_number", "NO923609016MVA", None),
+])
+def test_validate(registry, kind, identifier, code):
+    issue = registry.validate(kind, identifier)
+    assert (issue and issue[0]) == code
+
+
+def test_cache_hits_and_bound():
+    registry = CounterpartRegistry(SwedishValidators, max_size=2)
+    for identifier in ("SE556183919101", "SE 556183919101", "DE123456789", "DE1"):
+        registry.validate("vat_number", identifier)
+    assert (registry.hits, registry.misses, len(registry)) == (1, 3, 2)
+    registry.validate("vat_number", "SE556183919101")
+    assert registry.misses == 4
+
+
+def test_check_groups_rows(registry):
+    df = pd.DataFrame({
+        "counterpart": ["A", "A", "B", "C", None],
+        "counterpartVatNumber": ["SE556183919201", "SE556183919201", "DE123456789",
+                                 "NO923609016MVA", "GB123456789"],
+        "counterpartCountry": ["SE", "SE", "DE", "FI", "US"],
+    })
+    found = registry.check(df)
+    # NO-numret är bara fel för en motpart i ett EU-land
+    assert [(number, name, code) for _, number, name, code, _ in found.issues] == [
+        ("SE556183919201", "A", ValidationCode.VAT_NUMBER_ORG),
+        ("NO923609016MVA", "C", ValidationCode.VAT_NUMBER_EU_COUNTRY)]
+    assert found.rows.tolist() == [0, 1, 3]
+    assert found.issue.tolist() == [0, 0, 1]
+    assert registry.misses == 4
+
+
+def test_processor_warns_per_counterpart(export):
+    export = export.assign(counterpart="Elbilsladdning AB", counterpartOrgNumber="5561839192")
+    report = VATProcessor().process_transactions(export)
+    messages = [warning["message"] for warning in report["validation"]["warnings"]
+                if "organisationsnummer" in warning["message"]]
+    assert messages == ["Elbilsladdning AB: ogiltigt organisationsnummer 5561839192 "
+                        f"(Ogiltig kontrollsiffra (förväntat 1, fick 2)) på {len(export)} "
+                        "transaktioner"]
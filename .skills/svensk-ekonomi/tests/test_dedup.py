@@ -0,0 +1,127 @@
+"""Dubblettkontrollen och SeenStore"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dedup import DuplicateIndex, SeenStore, transaction_keys
+from validators import ValidationCode
+
+
+def test_keys_ignore_id_type():
+    as_number = pd.DataFrame({"id": [17.0, 18.0], "amount": [1.0, 2.0]})
+    as_text = pd.DataFrame({"id": ["17", " 18 "], "amount": [1.0, 2.0]})
+    assert transaction_keys(as_number)[0].tolist() == transaction_keys(as_text)[0].tolist()
+
+
+def test_rows_without_id_match_on_content():
+    df = pd.DataFrame({"id": [None, "", None], "amount": [10.0, 10.0, 10.0],
+                       "vat": [2.5, 2.5, 2.0]})
+    keys, by_id = transaction_keys(df)
+    assert not by_id.any()
+    assert keys[0] == keys[1] != keys[2]
+
+
+def test_duplicates_within_and_across(export):
+    index = DuplicateIndex()
+    first = index.check(export.iloc[:200], "a.csv")
+    chunk = pd.concat([export.iloc[150:], export.iloc[[250]]])
+    second = index.check(chunk, "b.csv")
+
+    assert len(first) == 0
+    assert np.flatnonzero(second.mask).tolist() == [*range(50), 150]
+    assert second.first_source.tolist() == ["a.csv"] * 50 + ["b.csv"]
+    issues = second.issues(chunk["id"].to_numpy()[second.mask])
+    assert [code for code, _ in issues] == [ValidationCode.DUPLICATES_ACROSS,
+                                            ValidationCode.DUPLICATES_WITHIN]
+    assert [payload[0] for _, payload in issues] == [50, 1]
+    assert len(index) == len(export)
+
+
+def test_seen_store_round_trip(tmp_path):
+    keys = np.arange(1, 2001, dtype=np.uint64) * 7919
+    store = SeenStore(str(tmp_path), capacity=1000)
+    assert store.add(keys[:1500], "2025-11") == 1500
+    assert store.add(keys[1000:], "2025-12") == 500
+
+    reopened = SeenStore(str(tmp_path))
+    assert len(reopened) == 2000
+    found = reopened.lookup(np.append(keys, np.uint64(3)))
+    assert [reopened.label_of(i) for i in found[[0, 1499, 1500]]] == ["2025-11", "2025-11",
+                                                                      "2025-12"]
+    assert found[-1] == -1
+
+
+def test_seen_store_keeps_one_generation(tmp_path):
+    store = SeenStore(str(tmp_path))
+    for key, label in enumerate(("2025-10", "2025-11", "2025-12"), start=1):
+        store.add(np.array([key], dtype=np.uint64), label)
+    generation = store.meta["generation"]
+    assert generation == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(
+        ["meta.json", "bloom.bin"] + [f"{name}.{generation}.bin"
+                                      for name in ("fence", "keys", "labels")])
+
+
+def test_seen_store_ignores_interrupted_write(tmp_path):
+    keys = np.array([11, 22, 33], dtype=np.uint64)
+    store = SeenStore(str(tmp_path))
+    store.add(keys, "2025-11")
+    # Rester av en avbruten skrivning av nästa generation
+    for name in ("keys", "labels", "fence"):
+        (tmp_path / f"{name}.2.bin").write_bytes(b"\xff" * 8)
+
+    reopened = SeenStore(str(tmp_path))
+    assert reopened.lookup(keys).tolist() == [0, 0, 0]
+    assert reopened.add(np.array([44], dtype=np.uint64), "2025-12") == 1
+    assert SeenStore(str(tmp_path)).lookup(np.array([11, 44], dtype=np.uint64)).tolist() == [0, 1]
+
+
+def test_seen_store_reads_version_1(tmp_path):
+    keys = np.array([5, 6, 7], dtype=np.uint64)
+    SeenStore(str(tmp_path)).add(keys, "2025-11")
+    # Version 1 hade inga generationer: datafilerna hette keys.bin osv.
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    for name in ("keys", "labels", "fence"):
+        (tmp_path / f"{name}.1.bin").rename(tmp_path / f"{name}.bin")
+    meta["version"] = 1
+    del meta["generation"], meta["bloom_generation"]
+    (tmp_path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    store = SeenStore(str(tmp_path))
+    assert store.lookup(keys).tolist() == [0, 0, 0]
+    store.add(np.array([8], dtype=np.uint64), "2025-12")
+    assert SeenStore(str(tmp_path)).meta["version"] == 2
+
+
+def test_replayed_rows_are_reported(tmp_path, export):
+    store = SeenStore(str(tmp_path))
+    index = DuplicateIndex(store)
+    index.check(export.iloc[:200], "nov.csv", "2025-11")
+    assert index.commit() == 200
+
+    # Samma period kan köras om; nästa period varnar för raderna som redan redovisats
+    rerun = DuplicateIndex(SeenStore(str(tmp_path))).check(export.iloc[:200], "nov.csv",
+                                                           "2025-11")
+    assert len(rerun) == 0
+    later = DuplicateIndex(SeenStore(str(tmp_path))).check(export.iloc[150:], "dec.csv",
+                                                           "2025-12")
+    assert len(later) == 50
+    assert later.replayed.all()
+    assert set(later.first_source.tolist()) == {"2025-11"}
+
+
+@pytest.mark.parametrize("policy", ["drop", "report"])
+def test_processor_duplicate_policy(export, policy):
+    from vat_processor import VATProcessor
+
+    data = pd.concat([export, export.iloc[:20]], ignore_index=True)
+    kept = VATProcessor(duplicates="off").process_transactions(export)
+    report = VATProcessor(duplicates=policy).process_transactions(data)
+    doubled = VATProcessor(duplicates="off").process_transactions(data)
+    assert (report["sales"] == kept["sales"]) == (policy == "drop")
+    assert (report["sales"] == doubled["sales"]) == (policy == "report")
+    assert any("dubbletter inom" in warning["message"]
+               for warning in report["validation"]["warnings"])
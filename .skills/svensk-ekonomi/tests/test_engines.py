@@ -0,0 +1,12 @@
+"""Den kolumnvisa motorn ska ge exakt samma rapport som den radvisa"""
+
+import pytest
+
+from engine_equivalence import compare_engines, generated_inputs
+
+INPUTS = list(generated_inputs(seeds=2, rows=200))
+
+
+@pytest.mark.parametrize("df", [df for _, df in INPUTS], ids=[name for name, _ in INPUTS])
+def test_engines_agree(df):
+    assert compare_engines(df) == []
@@ -0,0 +1,60 @@
+"""SIE-exporten: kontoplanen ska täcka varje kontering, och --sie ska kontera raderna rapporten behöll"""
+
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from engine_equivalence import add_edge_cases
+from monta_export import write_export
+from readers import read_transactions
+from sie_export import create_sie_from_vat_report
+from vat_processor import REPORT_VERSIONS, VATProcessor
+
+
+def parse_sie(content: str) -> tuple:
+    """Konton i #KONTO och summa i öre per konto i #TRANS"""
+    declared = set()
+    totals = Counter()
+    for line in content.splitlines():
+        fields = line.split()
+        if fields[:1] == ["#KONTO"]:
+            declared.add(fields[1])
+        elif fields[:1] == ["#TRANS"]:
+            kronor, _, ore = fields[-1].partition(".")
+            sign = -1 if kronor.startswith("-") else 1
+            totals[fields[1]] += sign * (abs(int(kronor)) * 100 + int(ore.ljust(2, "0")[:2]))
+    return declared, totals
+
+
+@pytest.mark.parametrize("version", REPORT_VERSIONS)
+def test_report_accounts_declared(export, version):
+    report = VATProcessor(report_version=version).process_transactions(
+        add_edge_cases(export, seed=1), "Test AB", "556183-9191", "2025-12")
+    declared, totals = parse_sie(create_sie_from_vat_report(report, 2025))
+    assert totals
+    assert set(totals) <= declared
+
+
+def test_journal_accounts_declared(tmp_path, export, run_cli):
+    write_export(add_edge_cases(export, seed=1), str(tmp_path / "export.csv"))
+    run_cli("export.csv", "--sie", "out.se", "-o", "report.json")
+    declared, totals = parse_sie((tmp_path / "out.se").read_text(encoding="cp437"))
+    assert set(totals) <= declared
+    assert sum(totals.values()) == 0
+
+
+def test_sie_books_kept_rows(tmp_path, export, run_cli):
+    # Två exporter som delar 50 rader; --sie ska kontera varje rad en gång
+    write_export(export.iloc[:200], str(tmp_path / "a.csv"))
+    write_export(export.iloc[150:], str(tmp_path / "b.csv"))
+    write_export(export, str(tmp_path / "all.csv"))
+    run_cli("a.csv", "b.csv", "--duplicates", "drop", "--split-periods", "month",
+            "--date-column", "created", "--sie", "out.se", "-o", "report.json")
+
+    content = (tmp_path / "out.se").read_text(encoding="cp437")
+    journal = VATProcessor().create_journal(read_transactions(str(tmp_path / "all.csv")))
+    expected = pd.Series(journal.amount).groupby(journal.account).sum()
+    _, totals = parse_sie(content)
+    assert content.count("#VER") == len(export)
+    assert totals == {account: int(amount) for account, amount in expected.items() if amount}
@@ -0,0 +1,63 @@
+"""Meddelandena i validators: en text per kod och språk, och rapportversion 1:s texter"""
+
+import pytest
+
+from validators import (LANGUAGES, LEGACY_MESSAGES, MESSAGES, ValidationCode, ValidationResult,
+                        render_message)
+
+
+def test_every_code_has_messages():
+    assert set(MESSAGES) == set(ValidationCode)
+    assert all(len(texts) == len(LANGUAGES) for texts in MESSAGES.values())
+    assert set(LEGACY_MESSAGES) <= set(ValidationCode)
+
+
+@pytest.mark.parametrize("lang, legacy, text", [
+    ("sv", False, "Momsbelopp 40.00 stämmer inte med 25% av 161.70 (förväntat 40.43)"),
+    ("en", False, "VAT amount 40.00 does not match 25% of 161.70 (expected 40.43)"),
+    ("sv", True, "Momsbelopp 40.0 stämmer inte med 25.00% av 161.7 (förväntat 40.43)"),
+])
+def test_transaction_vat(lang, legacy, text):
+    args = (16170, 4000, 25, 4043)
+    assert render_message(ValidationCode.TRANSACTION_VAT, args, lang, legacy) == text
+
+
+def test_legacy_only_in_swedish():
+    args = (16170, 4000, 20000)
+    assert (render_message(ValidationCode.TRANSACTION_GROSS, args, "sv", legacy=True)
+            == "Bruttobelopp 200.0 ≠ netto 161.7 + moms 40.0 (diff: 1.7)")
+    assert (render_message(ValidationCode.TRANSACTION_GROSS, args, "en", legacy=True)
+            == render_message(ValidationCode.TRANSACTION_GROSS, args, "en"))
+    assert (render_message(ValidationCode.ORG_NUMBER_CHECKSUM, (1, 2), legacy=True)
+            == "Ogiltig kontrollsiffra (förväntat 1)")
+
+
+def test_nested_messages():
+    org = (ValidationCode.ORG_NUMBER_CHECKSUM, 1, 2)
+    assert (render_message(ValidationCode.VAT_NUMBER_ORG, org, "en")
+            == "Invalid organisation number in VAT number: Invalid check digit "
+               "(expected 1, got 2)")
+    counterpart = ("vat_number", "SE1", "Shell", 3, ValidationCode.VAT_NUMBER_LENGTH, (1,))
+    assert (render_message(ValidationCode.COUNTERPART, counterpart)
+            == "Shell: ogiltigt VAT-nummer SE1 (VAT-nummer måste ha 12 siffror efter SE "
+               "(fick 1)) på 3 transaktioner")
+
+
+@pytest.mark.parametrize("lang, text", [
+    ("sv", "3 dubbletter i b.csv som redan lästs från a.csv togs bort: id 1, 2, (utan id) …"),
+    ("en", "3 duplicates in b.csv already read from a.csv were removed: ids 1, 2, (no id) …"),
+])
+def test_duplicates(lang, text):
+    args = (3, "b.csv", "a.csv", ("1", "2", None), True, True)
+    assert render_message(ValidationCode.DUPLICATES_ACROSS, args, lang) == text
+
+
+def test_unknown_language():
+    with pytest.raises(ValueError, match="Okänt språk"):
+        render_message(ValidationCode.TEXT, ("x",), "de")
+
+
+def test_result_message_from_code():
+    result = ValidationResult(False, code=ValidationCode.KWH_HIGH, args=(500,))
+    assert result.message == "Osannolikt högt kWh-värde: 500"
+    assert result.render("en") == "Implausibly high kWh value: 500"